@@ -120,11 +120,13 @@ def example_3_batch_processing():
     
     matcher = ResumeMatcher()
     
-    print("Candidate resume relevance to different positions:\n")
-    for position, job_desc in job_descriptions.items():
-        result = matcher.rank_resumes(job_desc, [resume])
-        score = result[0]['final_score']
-        print(f"  {position:20s}: {score:.1%}")
+    # fit once over the open positions, then score the resume against all of them
+    jobs = matcher.build_job_index(list(job_descriptions.values()), list(job_descriptions))
+    ranked = jobs.rank_jobs(resume)
+    
+    print("Candidate resume relevance to different positions (best first):\n")
+    for result in ranked:
+        print(f"  {result['job_id']:20s}: {result['final_score']:.1%}")
 
 
 def example_4_scoring_breakdown():
@@ -196,16 +198,15 @@ def example_5_custom_threshold():
     
     matcher = ResumeMatcher()
     
-    ranked = matcher.rank_resumes(job_desc, list(resumes.values()))
+    # min_score drops everyone below the bar before anything gets sorted
+    threshold = 0.15
+    ranked = matcher.rank_resumes(job_desc, list(resumes.values()), min_score=threshold)
     
-    threshold = 0.5
-    print(f"Candidates scoring above {threshold:.0%}:\n")
+    print(f"Candidates scoring above {threshold:.0%} ({len(ranked)} of {len(resumes)}):\n")
     
-    for i, result in enumerate(ranked):
+    for result in ranked:
         name = list(resumes.keys())[result['resume_index']]
-        score = result['final_score']
-        status = "[PASS]" if score >= threshold else "[FAIL]"
-        print(f"  {name:20s} {score:.1%}  {status}")
+        print(f"  {name:20s} {result['final_score']:.1%}  [PASS]")
 
 
 if __name__ == "__main__":
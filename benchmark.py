@@ -0,0 +1,239 @@
+"""
+Resume matcher benchmarks
+Times index fitting, queries and keyword extraction on synthetic resume
+pools built from the sample data, and writes the numbers as JSON so runs
+can be compared between builds
+"""
+
+import argparse
+import csv
+import json
+import platform
+import random
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Dict, List
+
+import numpy as np
+
+from resume_matcher import ResumeMatcher
+
+DEFAULT_SIZES = (1000, 10000, 100000, 1000000)
+
+# metrics where bigger is better - everything else is a time or memory figure
+HIGHER_IS_BETTER = {'batch_jobs_per_second', 'keywords_docs_per_second'}
+
+
+def load_vocabulary(resumes_csv: str = 'sample_resumes.csv', labeled_csv: str = 'labeled_pairs.csv') -> Dict:
+    """pull titles, skills, summaries etc. out of the sample files"""
+    vocabulary = {'titles': set(), 'skills': set(), 'summaries': set(), 'education': set(), 'jobs': []}
+
+    with open(resumes_csv, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            vocabulary['titles'].add(row['title'])
+            vocabulary['skills'].update(skill.strip() for skill in row['skills'].split(';') if skill.strip())
+            vocabulary['summaries'].add(row['summary'])
+            vocabulary['education'].add(row['education'])
+
+    with open(labeled_csv, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            vocabulary['titles'].add(row['job_title'])
+            vocabulary['jobs'].append(row['job_description'])
+
+    # sorted so the same seed always gives the same corpus
+    return {key: sorted(values) if isinstance(values, set) else values for key, values in vocabulary.items()}
+
+
+def synthetic_resumes(vocabulary: Dict, count: int, seed: int = 0) -> List[str]:
+    """random resumes stitched together from the sample vocabulary"""
+    rng = random.Random(seed)
+    resumes = []
+    for _ in range(count):
+        skills = rng.sample(vocabulary['skills'], rng.randint(4, 10))
+        resumes.append(" ".join([
+            rng.choice(vocabulary['titles']),
+            rng.choice(vocabulary['summaries']),
+            ", ".join(skills),
+            rng.choice(vocabulary['education']),
+        ]))
+    return resumes
+
+
+def synthetic_jobs(vocabulary: Dict, count: int, seed: int = 1) -> List[str]:
+    """real labeled job descriptions plus made-up ones with extra skills"""
+    rng = random.Random(seed)
+    jobs = []
+    for _ in range(count):
+        skills = rng.sample(vocabulary['skills'], rng.randint(3, 6))
+        jobs.append(f"{rng.choice(vocabulary['jobs'])} Also: {', '.join(skills)}")
+    return jobs
+
+
+def peak_rss_mb() -> float:
+    """peak resident set size of this process so far"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # linux reports KB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _percentile_ms(timings: List[float], percentile: float) -> float:
+    return float(np.percentile(timings, percentile) * 1000)
+
+
+def run_benchmark(
+    size: int,
+    n_queries: int = 50,
+    batch_jobs: int = 200,
+    one_shot_limit: int = 10000,
+    seed: int = 0,
+    resumes_csv: str = 'sample_resumes.csv',
+    labeled_csv: str = 'labeled_pairs.csv'
+) -> Dict:
+    """all the measurements for one pool size"""
+    vocabulary = load_vocabulary(resumes_csv, labeled_csv)
+    resumes = synthetic_resumes(vocabulary, size, seed)
+    jobs = synthetic_jobs(vocabulary, max(n_queries, batch_jobs), seed + 1)
+    matcher = ResumeMatcher()
+    result = {'size': size}
+
+    start = time.perf_counter()
+    index = matcher.build_index(resumes)
+    result['fit_seconds'] = time.perf_counter() - start
+
+    # single job against the fitted index
+    timings = []
+    for job in jobs[:n_queries]:
+        start = time.perf_counter()
+        index.rank_resumes(job, top_k=10)
+        timings.append(time.perf_counter() - start)
+    result['query_p50_ms'] = _percentile_ms(timings, 50)
+    result['query_p99_ms'] = _percentile_ms(timings, 99)
+
+    start = time.perf_counter()
+    index.rank_many(jobs[:batch_jobs], top_k=10)
+    result['batch_jobs_per_second'] = batch_jobs / (time.perf_counter() - start)
+
+    # the refit-per-call path gets slow fast, so only on smaller pools
+    if size <= one_shot_limit:
+        timings = []
+        for job in jobs[:max(1, n_queries // 10)]:
+            start = time.perf_counter()
+            matcher.calculate_similarity(job, resumes)
+            timings.append(time.perf_counter() - start)
+        result['calculate_similarity_p50_ms'] = _percentile_ms(timings, 50)
+        result['calculate_similarity_p99_ms'] = _percentile_ms(timings, 99)
+
+    sample = resumes[:min(size, 10000)]
+    start = time.perf_counter()
+    for resume in sample:
+        matcher.keyword_extractor.extract_keywords(resume)
+    result['keywords_docs_per_second'] = len(sample) / (time.perf_counter() - start)
+
+    result['peak_rss_mb'] = peak_rss_mb()
+    return result
+
+
+def run_suite(sizes=DEFAULT_SIZES, isolate: bool = True, **kwargs) -> Dict:
+    """benchmark every size, each in a fresh process so peak RSS means something"""
+    import sklearn
+
+    results = []
+    for size in sizes:
+        if isolate:
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+                result = pool.submit(run_benchmark, size, **kwargs).result()
+        else:
+            result = run_benchmark(size, **kwargs)
+        print(format_result(result), flush=True)
+        results.append(result)
+
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'sklearn': sklearn.__version__,
+            'machine': platform.machine(),
+        },
+        'results': results,
+    }
+
+
+def format_result(result: Dict) -> str:
+    line = (
+        f"size={result['size']:>8}  fit={result['fit_seconds']:.2f}s  "
+        f"query p50={result['query_p50_ms']:.2f}ms p99={result['query_p99_ms']:.2f}ms  "
+        f"batch={result['batch_jobs_per_second']:.0f} jobs/s  "
+        f"keywords={result['keywords_docs_per_second']:.0f} docs/s  "
+        f"rss={result['peak_rss_mb']:.0f}MB"
+    )
+    if 'calculate_similarity_p50_ms' in result:
+        line += f"  calculate_similarity p50={result['calculate_similarity_p50_ms']:.1f}ms"
+    return line
+
+
+def compare(baseline: Dict, current: Dict, tolerance: float = 0.10) -> List[str]:
+    """regressions worse than tolerance (fractional) between two benchmark outputs"""
+    regressions = []
+    baseline_by_size = {result['size']: result for result in baseline['results']}
+    for result in current['results']:
+        old = baseline_by_size.get(result['size'])
+        if old is None:
+            continue
+        for metric, value in result.items():
+            if metric == 'size' or metric not in old or not old[metric]:
+                continue
+            change = (value - old[metric]) / old[metric]
+            if metric in HIGHER_IS_BETTER:
+                change = -change
+            if change > tolerance:
+                regressions.append(
+                    f"size={result['size']} {metric}: {old[metric]:.4g} -> {value:.4g} ({change:+.0%} worse)"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help="comma separated pool sizes (default: %(default)s)")
+    parser.add_argument('--queries', type=int, default=50, help="single-job queries per size")
+    parser.add_argument('--batch-jobs', type=int, default=200, help="jobs in the rank_many batch")
+    parser.add_argument('--one-shot-limit', type=int, default=10000,
+                        help="largest pool to time calculate_similarity on")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write results JSON here")
+    parser.add_argument('--compare', help="baseline results JSON to check for regressions")
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help="allowed fractional slowdown before --compare fails")
+    parser.add_argument('--no-isolate', action='store_true',
+                        help="run every size in this process (peak RSS becomes cumulative)")
+    args = parser.parse_args()
+
+    report = run_suite(
+        [int(size) for size in args.sizes.split(',')],
+        isolate=not args.no_isolate,
+        n_queries=args.queries,
+        batch_jobs=args.batch_jobs,
+        one_shot_limit=args.one_shot_limit,
+        seed=args.seed,
+    )
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(json.load(f), report, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,17 +1,16 @@
+import argparse
 import csv
 import json
 from typing import List
+
+import numpy as np
 from resume_matcher import ResumeMatcher
+from resume_loader import load_resume_fields, load_resume_texts
 
 
 def load_resumes_from_csv(path: str) -> List[str]:
-    resumes = []
-    with open(path, newline='', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            text = " ".join([row.get('title', ''), row.get('summary', ''), row.get('skills', ''), row.get('education', '')])
-            resumes.append(text)
-    return resumes
+    # streams the file, same title/summary/skills/education text as the app
+    return load_resume_texts(path)
 
 
 def load_labeled_pairs(path: str):
@@ -28,18 +27,38 @@ def load_labeled_pairs(path: str):
     return pairs
 
 
-def evaluate_topk(resumes_csv='sample_resumes.csv', labeled_csv='labeled_pairs.csv'):
-    resumes = load_resumes_from_csv(resumes_csv)
+def evaluate_topk(
+    resumes_csv='sample_resumes.csv',
+    labeled_csv='labeled_pairs.csv',
+    matcher=None,
+    fields=False,
+    per_job_idf=False
+):
+    # pass a configured matcher to compare vectorizer settings (hashing, max_features, dtype)
     labeled = load_labeled_pairs(labeled_csv)
 
-    matcher = ResumeMatcher()
+    if matcher is None:
+        matcher = ResumeMatcher()
 
     top1_hits = 0
     top3_hits = 0
     total = len(labeled)
 
-    for item in labeled:
-        ranked = matcher.rank_resumes(item['job_description'], resumes, top_k=10)
+    job_descs = [item['job_description'] for item in labeled]
+    if fields:
+        # per-field matrices with the default FIELD_WEIGHTS instead of one over the joined text
+        from resume_fields import FieldIndex
+
+        _, records = load_resume_fields(resumes_csv)
+        rankings = FieldIndex.build(records, matcher=matcher).rank_many(job_descs, top_k=10)
+    else:
+        # one fit over the resumes and one sparse product for all the jobs;
+        # per_job_idf refits with each job in it, exactly like rank_resumes
+        rankings = matcher.rank_many(
+            job_descs, load_resumes_from_csv(resumes_csv), top_k=10, per_job_idf=per_job_idf
+        )
+
+    for item, ranked in zip(labeled, rankings):
         # ranked contains resume_index referencing 0-based index of resumes list
         top_indices = [r['resume_index'] + 1 for r in ranked[:3]]  # +1 to match CSV ids
 
@@ -55,7 +74,37 @@ def evaluate_topk(resumes_csv='sample_resumes.csv', labeled_csv='labeled_pairs.c
     print(f"Evaluation samples: {total}")
     print(f"Top-1 accuracy: {top1_acc:.2%} ({top1_hits}/{total})")
     print(f"Top-3 accuracy: {top3_acc:.2%} ({top3_hits}/{total})")
+    return top1_acc, top3_acc
+
+
+def main():
+    parser = argparse.ArgumentParser(description="top-1/top-3 accuracy on the labeled pairs")
+    parser.add_argument('--resumes', default='sample_resumes.csv')
+    parser.add_argument('--labeled', default='labeled_pairs.csv')
+    parser.add_argument('--max-features', type=int, help="vocabulary size, 0 for no limit (default 500)")
+    parser.add_argument('--hashing', action='store_true', help="hashed features instead of a vocabulary")
+    parser.add_argument('--n-features', type=int, help="columns in hashing mode (default 2**20)")
+    parser.add_argument('--float32', action='store_true', help="store the TF-IDF matrices as float32")
+    parser.add_argument(
+        '--per-job-idf', action='store_true', help="refit per job like rank_resumes (slower)"
+    )
+    parser.add_argument(
+        '--fields', action='store_true', help="score title/summary/skills/education separately"
+    )
+    args = parser.parse_args()
+
+    vectorizer_params = {}
+    if args.max_features is not None:
+        vectorizer_params['max_features'] = args.max_features or None
+    if args.n_features is not None:
+        vectorizer_params['n_features'] = args.n_features
+    matcher = ResumeMatcher(
+        vectorizer_params=vectorizer_params,
+        dtype=np.float32 if args.float32 else np.float64,
+        hashing=args.hashing
+    )
+    evaluate_topk(args.resumes, args.labeled, matcher, fields=args.fields, per_job_idf=args.per_job_idf)
 
 
 if __name__ == '__main__':
-    evaluate_topk()
+    main()
@@ -0,0 +1,270 @@
+"""
+Matching service
+Keeps one warm ResumeIndex and answers rank requests over asyncio. Requests
+that show up within a few milliseconds of each other get ranked as one
+batch (one sparse product) on an executor, so a crowd of recruiters shares
+the cost instead of each paying for a full pass
+"""
+
+import argparse
+import asyncio
+import json
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Dict, List
+
+from resume_matcher import RankedResults, ResumeIndex
+
+
+class MatchingService:
+    """in-process API - await service.rank(job) from as many tasks as you like
+
+        service = MatchingService(index)
+        await service.start()
+        results = await service.rank(job_desc, top_k=10)
+        await service.close()
+
+    The batcher takes the first waiting request, then keeps collecting for
+    max_wait seconds (or until max_batch requests) and ranks the lot with
+    one index.rank_many call. Identical jobs in a batch are only ranked once.
+    """
+
+    def __init__(
+        self,
+        index: ResumeIndex,
+        max_batch: int = 64,
+        max_wait: float = 0.005,
+        executor: Executor = None
+    ):
+        self.index = index
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        # one worker - batches run one after another, the next one fills up meanwhile
+        self._own_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix='matching')
+        self._queue = None
+        self._batcher = None
+        self.requests = 0
+        self.batches = 0
+
+    async def start(self):
+        if self._batcher is None:
+            self._queue = asyncio.Queue()
+            self._batcher = asyncio.create_task(self._run_batches())
+
+    async def close(self):
+        if self._batcher is not None:
+            self._batcher.cancel()
+            try:
+                await self._batcher
+            except asyncio.CancelledError:
+                pass
+            self._batcher = None
+            # nobody is going to answer these now - fail them instead of leaving callers hanging
+            queued = []
+            while not self._queue.empty():
+                queued.append(self._queue.get_nowait())
+            _fail(queued, RuntimeError("matching service closed"))
+        if self._own_executor:
+            self.executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def rank(self, job_desc: str, top_k: int = 10) -> RankedResults:
+        """ranked resumes for one job, batched with whatever else is waiting"""
+        # checked here so one bad request can't take down a batch it shares
+        if not isinstance(job_desc, str):
+            raise TypeError(f"job_desc must be a str, got {type(job_desc).__name__}")
+        if top_k is not None and (isinstance(top_k, bool) or not isinstance(top_k, int) or top_k < 1):
+            raise ValueError(f"top_k must be a positive int or None, got {top_k!r}")
+        if self._batcher is None:
+            raise RuntimeError("service isn't started, call start() first")
+        future = asyncio.get_running_loop().create_future()
+        self.requests += 1
+        await self._queue.put((job_desc, top_k, future))
+        return await future
+
+    async def add(self, resume_id, text: str) -> int:
+        return await self._run(self.index.add, resume_id, text)
+
+    async def update(self, resume_id, text: str) -> int:
+        return await self._run(self.index.update, resume_id, text)
+
+    async def delete(self, resume_id):
+        return await self._run(self.index.delete, resume_id)
+
+    def stats(self) -> Dict:
+        return {
+            'requests': self.requests,
+            'batches': self.batches,
+            'mean_batch_size': self.requests / max(self.batches, 1),
+            'resumes': len(self.index),
+        }
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def _run_batches(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = []
+            try:
+                batch.append(await self._queue.get())
+                deadline = loop.time() + self.max_wait
+                while len(batch) < self.max_batch:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                # anything else already queued rides along too
+                while len(batch) < self.max_batch and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+
+                batch = [request for request in batch if not request[2].cancelled()]
+                if not batch:
+                    continue
+                self.batches += 1
+                await self._rank_batch(batch)
+            except asyncio.CancelledError:
+                # close() - whatever this batch had picked up won't get an answer
+                _fail(batch, RuntimeError("matching service closed"))
+                raise
+            except Exception as error:
+                # never let the batcher die, everyone queued behind it would hang
+                _fail(batch, error)
+
+    async def _rank_batch(self, batch):
+        try:
+            await self._rank_together(batch)
+        except Exception:
+            if len(batch) == 1:
+                raise
+            # something in the batch broke it - go one by one so only that request fails
+            for request in batch:
+                try:
+                    await self._rank_together([request])
+                except Exception as error:
+                    _fail([request], error)
+
+    async def _rank_together(self, batch):
+        # one top_k for the whole batch - a smaller top_k is a prefix of a bigger one
+        top_ks = [top_k for _, top_k, _ in batch]
+        top_k = None if None in top_ks else max(top_ks)
+        jobs = list(dict.fromkeys(job_desc for job_desc, _, _ in batch))
+
+        rankings = await self._run(self.index.rank_many, jobs, top_k)
+
+        by_job = dict(zip(jobs, rankings))
+        for job_desc, request_top_k, future in batch:
+            if not future.done():
+                ranked = by_job[job_desc]
+                future.set_result(ranked if request_top_k is None else ranked[:request_top_k])
+
+
+def _fail(requests, error: Exception):
+    for _, _, future in requests:
+        if not future.done():
+            future.set_exception(error)
+
+
+async def serve(service: MatchingService, host: str = '127.0.0.1', port: int = 8765) -> asyncio.AbstractServer:
+    """JSON-lines socket server in front of a started service
+
+    One JSON object per line: {"id": 1, "op": "rank", "job": "...", "top_k": 10}.
+    op is rank (the default), add/update ({"resume_id", "text"}), delete
+    ({"resume_id"}) or stats. Replies carry the same id and either "result"
+    or "error"; requests on one connection are handled concurrently, so
+    replies can come back out of order.
+    """
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        write_lock = asyncio.Lock()
+        pending = set()
+
+        async def answer(line: bytes):
+            request_id = None
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("request must be a JSON object")
+                request_id = request.get('id')
+                reply = json.dumps({'id': request_id, 'result': await _dispatch(service, request)})
+            except Exception as error:
+                reply = json.dumps({'id': request_id, 'error': f"{type(error).__name__}: {error}"})
+            async with write_lock:
+                writer.write(reply.encode('utf-8') + b"\n")
+                await writer.drain()
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.strip():
+                    task = asyncio.create_task(answer(line))
+                    pending.add(task)
+                    task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.gather(*pending)
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+
+async def _dispatch(service: MatchingService, request: Dict):
+    op = request.get('op', 'rank')
+    if op == 'rank':
+        # RankedResults -> plain dicts so the reply can go out as JSON
+        return (await service.rank(request['job'], request.get('top_k', 10))).to_dicts()
+    if op == 'add':
+        return await service.add(request['resume_id'], request['text'])
+    if op == 'update':
+        return await service.update(request['resume_id'], request['text'])
+    if op == 'delete':
+        await service.delete(request['resume_id'])
+        return None
+    if op == 'stats':
+        return service.stats()
+    raise ValueError(f"unknown op {op!r}")
+
+
+async def _main(args):
+    if args.index:
+        index = ResumeIndex.load(args.index)
+    else:
+        from resume_loader import build_index_from_file
+
+        index = build_index_from_file(args.resumes, keep_texts=True)
+    print(f"Indexed {len(index)} resumes")
+
+    async with MatchingService(index, max_batch=args.max_batch, max_wait=args.max_wait / 1000) as service:
+        server = await serve(service, args.host, args.port)
+        print(f"Listening on {args.host}:{args.port}")
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="resume matching service (JSON lines over TCP)")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--resumes', default='sample_resumes.csv', help="csv/json/jsonl resumes to index")
+    source.add_argument('--index', help="saved ResumeIndex directory to load instead")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--max-batch', type=int, default=64)
+    parser.add_argument('--max-wait', type=float, default=5.0, help="milliseconds to wait for a batch to fill")
+    try:
+        asyncio.run(_main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,285 @@
+"""
+Approximate candidate search
+IVF-style partitioned index over a TruncatedSVD embedding of the resumes, so
+a job only gets exactly scored against the resumes in a few nearby partitions
+instead of the whole pool
+"""
+
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from resume_matcher import RankedResults, ResumeIndex
+
+
+class ApproximateIndex:
+    """candidate stage in front of a ResumeIndex
+
+    The embedding is of the combined features [0.7 * tfidf, 0.3 * keywords],
+    so a dot product with the job's [tfidf, keywords / |job keywords|] is the
+    final score itself - the SVD only approximates that. Candidates from the
+    n_probe closest partitions then get the exact 70/30 scoring.
+
+        ann = ApproximateIndex.build(index)
+        ann.rank_resumes(job, top_k=10, n_probe=16)
+
+    More probes (or a bigger max_candidates) = better recall, slower queries.
+    Resumes added to the index after build() are always candidates; after a
+    refit the partitions are stale and build() has to run again.
+    """
+
+    def __init__(
+        self,
+        index: ResumeIndex,
+        components: np.ndarray,
+        centroids: np.ndarray,
+        list_offsets: np.ndarray,
+        list_rows: np.ndarray,
+        embeddings: np.ndarray,
+        n_probe: int = 8,
+        max_candidates: int = None
+    ):
+        self.index = index
+        # vectorizer + pool the partitions were built against
+        self.vectorizer = index.vectorizer
+        self.n_rows = len(embeddings)
+        self.n_terms = index.resume_matrix.shape[1]
+        # n_components x (terms + keyword terms)
+        self.components = components
+        self.centroids = centroids
+        # rows of partition i are list_rows[list_offsets[i]:list_offsets[i + 1]]
+        self.list_offsets = list_offsets
+        self.list_rows = list_rows
+        self.embeddings = embeddings
+        self.n_probe = n_probe
+        self.max_candidates = max_candidates
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    @classmethod
+    def build(
+        cls,
+        index: ResumeIndex,
+        n_lists: int = None,
+        n_components: int = 64,
+        n_probe: int = 8,
+        max_candidates: int = None,
+        train_size: int = 100000,
+        n_iter: int = 10,
+        seed: int = 0
+    ) -> 'ApproximateIndex':
+        """embed the indexed resumes and partition them with k-means
+
+        n_lists defaults to sqrt(pool size). SVD and k-means are trained on at
+        most train_size rows, then every row gets embedded and assigned.
+        """
+        from sklearn.decomposition import TruncatedSVD
+
+        with index._lock:
+            features = _combined_features(index)
+        n_rows, n_features = features.shape
+        n_components = max(1, min(n_components, n_features - 1, n_rows))
+
+        rng = np.random.default_rng(seed)
+        sample = np.sort(rng.choice(n_rows, min(n_rows, train_size), replace=False))
+        if n_lists is None:
+            n_lists = int(np.sqrt(n_rows))
+        # k-means seeds its centroids with distinct training rows
+        n_lists = max(1, min(n_lists, len(sample)))
+
+        with index.matcher.stage('ann_fit', docs=n_rows) as stage:
+            svd = TruncatedSVD(n_components=n_components, random_state=seed)
+            svd.fit(features[sample])
+            components = svd.components_.astype(np.float32)
+            embeddings = np.asarray(features @ components.T, dtype=np.float32)
+
+            centroids = _kmeans(embeddings[sample], n_lists, n_iter, rng)
+            labels = _nearest(embeddings, centroids)
+            # stable sort keeps rows ascending inside each partition
+            list_rows = np.argsort(labels, kind='stable')
+            list_offsets = np.zeros(n_lists + 1, dtype=np.int64)
+            np.cumsum(np.bincount(labels, minlength=n_lists), out=list_offsets[1:])
+            stage.set(shape=embeddings.shape, n_lists=n_lists)
+
+        return cls(
+            index, components, centroids, list_offsets, list_rows, embeddings,
+            n_probe=n_probe, max_candidates=max_candidates
+        )
+
+    def candidates(self, query: np.ndarray, n_probe: int = None, min_candidates: int = 0) -> np.ndarray:
+        """candidate rows for one embedded job
+
+        Probes the n_probe partitions whose centroid scores best, and more if
+        that's fewer than min_candidates rows.
+        """
+        if n_probe is None:
+            n_probe = self.n_probe
+        order = np.argsort(-(self.centroids @ query), kind='stable')
+
+        sizes = np.diff(self.list_offsets)[order]
+        enough = np.searchsorted(np.cumsum(sizes), min_candidates) + 1
+        probed = order[:max(n_probe, enough)]
+        rows = np.concatenate([
+            self.list_rows[self.list_offsets[lst]:self.list_offsets[lst + 1]] for lst in probed
+        ])
+
+        if self.max_candidates is not None and len(rows) > max(self.max_candidates, min_candidates):
+            keep = max(self.max_candidates, min_candidates)
+            approx = self.embeddings[rows] @ query
+            rows = rows[np.argpartition(-approx, keep - 1)[:keep]]
+
+        # rows added to the index since build() aren't partitioned - always check them
+        if self.index.n_rows > self.n_rows:
+            rows = np.concatenate([rows, np.arange(self.n_rows, self.index.n_rows)])
+        return rows
+
+    def rank_resumes(self, job_desc: str, top_k: int = 10, n_probe: int = None) -> RankedResults:
+        """approximate top_k - exact scores, but only for the candidate rows"""
+        return self.rank_many([job_desc], top_k, n_probe)[0]
+
+    def rank_many(
+        self,
+        job_descs: List[str],
+        top_k: int = 10,
+        n_probe: int = None,
+        batch_size: int = 256
+    ) -> List[RankedResults]:
+        """rank_resumes for a bunch of jobs, embedding them a batch at a time"""
+        index = self.index
+        stage = index.matcher.stage
+        rankings = []
+        with stage('ann_query', jobs=len(job_descs), resumes=len(index)):
+            for start in range(0, len(job_descs), batch_size):
+                batch = job_descs[start:start + batch_size]
+                with stage('keywords', docs=len(batch)):
+                    job_keyword_sets = [
+                        set(index.matcher.keyword_extractor.extract_keywords(job_desc))
+                        for job_desc in batch
+                    ]
+                with index._lock:
+                    if index.vectorizer is not self.vectorizer:
+                        raise ValueError("the index was refit since this was built, build() it again")
+                    job_matrix = index.job_matrix(batch)
+                    queries = self._embed_jobs(job_matrix, job_keyword_sets)
+                    for row, job_desc in enumerate(batch):
+                        with stage('candidates') as timed:
+                            rows = self.candidates(queries[row], n_probe, min_candidates=top_k or 0)
+                            timed.set(docs=len(rows))
+                        rankings.append(index.rank_candidates(
+                            job_desc, rows, top_k,
+                            job_keywords=job_keyword_sets[row], job_vector=job_matrix[row]
+                        ))
+        return rankings
+
+    def recall_report(self, job_descs: List[str], top_k: int = 10, n_probes=None) -> List[Dict]:
+        """recall@top_k and latency against the brute-force ranking, per n_probe
+
+        A result counts as found if it scores at least the exact k-th best
+        score, so swapping one tied resume for another isn't a miss.
+        """
+        if n_probes is None:
+            n_probes = sorted({1, 2, 4, 8, 16, 32, self.n_lists} & set(range(1, self.n_lists + 1)))
+
+        start = time.perf_counter()
+        exact = self.index.rank_many(job_descs, top_k)
+        exact_ms = (time.perf_counter() - start) * 1000 / len(job_descs)
+        cutoffs = [ranked[-1]['final_score'] if ranked else 0.0 for ranked in exact]
+        wanted = sum(len(ranked) for ranked in exact)
+
+        report = []
+        for n_probe in n_probes:
+            start = time.perf_counter()
+            approximate = self.rank_many(job_descs, top_k, n_probe)
+            ann_ms = (time.perf_counter() - start) * 1000 / len(job_descs)
+
+            found = sum(
+                sum(result['final_score'] >= cutoff for result in ranked)
+                for cutoff, ranked in zip(cutoffs, approximate)
+            )
+            report.append({
+                'n_probe': n_probe,
+                'recall': found / max(wanted, 1),
+                'probed_fraction': min(n_probe, self.n_lists) / self.n_lists,
+                'ann_ms': ann_ms,
+                'exact_ms': exact_ms,
+            })
+        return report
+
+    def _embed_jobs(self, job_matrix, job_keyword_sets: List[set]) -> np.ndarray:
+        """jobs in the embedding space, [tfidf, keywords / |job keywords|] projected"""
+        from scipy import sparse
+
+        rows, cols, values = [], [], []
+        for row, job_keywords in enumerate(job_keyword_sets):
+            for keyword in job_keywords:
+                col = self.index.keyword_vocabulary.get(keyword)
+                # keywords newer than the build aren't in the embedding
+                if col is not None and self.n_terms + col < self.components.shape[1]:
+                    rows.append(row)
+                    cols.append(col)
+                    values.append(1.0 / len(job_keywords))
+        keyword_matrix = sparse.csr_matrix(
+            (values, (rows, cols)),
+            shape=(len(job_keyword_sets), self.components.shape[1] - self.n_terms)
+        )
+        queries = job_matrix @ self.components[:, :self.n_terms].T
+        queries += keyword_matrix @ self.components[:, self.n_terms:].T
+        return np.asarray(queries, dtype=np.float32)
+
+
+def format_recall_report(report: List[Dict]) -> str:
+    """recall_report() as a table"""
+    lines = [f"{'n_probe':>8} {'recall':>8} {'probed':>8} {'ann ms':>9} {'exact ms':>9}"]
+    for row in report:
+        lines.append(
+            f"{row['n_probe']:>8} {row['recall']:>8.1%} {row['probed_fraction']:>8.1%} "
+            f"{row['ann_ms']:>9.2f} {row['exact_ms']:>9.2f}"
+        )
+    return "\n".join(lines)
+
+
+def _combined_features(index: ResumeIndex):
+    """resumes x (terms + keyword terms), weighted so x . job = the final score"""
+    from scipy import sparse
+
+    matcher = index.matcher
+    return sparse.hstack([
+        index.resume_matrix * matcher.SIMILARITY_WEIGHT,
+        index.keyword_matrix * matcher.KEYWORD_WEIGHT,
+    ], format='csr')
+
+
+def _kmeans(points: np.ndarray, n_clusters: int, n_iter: int, rng) -> np.ndarray:
+    """plain Lloyd's k-means, empty clusters get reseeded with random points"""
+    from scipy import sparse
+
+    centroids = points[rng.choice(len(points), n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        labels = _nearest(points, centroids)
+        counts = np.bincount(labels, minlength=n_clusters)
+        # one-hot clusters x points product = per-cluster sums
+        membership = sparse.csr_matrix(
+            (np.ones(len(points), dtype=points.dtype), (labels, np.arange(len(points)))),
+            shape=(n_clusters, len(points))
+        )
+        sums = np.asarray(membership @ points)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        if empty.any():
+            centroids[empty] = points[rng.choice(len(points), int(empty.sum()), replace=False)]
+    return centroids
+
+
+def _nearest(points: np.ndarray, centroids: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+    """closest centroid for every point, chunked so points x centroids stays small"""
+    centroid_norms = (centroids ** 2).sum(axis=1)
+    labels = np.empty(len(points), dtype=np.int64)
+    for start in range(0, len(points), chunk_size):
+        chunk = points[start:start + chunk_size]
+        # |x - c|^2 without the |x|^2 term, it's the same for every centroid
+        distances = centroid_norms - 2 * (chunk @ centroids.T)
+        labels[start:start + chunk_size] = distances.argmin(axis=1)
+    return labels
@@ -0,0 +1,338 @@
+"""
+Field-aware resume index
+Keeps one TF-IDF matrix per resume field (title, summary, skills,
+education) instead of one over the joined text, so a skills match can count
+for more than a word in the summary, an update only re-vectorizes the
+fields that changed, and a query only multiplies against the fields it
+gives weight to
+"""
+
+import re
+import threading
+from typing import Dict, List
+
+import numpy as np
+
+from resume_loader import RESUME_FIELDS, resume_fields
+from resume_matcher import (
+    RankedResults, ResumeMatcher, _GrowingCSR, _reserve, build_keyword_matrix,
+    keyword_match_matrix, top_k_indices
+)
+
+# share of the similarity score each field gets by default
+FIELD_WEIGHTS = {'title': 0.25, 'summary': 0.25, 'skills': 0.4, 'education': 0.1}
+
+# skills come as 'Python;Django;SQL' - clean_text would drop the ; and glue them together
+LIST_SEPARATORS = re.compile(r'[;,|]')
+
+
+class FieldIndex:
+    """resume pool with a fitted vectorizer and matrix per field
+
+        resume_ids, records = load_resume_fields('sample_resumes.csv')
+        index = FieldIndex.build(records, resume_ids)
+        index.rank_resumes(job, top_k=10)
+        index.rank_resumes(job, weights={'skills': 1.0})  # only the skills matrix is touched
+
+    Similarity is the weighted mean of the job's cosine against each field
+    (each field has its own vocabulary and IDF), then the usual 70/30 mix
+    with the keyword match, keywords coming from the whole resume. Weights
+    can be set on the index or per query; fields at weight 0 are skipped.
+    No refit - new words in added/updated fields only count if the field's
+    vocabulary already has them, same as ResumeIndex.add.
+    """
+
+    def __init__(
+        self,
+        matcher: ResumeMatcher,
+        vectorizers: Dict[str, object],
+        field_matrices: Dict,
+        keyword_matrix,
+        keyword_terms: List[str],
+        resume_ids: List = None,
+        fields: List[Dict[str, str]] = None,
+        weights: Dict[str, float] = None
+    ):
+        self.matcher = matcher
+        # field -> fitted vectorizer, None for a field with nothing in it
+        self.vectorizers = dict(vectorizers)
+        self.field_names = tuple(self.vectorizers)
+        self.field_matrices = {field: field_matrices[field].tocsr() for field in self.field_names}
+        self.keyword_matrix = keyword_matrix.tocsr()
+        self.keyword_terms = list(keyword_terms)
+        self.keyword_vocabulary = {term: col for col, term in enumerate(self.keyword_terms)}
+
+        n_rows = self.keyword_matrix.shape[0]
+        self.resume_ids = list(range(n_rows)) if resume_ids is None else list(resume_ids)
+        # cleaned text per field and row - keywords come from all of them, so an
+        # update of one field still needs the others
+        self.fields = list(fields) if fields is not None else None
+        if weights is None:
+            # fields FIELD_WEIGHTS doesn't know get an even share
+            weights = {
+                field: FIELD_WEIGHTS.get(field, 1 / len(FIELD_WEIGHTS)) for field in self.field_names
+            }
+        self.weights = self._normalize_weights(weights)
+
+        self._alive = np.ones(n_rows, dtype=bool)
+        self.alive = self._alive[:n_rows]
+        self._n_alive = n_rows
+        self._row_of = {resume_id: row for row, resume_id in enumerate(self.resume_ids)}
+        # appendable copies of the matrices, made on the first add()
+        self._field_rows = None
+        self._keyword_rows = None
+        self._lock = threading.RLock()
+
+    @classmethod
+    def build(
+        cls,
+        records: List[Dict],
+        resume_ids: List = None,
+        matcher: ResumeMatcher = None,
+        fields=RESUME_FIELDS,
+        weights: Dict[str, float] = None
+    ) -> 'FieldIndex':
+        """fit one vectorizer per field over the resume records (dicts of field -> text)"""
+        from scipy import sparse
+        from sklearn.base import clone
+
+        if not records:
+            raise ValueError("need at least one resume to build an index")
+        if resume_ids is not None and len(resume_ids) != len(records):
+            raise ValueError("resume_ids and records must be the same length")
+        if matcher is None:
+            matcher = ResumeMatcher()
+
+        with matcher.stage('build_field_index', resumes=len(records), fields=len(fields)):
+            with matcher.stage('preprocess', docs=len(records)):
+                cleaned = [_clean_fields(matcher, record, fields) for record in records]
+            with matcher.stage('keywords', docs=len(records)):
+                keyword_matrix, keyword_terms = build_keyword_matrix([
+                    _keywords(matcher, row_fields) for row_fields in cleaned
+                ])
+
+            vectorizers, field_matrices = {}, {}
+            for field in fields:
+                texts = [row_fields[field] for row_fields in cleaned]
+                with matcher.stage('fit', docs=len(texts), field=field) as timed:
+                    vectorizer = clone(matcher.vectorizer)
+                    try:
+                        matrix = vectorizer.fit_transform(texts)
+                    except ValueError:
+                        # empty vocabulary - nothing but stop words (or nothing at all) in
+                        # this field, it just never scores
+                        vectorizer = None
+                        matrix = sparse.csr_matrix((len(texts), 0), dtype=matcher.vectorizer.dtype)
+                    matrix.sort_indices()
+                    timed.set(shape=matrix.shape)
+                vectorizers[field] = vectorizer
+                field_matrices[field] = matrix
+
+        return cls(
+            matcher, vectorizers, field_matrices, keyword_matrix, keyword_terms,
+            resume_ids, cleaned, weights
+        )
+
+    def __len__(self) -> int:
+        return self._n_alive
+
+    @property
+    def n_rows(self) -> int:
+        """rows in the matrices, tombstoned ones included"""
+        return self.keyword_matrix.shape[0]
+
+    def _normalize_weights(self, weights: Dict[str, float]) -> Dict[str, float]:
+        """weights over the fields that can score, scaled to sum to 1"""
+        unknown = set(weights) - set(self.field_names)
+        if unknown:
+            raise ValueError(f"unknown fields {sorted(unknown)}, index has {list(self.field_names)}")
+        if any(weight < 0 for weight in weights.values()):
+            raise ValueError(f"field weights can't be negative, got {weights}")
+        used = {
+            field: float(weight) for field, weight in weights.items()
+            if weight > 0 and self.vectorizers[field] is not None
+        }
+        total = sum(used.values())
+        if not total:
+            raise ValueError(f"no field with text in it has a positive weight: {weights}")
+        return {field: weight / total for field, weight in used.items()}
+
+    def similarity_matrix(self, job_descs: List[str], weights: Dict[str, float] = None) -> np.ndarray:
+        """jobs x resumes weighted field cosines, one sparse product per weighted field"""
+        weights = self.weights if weights is None else self._normalize_weights(weights)
+        stage = self.matcher.stage
+        with stage('preprocess', docs=len(job_descs)):
+            processed_jobs = [self.matcher.preprocess_text(job) for job in job_descs]
+
+        similarities = np.zeros((len(job_descs), self.n_rows))
+        for field, weight in weights.items():
+            with stage('vectorize', docs=len(job_descs), field=field):
+                job_matrix = self.vectorizers[field].transform(processed_jobs)
+            with stage('similarity', shape=(len(job_descs), self.n_rows), field=field):
+                # sparse result, only the resumes sharing a term with the job get added to
+                field_scores = (self.field_matrices[field] @ job_matrix.T).T.tocoo()
+                similarities[field_scores.row, field_scores.col] += weight * field_scores.data
+        return similarities
+
+    def rank_resumes(
+        self,
+        job_desc: str,
+        top_k: int = None,
+        weights: Dict[str, float] = None,
+        min_score: float = None
+    ) -> RankedResults:
+        """rank the indexed resumes by weighted field relevance"""
+        return self.rank_many([job_desc], top_k, weights, min_score=min_score)[0]
+
+    def rank_many(
+        self,
+        job_descs: List[str],
+        top_k: int = None,
+        weights: Dict[str, float] = None,
+        batch_size: int = 256,
+        min_score: float = None
+    ) -> List[RankedResults]:
+        """rank_resumes for a bunch of jobs, batch_size jobs per set of sparse products"""
+        stage = self.matcher.stage
+        rankings = []
+        with stage('field_query', jobs=len(job_descs), resumes=len(self)):
+            for start in range(0, len(job_descs), batch_size):
+                batch = job_descs[start:start + batch_size]
+                with stage('keywords', docs=len(batch)):
+                    job_keyword_sets = [
+                        set(self.matcher.keyword_extractor.extract_keywords(job_desc))
+                        for job_desc in batch
+                    ]
+                with self._lock:
+                    rankings.extend(self._rank_batch(batch, job_keyword_sets, top_k, weights, min_score))
+        return rankings
+
+    def _rank_batch(self, batch, job_keyword_sets, top_k, weights, min_score) -> List[RankedResults]:
+        similarities = self.similarity_matrix(batch, weights)
+        with self.matcher.stage('keyword_match', shape=(len(batch), self.n_rows)):
+            keyword_scores = keyword_match_matrix(
+                self.keyword_matrix, self.keyword_vocabulary, job_keyword_sets
+            )
+        final_scores = self.matcher.combine_scores(similarities, keyword_scores)
+        final_scores[:, ~self.alive] = -np.inf
+
+        rankings = []
+        with self.matcher.stage('rank', docs=len(batch), top_k=top_k):
+            for job, job_keywords in enumerate(job_keyword_sets):
+                if min_score is None:
+                    passing = np.flatnonzero(self.alive)
+                else:
+                    # tombstones are -inf, they never clear the bar
+                    passing = np.flatnonzero(final_scores[job] >= min_score)
+                rows = passing[top_k_indices(final_scores[job, passing], top_k)]
+                rankings.append(RankedResults(
+                    rows, similarities[job, rows], keyword_scores[job, rows], final_scores[job, rows],
+                    self.resume_ids, self.keyword_matrix, self.keyword_terms, job_keywords
+                ))
+        return rankings
+
+    def add(self, resume_id, record: Dict) -> int:
+        """add a resume (dict of field -> text) with the current vocabularies, returns its row"""
+        with self._lock:
+            if resume_id in self._row_of:
+                raise ValueError(f"resume {resume_id!r} is already indexed, use update()")
+            cleaned = _clean_fields(self.matcher, record, self.field_names)
+            field_rows = {field: self._transform(field, text) for field, text in cleaned.items()}
+            return self._append_row(resume_id, cleaned, field_rows)
+
+    def update(self, resume_id, record: Dict) -> int:
+        """change some fields of a resume - only the fields in record get re-vectorized
+
+        Like ResumeIndex.update the old row is tombstoned and a new one
+        appended; the untouched fields' rows are copied over as they are.
+        """
+        with self._lock:
+            row = self._row_of.get(resume_id)
+            if row is None:
+                raise KeyError(f"resume {resume_id!r} is not in the index")
+            if self.fields is None:
+                raise ValueError("index was built without its field texts, can't update fields")
+            unknown = set(record) - set(self.field_names)
+            if unknown:
+                raise ValueError(f"unknown fields {sorted(unknown)}, index has {list(self.field_names)}")
+
+            # everything that can fail happens before the old row goes away
+            changed = _clean_fields(self.matcher, record, record)
+            field_rows = {field: self._transform(field, text) for field, text in changed.items()}
+            for field in self.field_names:
+                if field not in field_rows:
+                    matrix = self.field_matrices[field]
+                    start, end = matrix.indptr[row], matrix.indptr[row + 1]
+                    field_rows[field] = (matrix.indices[start:end], matrix.data[start:end])
+            cleaned = dict(self.fields[row], **changed)
+
+            self._tombstone(resume_id)
+            return self._append_row(resume_id, cleaned, field_rows)
+
+    def delete(self, resume_id):
+        """tombstone a resume - it stays in the matrices but never shows up"""
+        with self._lock:
+            self._tombstone(resume_id)
+
+    def _transform(self, field: str, text: str):
+        """(indices, data) of one field's tf-idf row"""
+        vectorizer = self.vectorizers[field]
+        if vectorizer is None:
+            return np.zeros(0, dtype=np.int32), np.zeros(0)
+        vector = vectorizer.transform([text])
+        vector.sort_indices()
+        return vector.indices, vector.data
+
+    def _tombstone(self, resume_id):
+        row = self._row_of.pop(resume_id, None)
+        if row is None:
+            raise KeyError(f"resume {resume_id!r} is not in the index")
+        self.alive[row] = False
+        self._n_alive -= 1
+
+    def _append_row(self, resume_id, cleaned: Dict[str, str], field_rows: Dict) -> int:
+        cols = []
+        for keyword in _keywords(self.matcher, cleaned):
+            col = self.keyword_vocabulary.get(keyword)
+            if col is None:
+                col = len(self.keyword_terms)
+                self.keyword_terms.append(keyword)
+                self.keyword_vocabulary[keyword] = col
+            cols.append(col)
+        cols.sort()
+
+        if self._field_rows is None:
+            self._field_rows = {
+                field: _GrowingCSR(matrix) for field, matrix in self.field_matrices.items()
+            }
+            self._keyword_rows = _GrowingCSR(self.keyword_matrix)
+        for field, (indices, data) in field_rows.items():
+            self._field_rows[field].append(indices, data)
+            self.field_matrices[field] = self._field_rows[field].matrix()
+        self._keyword_rows.append(cols, np.ones(len(cols)), n_cols=len(self.keyword_terms))
+        self.keyword_matrix = self._keyword_rows.matrix()
+
+        row = len(self.resume_ids)
+        self.resume_ids.append(resume_id)
+        if self.fields is not None:
+            self.fields.append(cleaned)
+        self._alive = _reserve(self._alive, row, row + 1)
+        self._alive[row] = True
+        self.alive = self._alive[:row + 1]
+        self._n_alive += 1
+        self._row_of[resume_id] = row
+        return row
+
+
+def _clean_fields(matcher: ResumeMatcher, record: Dict, fields) -> Dict[str, str]:
+    """cleaned text for each of the fields, '' for missing/NaN ones"""
+    return {
+        field: matcher.preprocess_text(LIST_SEPARATORS.sub(' ', text))
+        for field, text in resume_fields(record, fields).items()
+    }
+
+
+def _keywords(matcher: ResumeMatcher, cleaned: Dict[str, str]) -> set:
+    """a resume's keywords, from all its fields together"""
+    text = ' '.join(value for value in cleaned.values() if value)
+    return set(matcher.keyword_extractor.extract_keywords_from_clean(text))
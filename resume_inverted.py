@@ -0,0 +1,201 @@
+"""
+Inverted index top-k
+Term -> postings lists over the resume TF-IDF and keyword matrices with
+per-term upper bounds, so a top-k query only touches resumes that share
+something with the job and stops once nothing unseen can make the top k
+"""
+
+from typing import List
+
+import numpy as np
+
+from resume_matcher import RankedResults, ResumeIndex
+
+# slack on the pruning bounds - partial sums add up in a different order
+# than the exact scores, so they can be a few ulps off
+BOUND_SLACK = 1e-9
+
+
+class InvertedIndex:
+    """MaxScore-style pruned top-k in front of a ResumeIndex
+
+    The final score is a sum over job terms and job keywords of
+    job weight x resume weight, and every weight is >= 0. Features are
+    visited in order of their best possible contribution. Once k resumes
+    already score more than everything left could add, unseen resumes can't
+    make it and the rest of the postings are skipped. The survivors get the
+    exact scoring (ResumeIndex.rank_candidates), so results are the same as
+    rank_resumes, ties and all.
+
+        inverted = InvertedIndex(index)
+        inverted.rank_resumes(job, top_k=10)
+
+    Resumes added to the index afterwards are always scored; after a refit
+    the postings are stale and it has to be rebuilt.
+    """
+
+    def __init__(self, index: ResumeIndex):
+        self.index = index
+        with index._lock:
+            self.vectorizer = index.vectorizer
+            self.n_rows = index.n_rows
+            self.term_postings = _Postings(index.resume_matrix)
+            self.keyword_postings = _Postings(index.keyword_matrix)
+        # scratch space for the partial scores, reset after every query
+        self._scores = np.zeros(self.n_rows)
+        self._seen = np.zeros(self.n_rows, dtype=bool)
+
+    def rank_resumes(self, job_desc: str, top_k: int = 10) -> RankedResults:
+        """same as ResumeIndex.rank_resumes, without scoring every resume"""
+        return self.rank_many([job_desc], top_k)[0]
+
+    def rank_many(self, job_descs: List[str], top_k: int = 10, batch_size: int = 256) -> List[RankedResults]:
+        """same as ResumeIndex.rank_many, without scoring every resume"""
+        index = self.index
+        if top_k is None:
+            # everything gets ranked anyway
+            return index.rank_many(job_descs, top_k, batch_size)
+
+        stage = index.matcher.stage
+        rankings = []
+        with stage('pruned_query', jobs=len(job_descs), resumes=len(index)):
+            for start in range(0, len(job_descs), batch_size):
+                batch = job_descs[start:start + batch_size]
+                with stage('keywords', docs=len(batch)):
+                    job_keyword_sets = [
+                        set(index.matcher.keyword_extractor.extract_keywords(job_desc))
+                        for job_desc in batch
+                    ]
+                with index._lock:
+                    if index.vectorizer is not self.vectorizer:
+                        raise ValueError("the index was refit since this was built, make a new one")
+                    job_matrix = index.job_matrix(batch)
+                    for row, job_desc in enumerate(batch):
+                        job_vector = job_matrix[row]
+                        with stage('candidates') as timed:
+                            rows, visited = self.candidates(job_vector, job_keyword_sets[row], top_k)
+                            timed.set(docs=len(rows), visited=visited)
+                        rankings.append(index.rank_candidates(
+                            job_desc, rows, top_k,
+                            job_keywords=job_keyword_sets[row], job_vector=job_vector
+                        ))
+        return rankings
+
+    def candidates(self, job_vector, job_keywords: set, top_k: int):
+        """rows that could be in the top_k, plus how many postings got visited
+
+        Call with the index lock held.
+        """
+        matcher = self.index.matcher
+        alive = self.index.alive
+
+        # (upper bound, job weight, postings, column) for every feature the job has
+        features = []
+        for col, value in zip(job_vector.indices, job_vector.data):
+            weight = value * matcher.SIMILARITY_WEIGHT
+            features.append((weight * self.term_postings.max_weight[col], weight, self.term_postings, col))
+        keyword_weight = matcher.KEYWORD_WEIGHT / max(len(job_keywords), 1)
+        for keyword in job_keywords:
+            col = self.index.keyword_vocabulary.get(keyword)
+            # keywords newer than the postings only show up in newer rows
+            if col is not None and col < self.keyword_postings.n_cols:
+                features.append((
+                    keyword_weight * self.keyword_postings.max_weight[col],
+                    keyword_weight, self.keyword_postings, col
+                ))
+        features = [feature for feature in features if feature[0] > 0]
+        features.sort(key=lambda feature: -feature[0])
+        # most the features from i on can still add to any one resume
+        remaining = np.concatenate((np.cumsum([f[0] for f in features][::-1])[::-1], [0.0]))
+
+        scores, seen = self._scores, self._seen
+        touched = []
+        n_touched = 0
+        visited = 0
+        threshold = None
+        rest = 0.0
+        pruned = False
+        for i, (_, weight, postings, col) in enumerate(features):
+            rows, values = postings.column(col)
+            visited += len(rows)
+            new_rows = rows[~seen[rows]]
+            seen[new_rows] = True
+            touched.append(new_rows)
+            n_touched += len(new_rows)
+            scores[rows] += weight * values
+
+            if n_touched >= top_k:
+                threshold = _kth_live_score(scores, np.concatenate(touched), alive, top_k)
+                # k resumes already beat anything an unseen resume could still get
+                if threshold is not None and threshold > remaining[i + 1] + BOUND_SLACK:
+                    rest = remaining[i + 1]
+                    pruned = True
+                    break
+
+        touched = np.concatenate(touched) if touched else np.empty(0, dtype=np.intp)
+        if not pruned:
+            # went through every feature, the partial scores are the full ones
+            threshold = _kth_live_score(scores, touched, alive, top_k)
+        live = touched[alive[touched]]
+        if threshold is not None:
+            # drop what can't reach the k-th best even with everything left
+            live = live[scores[live] + rest >= threshold - BOUND_SLACK]
+        if pruned:
+            # the lists not walked yet only matter for the rows still in the
+            # running - look those up (binary search) instead of scanning
+            live = np.sort(live)
+            for _, weight, postings, col in features[i + 1:]:
+                rows, values = postings.column(col)
+                positions = np.searchsorted(rows, live)
+                positions[positions == len(rows)] = 0
+                hits = rows[positions] == live
+                scores[live[hits]] += weight * values[positions[hits]]
+                visited += len(live)
+                rest = max(rest - weight * postings.max_weight[col], 0.0)
+
+                threshold = _kth_live_score(scores, live, alive, top_k)
+                live = live[scores[live] + rest >= threshold - BOUND_SLACK]
+                if len(live) <= top_k:
+                    break
+        candidates = [live]
+
+        scores[touched] = 0.0
+        seen[touched] = False
+
+        # rows added since the postings were built
+        if self.index.n_rows > self.n_rows:
+            candidates.append(np.arange(self.n_rows, self.index.n_rows))
+        if len(live) < top_k:
+            # maybe fewer than k resumes score at all - the full ranking pads
+            # with zero scores in row order, so hand over the first rows too
+            candidates.append(np.flatnonzero(alive)[:top_k])
+        return np.concatenate(candidates), visited
+
+
+class _Postings:
+    """column-major copy of a resumes x features matrix with the max weight per column"""
+
+    def __init__(self, matrix):
+        csc = matrix.tocsc()
+        csc.sort_indices()
+        self.n_cols = csc.shape[1]
+        self.indptr = csc.indptr
+        self.indices = csc.indices.astype(np.intp)
+        self.data = np.asarray(csc.data, dtype=np.float64)
+
+        self.max_weight = np.zeros(self.n_cols)
+        nonempty = np.flatnonzero(np.diff(self.indptr))
+        if len(nonempty):
+            self.max_weight[nonempty] = np.maximum.reduceat(self.data, self.indptr[nonempty])
+
+    def column(self, col: int):
+        start, end = self.indptr[col], self.indptr[col + 1]
+        return self.indices[start:end], self.data[start:end]
+
+
+def _kth_live_score(scores: np.ndarray, touched: np.ndarray, alive: np.ndarray, top_k: int):
+    """k-th best partial score among live touched rows, None if there aren't k"""
+    live_scores = scores[touched[alive[touched]]]
+    if len(live_scores) < top_k:
+        return None
+    return np.partition(live_scores, len(live_scores) - top_k)[len(live_scores) - top_k]
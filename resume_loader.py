@@ -0,0 +1,190 @@
+"""
+Resume file loading
+Streams resumes out of CSV / JSON / JSONL files in chunks so big pools
+never have to sit in memory all at once
+"""
+
+import csv
+import json
+import os
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+# the fields that make up a resume's text, in order
+RESUME_FIELDS = ('title', 'summary', 'skills', 'education')
+# structured fields the index can filter on before any text scoring
+STRUCTURED_FIELDS = ('years_experience', 'title')
+
+
+def resume_fields(record: Dict, fields=RESUME_FIELDS) -> Dict[str, str]:
+    """the text fields of one resume record, '' for missing ones"""
+    texts = {}
+    for field in fields:
+        value = record.get(field)
+        value = '' if value is None else str(value)
+        # pandas gives NaN for empty cells
+        texts[field] = '' if value == 'nan' else value
+    return texts
+
+
+def resume_text(record: Dict) -> str:
+    """join the text fields of one resume record, skipping blanks/NaN"""
+    return ' '.join(value for value in resume_fields(record).values() if value)
+
+
+def iter_records(path: str) -> Iterator[Dict]:
+    """yield resume records one at a time from a .csv, .json (array) or .jsonl file"""
+    extension = os.path.splitext(path)[1].lower()
+
+    if extension == '.csv':
+        with open(path, newline='', encoding='utf-8') as f:
+            yield from csv.DictReader(f)
+    elif extension == '.jsonl':
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif extension == '.json':
+        with open(path, encoding='utf-8') as f:
+            yield from _iter_json_array(f)
+    else:
+        raise ValueError(f"don't know how to read {path!r}, expected .csv, .json or .jsonl")
+
+
+def iter_resume_chunks(
+    path: str,
+    chunk_size: int = 1000,
+    id_field: str = 'id'
+) -> Iterator[List[Tuple]]:
+    """yield lists of (resume_id, text), at most chunk_size long
+
+    Records without an id get their 1-based position in the file, same as
+    the CSV ids.
+    """
+    return _iter_chunks(path, chunk_size, id_field, resume_text)
+
+
+def iter_field_chunks(
+    path: str,
+    chunk_size: int = 1000,
+    id_field: str = 'id'
+) -> Iterator[List[Tuple]]:
+    """iter_resume_chunks with the fields kept apart - lists of (resume_id, fields dict)"""
+    return _iter_chunks(path, chunk_size, id_field, resume_fields)
+
+
+def load_resume_texts(path: str) -> List[str]:
+    """all resume texts from a file, in file order"""
+    return [text for chunk in iter_resume_chunks(path) for _, text in chunk]
+
+
+def load_resume_fields(path: str, id_field: str = 'id') -> Tuple[List, List[Dict[str, str]]]:
+    """ids and field dicts of all resumes in a file, in file order (see FieldIndex.build)"""
+    resume_ids, records = [], []
+    for chunk in iter_field_chunks(path, id_field=id_field):
+        for resume_id, fields in chunk:
+            resume_ids.append(resume_id)
+            records.append(fields)
+    return resume_ids, records
+
+
+def load_resume_columns(path: str, columns=STRUCTURED_FIELDS) -> Dict[str, List]:
+    """structured fields of all resumes in a file, column by column (see ResumeIndex.set_columns)"""
+    values = {column: [] for column in columns}
+    for record in iter_records(path):
+        for column in columns:
+            values[column].append(record.get(column))
+    return values
+
+
+def build_index_from_file(path: str, matcher=None, chunk_size: int = 1000, columns=(), **kwargs):
+    """stream a resume file into a ResumeIndex (see ResumeMatcher.build_index_streaming)
+
+    columns are structured fields to keep for the rank filters, e.g.
+    columns=STRUCTURED_FIELDS - read in one more pass over the file.
+    """
+    from resume_matcher import ResumeMatcher
+
+    if matcher is None:
+        matcher = ResumeMatcher()
+    index = matcher.build_index_streaming(
+        lambda: iter_resume_chunks(path, chunk_size=chunk_size), **kwargs
+    )
+    if columns:
+        index.set_columns(load_resume_columns(path, columns))
+    return index
+
+
+def _iter_chunks(
+    path: str,
+    chunk_size: int,
+    id_field: str,
+    convert: Callable[[Dict], Any]
+) -> Iterator[List[Tuple]]:
+    chunk = []
+    for position, record in enumerate(iter_records(path), 1):
+        chunk.append((_record_id(record.get(id_field), position), convert(record)))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _record_id(value, position: int):
+    if value is None or value == '':
+        return position
+    # csv ids come in as strings, json ones as ints - make them agree
+    if isinstance(value, str) and value.isdigit():
+        return int(value)
+    return value
+
+
+def _iter_json_array(f, read_size: int = 1 << 16) -> Iterator[Dict]:
+    """yield the items of a top-level JSON array without loading the whole file"""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    eof = False
+
+    while True:
+        # skip whitespace, the opening bracket, separators and /* comments */
+        # (sample_resumes.json has one between items)
+        while position < len(buffer):
+            char = buffer[position]
+            if char == '[' and not started:
+                started = True
+            elif buffer.startswith('/*', position):
+                end = buffer.find('*/', position + 2)
+                if end == -1:
+                    break
+                position = end + 1
+            elif not (char.isspace() or char == ','):
+                break
+            position += 1
+
+        if position < len(buffer) and buffer[position] == ']':
+            return
+
+        if position < len(buffer) and not buffer.startswith('/*', position):
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # item is cut off at the end of the buffer - read more
+                if eof:
+                    raise
+            else:
+                if not started:
+                    raise ValueError("expected a JSON array of resume records")
+                yield item
+                position = end
+                continue
+        if eof:
+            if started:
+                raise ValueError("unexpected end of JSON array")
+            return
+
+        data = f.read(read_size)
+        eof = not data
+        buffer = buffer[position:] + data
+        position = 0
@@ -3,34 +3,466 @@ Resume Screening System
 Matches resumes to jobs using NLP stuff
 """
 
+import contextlib
+import contextvars
+import functools
+import hashlib
+import heapq
+import itertools
+import json
+import os
 import re
+import shelve
 import string
-from typing import List, Dict, Tuple
+import threading
+import time
+from collections import Counter, OrderedDict
+from numbers import Integral
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Iterator, List, Dict, Tuple, Union
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
 
-# grab NLTK stuff - needed for tokenization
-try:
-    nltk.data.find('tokenizers/punkt_tab')
-except LookupError:
-    nltk.download('punkt_tab', quiet=True)
+# sklearn, scipy and nltk are imported where they're used - together they're
+# seconds of import time and nltk may try the network, so `import resume_matcher`
+# stays cheap and offline. Call prepare_resources() to fetch the NLTK data.
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+    from scipy import sparse
+    from sklearn.feature_extraction.text import TfidfVectorizer
 
-# stopwords too
-try:
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('stopwords', quiet=True)
+
+# NLTK data this module can use: download name -> nltk.data path
+NLTK_RESOURCES = {
+    'punkt_tab': 'tokenizers/punkt_tab',
+    'stopwords': 'corpora/stopwords',
+}
+
+# copy of NLTK's english stopword list, used when the corpus isn't installed
+ENGLISH_STOP_WORDS = frozenset("""
+a about above after again against ain all am an and any are aren aren't as at
+be because been before being below between both but by can couldn couldn't d
+did didn didn't do does doesn doesn't doing don don't down during each few for
+from further had hadn hadn't has hasn hasn't have haven haven't having he he'd
+he'll he's her here hers herself him himself his how i i'd i'll i'm i've if in
+into is isn isn't it it'd it'll it's its itself just ll m ma me mightn mightn't
+more most mustn mustn't my myself needn needn't no nor not now o of off on once
+only or other our ours ourselves out over own re s same shan shan't she she'd
+she'll she's should should've shouldn shouldn't so some such t than that
+that'll the their theirs them themselves then there these they they'd they'll
+they're they've this those through to too under until up ve very was wasn
+wasn't we we'd we'll we're we've were weren weren't what when where which while
+who whom why will with won won't wouldn wouldn't y you you'd you'll you're
+you've your yours yourself yourselves
+""".split())
+
+
+def prepare_resources(download: bool = True, quiet: bool = True) -> Dict[str, bool]:
+    """find (and optionally download) the NLTK data - run at deploy time, not import
+    
+    Returns which resources are installed afterwards. Nothing needs them by
+    default: the regex tokenizer doesn't use punkt and stopwords fall back to
+    ENGLISH_STOP_WORDS.
+    """
+    import nltk
+    
+    available = {}
+    for name, path in NLTK_RESOURCES.items():
+        try:
+            nltk.data.find(path)
+        except LookupError:
+            if download:
+                nltk.download(name, quiet=quiet)
+        try:
+            nltk.data.find(path)
+            available[name] = True
+        except LookupError:
+            available[name] = False
+    
+    # pick up a freshly downloaded stopword list
+    english_stop_words.cache_clear()
+    return available
+
+
+@functools.lru_cache(maxsize=None)
+def english_stop_words() -> frozenset:
+    """NLTK english stopwords, or the vendored copy when nltk/the corpus is missing"""
+    try:
+        from nltk.corpus import stopwords
+        return frozenset(stopwords.words('english'))
+    except (ImportError, LookupError):
+        return ENGLISH_STOP_WORDS
+
+
+# compiled once - clean_text runs on every job and resume
+URL_PATTERN = re.compile(r'http\S+|www.\S+')
+EMAIL_PATTERN = re.compile(r'\S+@\S+')
+SPECIAL_CHARS_PATTERN = re.compile(r'[^a-z0-9\s\-./]')
+
+# after clean_text only [a-z0-9\s\-./] is left, so tokens are whitespace runs
+# except that treebank splits out "..." and "--" on their own
+TOKEN_PATTERN = re.compile(r'\.\.\.|--|(?:(?!\.\.\.|--)\S)+')
+# punkt's number type - '2019.', '3.8.', '1,000.'
+NUMBER_PATTERN = re.compile(r'-?[.,]?\d[\d,.-]*\.?')
+
+
+def regex_tokenize(text: str) -> List[str]:
+    """fast word_tokenize stand-in for text that already went through clean_text
+    
+    word_tokenize splits the period off the end of a sentence. Punkt doesn't
+    end a sentence after a number when a lowercase word follows, so mid-text
+    '2019.' and '3.8.' keep their period - and clean_text lowercased
+    everything. Punkt also looks at how its training data capitalized the next
+    word; that part isn't reproduced.
+    """
+    found = TOKEN_PATTERN.findall(text)
+    tokens = []
+    for position, token in enumerate(found):
+        if token.endswith('.') and not token.endswith('..'):
+            following = found[position + 1][:1] if position + 1 < len(found) else ''
+            if not (following.islower() and NUMBER_PATTERN.fullmatch(token)):
+                token = token[:-1]
+        if token:
+            tokens.append(token)
+    return tokens
+
+
+def nltk_tokenize(text: str) -> List[str]:
+    """NLTK word_tokenize - needs the punkt_tab data, see prepare_resources()"""
+    from nltk.tokenize import word_tokenize
+    return word_tokenize(text)
+
+
+TOKENIZERS = {
+    'regex': regex_tokenize,
+    'nltk': nltk_tokenize,
+}
+
+
+class _Stage:
+    """times one stage of a call and hands it to the recorder on exit"""
+    
+    __slots__ = ('recorder', 'name', 'info', 'start')
+    
+    def __init__(self, recorder, name: str, info: Dict):
+        self.recorder = recorder
+        self.name = name
+        self.info = info
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.recorder(self.name, time.perf_counter() - self.start, self.info)
+        return False
+    
+    def set(self, **info):
+        """attach things only known after the work, like matrix shapes"""
+        self.info.update(info)
+
+
+class _NullStage:
+    """what stage() hands out with no recorder - does nothing"""
+    
+    __slots__ = ()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        return False
+    
+    def set(self, **info):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+# {id(matcher): recorder} set by ResumeMatcher.instrument() - per thread/task,
+# so scoping a recorder on a shared matcher doesn't leak into other callers
+_SCOPED_RECORDERS = contextvars.ContextVar('resume_matcher_recorders', default=None)
+
+
+class TextCache:
+    """bounded cache for clean_text/extract_keywords results, keyed by content hash
+    
+    eviction is 'lru' (hits refresh an entry) or 'fifo' (oldest insert goes
+    first). With a path the entries also go to a shelve file, so they survive
+    restarts - only the in-memory part is bounded.
+    """
+    
+    EVICTION_POLICIES = ('lru', 'fifo')
+    
+    def __init__(self, max_size: int = 10000, eviction: str = 'lru', path: str = None):
+        if eviction not in self.EVICTION_POLICIES:
+            raise ValueError(f"unknown eviction {eviction!r}, expected one of {self.EVICTION_POLICIES}")
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.max_size = max_size
+        self.eviction = eviction
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._disk = shelve.open(path) if path else None
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get(self, key: str):
+        """cached value or None"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                if self.eviction == 'lru':
+                    self._entries.move_to_end(key)
+            elif self._disk is not None and key in self._disk:
+                value = self._disk[key]
+                self._remember(key, value)
+            
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+    
+    def put(self, key: str, value):
+        with self._lock:
+            self._remember(key, value)
+            if self._disk is not None:
+                self._disk[key] = value
+    
+    def _remember(self, key: str, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+    
+    def stats(self) -> Dict:
+        """hit/miss counters, e.g. for a metrics exporter"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._disk is not None:
+                self._disk.clear()
+    
+    def close(self):
+        """flush and close the disk part"""
+        with self._lock:
+            if self._disk is not None:
+                self._disk.close()
+                self._disk = None
+    
+    @staticmethod
+    def digest(text: str) -> str:
+        return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class SkillMatcher:
+    """word-level Aho-Corasick automaton over a skill list
+    
+    Skills are token sequences ('machine learning' -> machine, learning), and
+    find() reports every occurrence of every skill - single words and phrases,
+    overlapping ones too - in one left to right pass over a token list, however
+    many skills there are.
+    """
+    
+    def __init__(self, skills: Iterable[str], tokenize: Callable[[str], List[str]] = regex_tokenize):
+        # node 0 is the root; goto[node][token] -> node
+        self._goto = [{}]
+        self._fail = [0]
+        # (skill, length in tokens) for every skill ending at the node
+        self._out = [()]
+        self.n_skills = 0
+        for skill in skills:
+            tokens = tokenize(skill)
+            if tokens:
+                self._insert(tokens, skill)
+        self._link()
+    
+    def _insert(self, tokens: List[str], skill: str):
+        node = 0
+        for token in tokens:
+            child = self._goto[node].get(token)
+            if child is None:
+                child = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+                self._goto[node][token] = child
+            node = child
+        if (skill, len(tokens)) not in self._out[node]:
+            self._out[node] += ((skill, len(tokens)),)
+            self.n_skills += 1
+    
+    def _link(self):
+        """failure links, breadth first - each node falls back to its longest proper suffix"""
+        queue = list(self._goto[0].values())
+        for node in queue:
+            for token, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(token, 0)
+                self._fail[child] = target if target != child else 0
+                # a match ending here also ends every skill that's a suffix of it
+                self._out[child] += self._out[self._fail[child]]
+    
+    def find(self, tokens: List[str]) -> List[Tuple[int, int, str]]:
+        """(start, end, skill) for every skill in tokens - tokens[start:end] is the match"""
+        goto, fail, out = self._goto, self._fail, self._out
+        matches = []
+        node = 0
+        for position, token in enumerate(tokens):
+            while node and token not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(token, 0)
+            for skill, length in out[node]:
+                matches.append((position + 1 - length, position + 1, skill))
+        return matches
+
+
+class KeywordModel:
+    """stop words and technical keywords compiled for keyword scoring
+    
+    Every token's weight gets worked out once and remembered - 0 for junk
+    (stop words, short tokens, numbers), 2 for single-word skills, 1 for the
+    rest - so scoring a text is a table lookup per token and a Counter. Skill
+    phrases ('machine learning') score 2 per occurrence as keywords of their
+    own; the automaton only runs when a phrase's first word is in the text.
+    """
+    
+    # tokens remembered at most, the table starts over when it fills up
+    MAX_TOKENS = 1 << 20
+    # distinct keywords before top_keywords switches from sorting to a heap
+    HEAP_MIN = 2048
+    
+    def __init__(
+        self,
+        stop_words: Iterable[str],
+        technical_keywords: Iterable[str],
+        tokenize: Callable[[str], List[str]]
+    ):
+        self.stop_words = frozenset(stop_words)
+        self.technical_keywords = frozenset(technical_keywords)
+        self.tokenize = tokenize
+        self.skills = SkillMatcher(self.technical_keywords, tokenize)
+        self.skill_tokens = set()
+        self.phrase_starts = set()
+        for skill in self.technical_keywords:
+            skill_tokens = tokenize(skill)
+            if len(skill_tokens) == 1:
+                self.skill_tokens.add(skill_tokens[0])
+            elif skill_tokens:
+                self.phrase_starts.add(skill_tokens[0])
+        self.weights = {}
+    
+    def learn(self, tokens: List[str]) -> Dict[str, float]:
+        """weigh the tokens that aren't in the table yet, returns a table holding all of them
+        
+        A full table gets swapped for a new one rather than cleared, so other
+        threads still reading the old one keep every token they learned.
+        """
+        weights = self.weights
+        new = set(tokens).difference(weights)
+        if not new:
+            return weights
+        if len(weights) + len(new) > self.MAX_TOKENS:
+            weights = self.weights = {}
+            new = set(tokens)
+        for token in new:
+            # filter out junk - stopwords and single chars
+            if token in self.stop_words or len(token) <= 2 or token.isdigit():
+                weights[token] = 0.0
+            else:
+                # technical stuff counts more
+                weights[token] = 2.0 if token in self.skill_tokens else 1.0
+        return weights
+    
+    def top_keywords(self, tokens: List[str], top_n: int) -> List[Tuple[str, float]]:
+        """(keyword, score) best first, ties in order of first appearance"""
+        weights = self.learn(tokens)
+        if self.phrase_starts.isdisjoint(tokens):
+            # Counter keeps first-appearance order, then the few skills get doubled
+            scores = Counter([token for token in tokens if weights[token]])
+            for token in self.skill_tokens.intersection(scores):
+                scores[token] *= 2.0
+        else:
+            phrases = {}
+            for start, end, skill in self.skills.find(tokens):
+                if end - start > 1:
+                    phrases.setdefault(end - 1, []).append(skill)
+            # a phrase lands right after the token it ends on
+            scores = {}
+            for position, token in enumerate(tokens):
+                weight = weights[token]
+                if weight:
+                    scores[token] = scores.get(token, 0) + weight
+                for phrase in phrases.get(position, ()):
+                    scores[phrase] = scores.get(phrase, 0) + 2.0
+        
+        # both are sorted(...)[:top_n] with ties kept in order - the heap only
+        # beats a plain sort once there are a lot more keywords than top_n
+        if top_n is not None and 0 <= top_n and len(scores) > self.HEAP_MIN:
+            top = heapq.nlargest(top_n, scores, key=scores.__getitem__)
+        else:
+            top = sorted(scores, key=scores.__getitem__, reverse=True)[:top_n]
+        return [(keyword, scores[keyword]) for keyword in top]
+
+
+def load_skill_taxonomy(path: str) -> List[str]:
+    """skills from a file - a JSON list, or plain text with one skill per line (# comments)"""
+    with open(path, encoding='utf-8') as f:
+        if path.endswith('.json'):
+            return [str(skill) for skill in json.load(f)]
+        skills = []
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if line:
+                skills.append(line)
+        return skills
 
 
 class ResumeKeywordExtractor:
     """Gets keywords from text"""
     
-    def __init__(self):
-        self.stop_words = set(stopwords.words('english'))
+    def __init__(
+        self,
+        tokenizer: Union[str, Callable[[str], List[str]]] = 'regex',
+        cache: TextCache = None
+    ):
+        """tokenizer is 'regex' (fast, default), 'nltk' (word_tokenize) or any callable
+        
+        cache is an optional TextCache so repeat texts skip cleaning/tokenizing.
+        """
+        if callable(tokenizer):
+            self.tokenize = tokenizer
+        elif tokenizer in TOKENIZERS:
+            self.tokenize = TOKENIZERS[tokenizer]
+        else:
+            raise ValueError(
+                f"unknown tokenizer {tokenizer!r}, expected one of {sorted(TOKENIZERS)} or a callable"
+            )
+        self.tokenizer = tokenizer
+        self.cache = cache
+        # bumped whenever the word sets change, the compiled model and digest follow it
+        self._version = 0
+        self._config_digest = None
+        self._keyword_model = None
+        self.stop_words = set(english_stop_words())
         # keywords that matter more - like programming stuff
         self.technical_keywords = {
             'python', 'javascript', 'java', 'sql', 'react', 'node.js', 'aws',
@@ -39,114 +471,494 @@ class ResumeKeywordExtractor:
             'microservices', 'agile', 'scrum', 'git', 'ci/cd', 'devops'
         }
     
+    def __getstate__(self):
+        # the cache holds a lock and maybe a shelve handle, it stays in this process
+        state = self.__dict__.copy()
+        state['cache'] = None
+        # the token table can get big, the other side rebuilds it
+        state['_keyword_model'] = None
+        return state
+    
+    @property
+    def stop_words(self) -> set:
+        return self._stop_words
+    
+    @stop_words.setter
+    def stop_words(self, words: set):
+        self._stop_words = words
+        self.recompile()
+    
+    @property
+    def technical_keywords(self) -> set:
+        return self._technical_keywords
+    
+    @technical_keywords.setter
+    def technical_keywords(self, keywords: set):
+        self._technical_keywords = keywords
+        self.recompile()
+    
+    def recompile(self):
+        """rebuild the keyword model and config digest on next use
+        
+        Assigning stop_words/technical_keywords (or load_skills) does this
+        already; call it after editing either set in place.
+        """
+        self._version += 1
+    
+    def config_digest(self) -> str:
+        """hash of everything that changes the keywords - part of the cache key"""
+        cached = self._config_digest
+        if cached is None or cached[0] != self._version or cached[1] is not self.tokenizer:
+            version = self._version
+            tokenizer = self.tokenizer
+            if callable(tokenizer):
+                tokenizer = f"{tokenizer.__module__}.{getattr(tokenizer, '__qualname__', tokenizer)}"
+            config = '\n'.join([
+                tokenizer,
+                ' '.join(sorted(self.stop_words)),
+                ' '.join(sorted(self.technical_keywords)),
+            ])
+            cached = self._config_digest = (version, self.tokenizer, TextCache.digest(config))
+        return cached[2]
+    
+    def load_skills(self, path: str, replace: bool = False):
+        """add the skills in a taxonomy file (see load_skill_taxonomy) to technical_keywords"""
+        skills = {
+            ' '.join(self.tokenize(self._clean_text(skill)))
+            for skill in load_skill_taxonomy(path)
+        }
+        skills.discard('')
+        if replace:
+            self.technical_keywords = skills
+        else:
+            self.technical_keywords |= skills
+    
+    def skill_matcher(self) -> SkillMatcher:
+        """technical_keywords compiled into a SkillMatcher, rebuilt when they change (see recompile)"""
+        return self.keyword_model().skills
+    
+    def keyword_model(self) -> 'KeywordModel':
+        """stop_words/technical_keywords compiled for scoring, rebuilt when they change"""
+        cached = self._keyword_model
+        if cached is None or cached[0] != self._version or cached[1].tokenize is not self.tokenize:
+            version = self._version
+            cached = self._keyword_model = (
+                version, KeywordModel(self.stop_words, self.technical_keywords, self.tokenize)
+            )
+        return cached[1]
+    
     def clean_text(self, text: str) -> str:
         """normalize text - lowercase it, remove junk"""
+        if self.cache is not None:
+            key = f"clean:{TextCache.digest(text)}"
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        
+        cleaned = self._clean_text(text)
+        
+        if self.cache is not None:
+            self.cache.put(key, cleaned)
+        return cleaned
+    
+    def _clean_text(self, text: str) -> str:
         text = text.lower()
-        text = re.sub(r'http\S+|www.\S+', '', text)  # urls
-        text = re.sub(r'\S+@\S+', '', text)  # emails
-        text = re.sub(r'[^a-z0-9\s\-./]', '', text)  # special chars
+        text = URL_PATTERN.sub('', text)  # urls
+        text = EMAIL_PATTERN.sub('', text)  # emails
+        text = SPECIAL_CHARS_PATTERN.sub('', text)  # special chars
         return text
     
     def extract_keywords(self, text: str, top_n: int = 15) -> List[str]:
         """get the important words"""
-        cleaned_text = self.clean_text(text)
-        tokens = word_tokenize(cleaned_text)
-        
-        # filter out junk - stopwords and single chars
-        keywords = [
-            token for token in tokens
-            if token not in self.stop_words 
-            and len(token) > 2
-            and not token.isdigit()
-        ]
-        
-        # score them - technical stuff counts more
-        keyword_scores = {}
-        for keyword in keywords:
-            weight = 2.0 if keyword in self.technical_keywords else 1.0
-            keyword_scores[keyword] = keyword_scores.get(keyword, 0) + weight
+        return self._cached_keywords('keywords', text, top_n, self.clean_text)
+    
+    def extract_keywords_from_clean(self, cleaned_text: str, top_n: int = 15) -> List[str]:
+        """extract_keywords for text that already went through clean_text"""
+        return self._cached_keywords('clean-keywords', cleaned_text, top_n, None)
+    
+    def _cached_keywords(self, kind: str, text: str, top_n: int, clean) -> List[str]:
+        if self.cache is not None:
+            key = f"{kind}:{TextCache.digest(text)}:{self.config_digest()}:{top_n}"
+            cached = self.cache.get(key)
+            if cached is not None:
+                return list(cached)
         
-        # sort and get top N
-        top_keywords = sorted(
-            keyword_scores.items(),
-            key=lambda x: x[1],
-            reverse=True
-        )[:top_n]
+        keywords = self._keywords(clean(text) if clean else text, top_n)
         
-        return [kw[0] for kw in top_keywords]
+        if self.cache is not None:
+            self.cache.put(key, tuple(keywords))
+        return keywords
+    
+    def _keywords(self, cleaned_text: str, top_n: int) -> List[str]:
+        tokens = self.tokenize(cleaned_text)
+        return [keyword for keyword, _ in self.keyword_model().top_keywords(tokens, top_n)]
 
 
 class ResumeMatcher:
     """Matches resumes to jobs"""
     
-    def __init__(self):
-        self.vectorizer = TfidfVectorizer(
-            max_features=500,
-            stop_words='english',
-            ngram_range=(1, 2)
-        )
-        self.keyword_extractor = ResumeKeywordExtractor()
+    # 70/30 split - similarity is more important
+    SIMILARITY_WEIGHT = 0.7
+    KEYWORD_WEIGHT = 0.3
+    
+    # vectorizer defaults, vectorizer_params overrides any of them
+    VECTORIZER_PARAMS = {
+        'max_features': 500,
+        'stop_words': 'english',
+        'ngram_range': (1, 2),
+    }
+    # hashing=True - no vocabulary, so no max_features; 2**20 columns like HashingVectorizer
+    HASHING_PARAMS = {
+        'n_features': 2 ** 20,
+        'stop_words': 'english',
+        'ngram_range': (1, 2),
+    }
+    
+    def __init__(
+        self,
+        tokenizer: Union[str, Callable[[str], List[str]]] = 'regex',
+        cache: TextCache = None,
+        recorder: Callable[[str, float, Dict], None] = None,
+        vectorizer_params: Dict = None,
+        dtype=np.float64,
+        hashing: bool = False
+    ):
+        """vectorizer_params go to TfidfVectorizer (or HashedTfidfVectorizer with
+        hashing=True) on top of the defaults; dtype is what the TF-IDF matrices
+        are stored as, np.float32 halves them
+        """
+        # gets (stage, seconds, info) for every timed stage - see resume_metrics
+        self.recorder = recorder
+        
+        params = dict(self.HASHING_PARAMS if hashing else self.VECTORIZER_PARAMS, dtype=dtype)
+        params.update(vectorizer_params or {})
+        if hashing:
+            self.vectorizer = HashedTfidfVectorizer(**params)
+        else:
+            from sklearn.feature_extraction.text import TfidfVectorizer
+            
+            self.vectorizer = TfidfVectorizer(**params)
+        self.keyword_extractor = ResumeKeywordExtractor(tokenizer=tokenizer, cache=cache)
+    
+    def __getstate__(self):
+        # recorders hold locks and such - a copy sent to another process records nothing
+        state = self.__dict__.copy()
+        state['recorder'] = None
+        return state
+    
+    def stage(self, name: str, **info):
+        """context manager timing a stage for the recorder - free when there isn't one
+        
+        info (doc counts etc.) goes to the recorder as is, add more with .set()
+        inside the block.
+        """
+        recorder = self.recorder
+        scoped = _SCOPED_RECORDERS.get()
+        if scoped is not None:
+            recorder = scoped.get(id(self), recorder)
+        if recorder is None:
+            return _NULL_STAGE
+        return _Stage(recorder, name, info)
+    
+    @contextlib.contextmanager
+    def instrument(self, recorder: Callable[[str, float, Dict], None]):
+        """send stage timings to recorder just for the with block
+        
+        Only calls made from this thread (or asyncio task) are recorded, other
+        threads using the same matcher keep going to self.recorder.
+        """
+        scoped = dict(_SCOPED_RECORDERS.get() or {})
+        scoped[id(self)] = recorder
+        token = _SCOPED_RECORDERS.set(scoped)
+        try:
+            yield recorder
+        finally:
+            _SCOPED_RECORDERS.reset(token)
     
     def preprocess_text(self, text: str) -> str:
         """clean up text before matching"""
         return self.keyword_extractor.clean_text(text)
     
-    def calculate_similarity(self, job_desc: str, resumes: List[str]) -> List[Dict]:
+    def combine_scores(self, similarity_score, keyword_score):
+        """weighted mix of the two scores (works on floats or numpy arrays)"""
+        return (similarity_score * self.SIMILARITY_WEIGHT) + (keyword_score * self.KEYWORD_WEIGHT)
+    
+    def calculate_similarity(self, job_desc: str, resumes: List[str]) -> 'RankedResults':
         """figure out how much each resume matches the job"""
-        # clean everything
-        processed_job = self.preprocess_text(job_desc)
-        processed_resumes = [self.preprocess_text(resume) for resume in resumes]
-        
-        # get job keywords
-        job_keywords = set(self.keyword_extractor.extract_keywords(job_desc))
+        with self.stage('calculate_similarity', resumes=len(resumes)):
+            scores = self._one_shot_index(job_desc, resumes).calculate_similarity(job_desc)
+            return scores.without_ids()
+    
+    def build_index(
+        self,
+        resumes: List[str],
+        resume_ids: List = None,
+        n_jobs: int = 1,
+        chunk_size: int = 1000,
+        executor: 'Executor' = None,
+        columns: Dict[str, List] = None
+    ) -> 'ResumeIndex':
+        """fit TF-IDF once over the resume pool so jobs can be scored against it later
         
-        # vectorize
-        all_texts = [processed_job] + processed_resumes
-        tfidf_matrix = self.vectorizer.fit_transform(all_texts)
+        n_jobs/chunk_size/executor are passed to preprocess_corpus. columns are
+        structured fields for the rank filters (see ResumeIndex.set_columns).
+        """
+        from sklearn.base import clone
         
-        # calc similarity
-        similarities = cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:])
+        if not resumes:
+            raise ValueError("need at least one resume to build an index")
+        if resume_ids is not None and len(resume_ids) != len(resumes):
+            raise ValueError("resume_ids and resumes must be the same length")
         
-        results = []
-        for idx, resume in enumerate(processed_resumes):
-            resume_keywords = set(
-                self.keyword_extractor.extract_keywords(resume)
+        with self.stage('build_index', resumes=len(resumes)):
+            with self.stage('preprocess', docs=len(resumes)):
+                processed_resumes, resume_keywords = self.preprocess_corpus(
+                    resumes, n_jobs=n_jobs, chunk_size=chunk_size, executor=executor
+                )
+            
+            # own copy of the vectorizer - calculate_similarity refits self.vectorizer
+            vectorizer = clone(self.vectorizer)
+            with self.stage('fit', docs=len(processed_resumes)) as stage:
+                resume_matrix = vectorizer.fit_transform(processed_resumes)
+                stage.set(shape=resume_matrix.shape)
+            
+            with self.stage('keyword_matrix') as stage:
+                keyword_matrix, keyword_terms = build_keyword_matrix(resume_keywords)
+                stage.set(shape=keyword_matrix.shape)
+            
+            return ResumeIndex(
+                self, vectorizer, resume_matrix, keyword_matrix, keyword_terms,
+                resume_ids, texts=processed_resumes, columns=columns
             )
+    
+    def build_job_index(self, jobs: List[str], job_ids: List = None, n_jobs: int = 1) -> 'JobIndex':
+        """the other way round - fit over the open jobs so resumes can be scored against them"""
+        from sklearn.base import clone
+        
+        if not jobs:
+            raise ValueError("need at least one job to build a job index")
+        if job_ids is not None and len(job_ids) != len(jobs):
+            raise ValueError("job_ids and jobs must be the same length")
+        
+        with self.stage('build_job_index', jobs=len(jobs)):
+            with self.stage('preprocess', docs=len(jobs)):
+                processed_jobs, job_keywords = self.preprocess_corpus(jobs, n_jobs=n_jobs)
             
-            # how many keywords match
-            matched_keywords = job_keywords & resume_keywords
-            keyword_match_score = len(matched_keywords) / max(len(job_keywords), 1)
+            vectorizer = clone(self.vectorizer)
+            with self.stage('fit', docs=len(processed_jobs)) as stage:
+                job_matrix = vectorizer.fit_transform(processed_jobs)
+                stage.set(shape=job_matrix.shape)
             
-            similarity_score = similarities[0][idx]
-            keyword_score = keyword_match_score
+            with self.stage('keyword_matrix') as stage:
+                keyword_matrix, keyword_terms = build_keyword_matrix(job_keywords)
+                stage.set(shape=keyword_matrix.shape)
+            
+            return JobIndex(self, vectorizer, job_matrix, keyword_matrix, keyword_terms, job_ids)
+    
+    def build_index_streaming(
+        self,
+        make_chunks: Callable[[], Iterable[List[Tuple[Any, str]]]],
+        keep_texts: bool = False,
+        n_jobs: int = 1,
+        executor: 'Executor' = None
+    ) -> 'ResumeIndex':
+        """build an index from chunks of (resume_id, text) without holding the corpus
+        
+        make_chunks gets called twice - a vocabulary/document-frequency pass and
+        then a transform pass - so it has to hand back a fresh iterator each time,
+        e.g. lambda: iter_resume_chunks(path). Peak memory is one chunk of text
+        plus the term counts and the index itself. Cleaned texts are only kept
+        (for refit) with keep_texts=True. With n_jobs > 1 (or -1 for all cores)
+        one process pool is shared by every chunk of the second pass.
+        """
+        from scipy import sparse
+        from sklearn.base import clone
+        
+        vectorizer = clone(self.vectorizer)
+        analyzer = vectorizer.build_analyzer()
+        
+        build_stage = self.stage('build_index')
+        with build_stage:
+            # pass 1 - same vocabulary and IDF a fit_transform over everything would give
+            with self.stage('fit') as stage:
+                n_docs = 0
+                if isinstance(vectorizer, HashedTfidfVectorizer):
+                    # no vocabulary to agree on, document frequencies just add up
+                    doc_freqs = 0
+                    for chunk in make_chunks():
+                        doc_freqs = doc_freqs + vectorizer.document_frequencies(
+                            [self.preprocess_text(text) for _, text in chunk]
+                        )
+                        n_docs += len(chunk)
+                    if not n_docs:
+                        raise ValueError("need at least one resume to build an index")
+                    vectorizer.fit_from_frequencies(doc_freqs, n_docs)
+                else:
+                    term_counts = Counter()
+                    doc_counts = Counter()
+                    for chunk in make_chunks():
+                        for _, text in chunk:
+                            counts = Counter(analyzer(self.preprocess_text(text)))
+                            term_counts.update(counts)
+                            doc_counts.update(counts.keys())
+                            n_docs += 1
+                    if not n_docs:
+                        raise ValueError("need at least one resume to build an index")
+                    _fit_vectorizer_from_counts(vectorizer, term_counts, doc_counts, n_docs)
+                    del term_counts, doc_counts
+                stage.set(docs=n_docs)
             
-            # 70/30 split - similarity is more important
-            final_score = (similarity_score * 0.7) + (keyword_score * 0.3)
+            # pass 2 - transform chunk by chunk
+            if n_jobs == -1:
+                n_jobs = os.cpu_count() or 1
+            resume_ids = []
+            texts = [] if keep_texts else None
+            matrices = []
+            resume_keywords = []
+            with contextlib.ExitStack() as pool_scope:
+                if executor is None and n_jobs > 1:
+                    # one pool for the whole pass, not a fresh one (and fresh workers) per chunk
+                    from concurrent.futures import ProcessPoolExecutor
+                    
+                    executor = pool_scope.enter_context(ProcessPoolExecutor(max_workers=n_jobs))
+                for chunk in make_chunks():
+                    chunk_ids = [resume_id for resume_id, _ in chunk]
+                    with self.stage('preprocess', docs=len(chunk)):
+                        processed, keywords = self.preprocess_corpus(
+                            [text for _, text in chunk], n_jobs=n_jobs,
+                            chunk_size=max(1, -(-len(chunk) // max(n_jobs, 1))), executor=executor
+                        )
+                    with self.stage('vectorize', docs=len(chunk)) as stage:
+                        matrices.append(vectorizer.transform(processed))
+                        stage.set(shape=matrices[-1].shape)
+                    resume_keywords.extend(keywords)
+                    resume_ids.extend(chunk_ids)
+                    if keep_texts:
+                        texts.extend(processed)
             
-            results.append({
-                'resume_index': idx,
-                'similarity_score': float(similarity_score),
-                'keyword_match_score': float(keyword_score),
-                'final_score': float(final_score),
-                'matched_keywords': list(matched_keywords)
-            })
+            with self.stage('keyword_matrix') as stage:
+                keyword_matrix, keyword_terms = build_keyword_matrix(resume_keywords)
+                stage.set(shape=keyword_matrix.shape)
+            build_stage.set(resumes=n_docs)
+            
+            return ResumeIndex(
+                self, vectorizer, sparse.vstack(matrices, format='csr'),
+                keyword_matrix, keyword_terms, resume_ids, texts=texts
+            )
+    
+    def preprocess_corpus(
+        self,
+        resumes: List[str],
+        n_jobs: int = 1,
+        chunk_size: int = 1000,
+        executor: 'Executor' = None
+    ) -> Tuple[List[str], List[List[str]]]:
+        """clean + extract keywords for every resume, optionally over a process pool
         
-        return results
+        With n_jobs > 1 (or -1 for all cores) the resumes go out in chunks of
+        chunk_size to a ProcessPoolExecutor; pass executor to reuse your own.
+        Results always come back in resume order.
+        """
+        if n_jobs == -1:
+            n_jobs = os.cpu_count() or 1
+        chunks = [resumes[start:start + chunk_size] for start in range(0, len(resumes), chunk_size)]
+        
+        if executor is None and (n_jobs <= 1 or len(chunks) <= 1):
+            results = [_preprocess_chunk(self.keyword_extractor, chunk) for chunk in chunks]
+        elif executor is not None:
+            results = executor.map(_preprocess_chunk, itertools.repeat(self.keyword_extractor), chunks)
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+            
+            with ProcessPoolExecutor(max_workers=min(n_jobs, len(chunks))) as pool:
+                results = list(pool.map(
+                    _preprocess_chunk, itertools.repeat(self.keyword_extractor), chunks
+                ))
+        
+        processed_resumes = []
+        resume_keywords = []
+        for chunk_processed, chunk_keywords in results:
+            processed_resumes.extend(chunk_processed)
+            resume_keywords.extend(chunk_keywords)
+        return processed_resumes, resume_keywords
+    
+    def _one_shot_index(self, job_desc: str, resumes: List[str]) -> 'ResumeIndex':
+        """throwaway index with the job in the fit too, like the original per-call matching"""
+        return self._one_shot_job_index(job_desc, self._one_shot_pool(resumes))
+    
+    def _one_shot_pool(self, resumes: List[str]) -> Tuple[List[str], Any, List[str]]:
+        """the job-independent half of a one-shot index - cleaned resumes + keyword matrix"""
+        # clean everything
+        with self.stage('preprocess', docs=len(resumes)):
+            processed_resumes = [self.preprocess_text(resume) for resume in resumes]
+        
+        # tokenizing happens in here
+        with self.stage('keywords', docs=len(processed_resumes)):
+            resume_keywords = [
+                self.keyword_extractor.extract_keywords_from_clean(resume)
+                for resume in processed_resumes
+            ]
+        with self.stage('keyword_matrix') as stage:
+            keyword_matrix, keyword_terms = build_keyword_matrix(resume_keywords)
+            stage.set(shape=keyword_matrix.shape)
+        return processed_resumes, keyword_matrix, keyword_terms
+    
+    def _one_shot_job_index(self, job_desc: str, pool: Tuple[List[str], Any, List[str]]) -> 'ResumeIndex':
+        """fit the vectorizer on the job + a prepared pool"""
+        processed_resumes, keyword_matrix, keyword_terms = pool
+        with self.stage('preprocess', docs=1):
+            processed_job = self.preprocess_text(job_desc)
+        
+        # vectorize
+        all_texts = [processed_job] + processed_resumes
+        with self.stage('fit', docs=len(all_texts)) as stage:
+            tfidf_matrix = self.vectorizer.fit_transform(all_texts)
+            stage.set(shape=tfidf_matrix.shape)
+        
+        return ResumeIndex(
+            self, self.vectorizer, tfidf_matrix[1:], keyword_matrix, keyword_terms
+        )
     
     def rank_resumes(
         self,
         job_desc: str,
         resumes: List[str],
-        top_k: int = None
-    ) -> List[Dict]:
-        """rank resumes by relevance"""
-        scores = self.calculate_similarity(job_desc, resumes)
-        ranked = sorted(scores, key=lambda x: x['final_score'], reverse=True)
-        
-        if top_k:
-            ranked = ranked[:top_k]
+        top_k: int = None,
+        min_score: float = None
+    ) -> 'RankedResults':
+        """rank resumes by relevance - with min_score only the ones scoring at least that"""
+        with self.stage('rank_resumes', resumes=len(resumes)):
+            ranked = self._one_shot_index(job_desc, resumes).rank_resumes(job_desc, top_k, min_score)
+            return ranked.without_ids()
+    
+    def rank_many(
+        self,
+        job_descs: List[str],
+        resumes: List[str],
+        top_k: int = None,
+        min_score: float = None,
+        per_job_idf: bool = False
+    ) -> List['RankedResults']:
+        """rank the same resumes for several jobs
         
-        return ranked
+        One fit over the resumes, then all the jobs vectorized together and
+        scored with one jobs x resumes sparse product - build_index(resumes)
+        .rank_many(jobs). The IDF leaves the jobs out, so scores come out a
+        little different from rank_resumes, which fits with the job in it.
+        per_job_idf=True gives exactly the rank_resumes scores, at the price of
+        a refit per job (cleaning and keywords are still shared).
+        """
+        with self.stage('rank_many', jobs=len(job_descs), resumes=len(resumes)):
+            if not per_job_idf:
+                rankings = self.build_index(resumes).rank_many(job_descs, top_k, min_score=min_score)
+                return [ranked.without_ids() for ranked in rankings]
+            pool = self._one_shot_pool(resumes)
+            return [
+                self._one_shot_job_index(job_desc, pool)
+                .rank_resumes(job_desc, top_k, min_score)
+                .without_ids()
+                for job_desc in job_descs
+            ]
     
     def get_ranking_report(
         self,
@@ -177,6 +989,1409 @@ class ResumeMatcher:
         return report
 
 
+class MatchResult:
+    """one ranked resume - reads like the old result dict, built only when looked at
+    
+    Index results carry resume_id like they always did; the one-shot
+    ResumeMatcher calls have no ids, so their rows keep the old five keys
+    (resume_id is still there as an attribute, equal to resume_index).
+    """
+    
+    __slots__ = ('_results', '_position')
+    
+    KEYS = (
+        'resume_index', 'resume_id', 'similarity_score',
+        'keyword_match_score', 'final_score', 'matched_keywords'
+    )
+    # the key left out when the results have no ids
+    ID_KEY = 'resume_id'
+    
+    def __init__(self, results: 'RankedResults', position: int):
+        self._results = results
+        self._position = position
+    
+    @property
+    def resume_index(self) -> int:
+        return int(self._results.resume_index[self._position])
+    
+    @property
+    def resume_id(self):
+        return self._results.resume_id(self._position)
+    
+    @property
+    def similarity_score(self) -> float:
+        return float(self._results.similarity_score[self._position])
+    
+    @property
+    def keyword_match_score(self) -> float:
+        return float(self._results.keyword_match_score[self._position])
+    
+    @property
+    def final_score(self) -> float:
+        return float(self._results.final_score[self._position])
+    
+    @property
+    def matched_keywords(self) -> List[str]:
+        return self._results.matched_keywords(self._position)
+    
+    def __getitem__(self, key: str):
+        if key not in self.keys():
+            raise KeyError(key)
+        return getattr(self, key)
+    
+    def get(self, key: str, default=None):
+        return getattr(self, key) if key in self.keys() else default
+    
+    def __contains__(self, key) -> bool:
+        return key in self.keys()
+    
+    def __iter__(self):
+        return iter(self.keys())
+    
+    def __len__(self) -> int:
+        return len(self.keys())
+    
+    def keys(self):
+        if self._results._resume_ids is None:
+            return tuple(key for key in self.KEYS if key != self.ID_KEY)
+        return self.KEYS
+    
+    def values(self):
+        return [getattr(self, key) for key in self.keys()]
+    
+    def items(self):
+        return [(key, getattr(self, key)) for key in self.keys()]
+    
+    def to_dict(self) -> Dict:
+        return dict(self.items())
+    
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (MatchResult, dict)):
+            return self.to_dict() == dict(other.items())
+        return NotImplemented
+    
+    __hash__ = None
+    
+    def __repr__(self) -> str:
+        return f"MatchResult({self.to_dict()!r})"
+
+
+class RankedResults:
+    """results for one job as parallel arrays, best first (or row order for calculate_similarity)
+    
+    Scores are stored as float32; ranking happens before that, in float64.
+    Indexing gives MatchResult rows, which act like the old dicts; to_dicts()
+    gives the old list of dicts outright.
+    """
+    
+    __slots__ = (
+        'resume_index', 'similarity_score', 'keyword_match_score', 'final_score',
+        'job_keywords', '_resume_ids', '_keyword_matrix', '_keyword_terms', '_keyword_rows'
+    )
+    
+    def __init__(
+        self,
+        resume_index: np.ndarray,
+        similarity_score: np.ndarray,
+        keyword_match_score: np.ndarray,
+        final_score: np.ndarray,
+        resume_ids: List,
+        keyword_matrix,
+        keyword_terms: List[str],
+        job_keywords: set,
+        keyword_rows: np.ndarray = None
+    ):
+        self.resume_index = np.asarray(resume_index, dtype=np.int64)
+        self.similarity_score = np.asarray(similarity_score, dtype=np.float32)
+        self.keyword_match_score = np.asarray(keyword_match_score, dtype=np.float32)
+        self.final_score = np.asarray(final_score, dtype=np.float32)
+        self.job_keywords = job_keywords
+        # the index's row data as of now - later adds/refits swap these out
+        # on the index, they never change rows that are already there
+        self._resume_ids = resume_ids
+        self._keyword_matrix = keyword_matrix
+        self._keyword_terms = keyword_terms
+        # row of each result in keyword_matrix, when that isn't resume_index
+        # (results merged from several shards carry just their own rows)
+        self._keyword_rows = keyword_rows
+    
+    def __len__(self) -> int:
+        return len(self.resume_index)
+    
+    # what indexing hands out for one row
+    ROW = MatchResult
+    
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return type(self)(
+                self.resume_index[item], self.similarity_score[item],
+                self.keyword_match_score[item], self.final_score[item],
+                self._resume_ids, self._keyword_matrix, self._keyword_terms, self.job_keywords,
+                None if self._keyword_rows is None else self._keyword_rows[item]
+            )
+        position = range(len(self))[item]
+        return self.ROW(self, position)
+    
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self.ROW(self, position)
+    
+    def resume_id(self, position: int):
+        if self._resume_ids is None:
+            return int(self.resume_index[position])
+        return self._resume_ids[self.resume_index[position]]
+    
+    @property
+    def resume_ids(self) -> List:
+        if self._resume_ids is None:
+            return self.resume_index.tolist()
+        return [self._resume_ids[idx] for idx in self.resume_index]
+    
+    def without_ids(self) -> 'RankedResults':
+        """same results with rows in the old resume_id-less shape"""
+        results = self[:]
+        results._resume_ids = None
+        return results
+    
+    def matched_keywords(self, position: int) -> List[str]:
+        """the resume's stored keywords that are also job keywords"""
+        rows = self.resume_index if self._keyword_rows is None else self._keyword_rows
+        idx = rows[position]
+        matrix = self._keyword_matrix
+        start, end = matrix.indptr[idx], matrix.indptr[idx + 1]
+        return [
+            self._keyword_terms[col] for col in matrix.indices[start:end]
+            if self._keyword_terms[col] in self.job_keywords
+        ]
+    
+    def to_dicts(self) -> List[Dict]:
+        """the plain list of dicts the matcher used to return"""
+        return [result.to_dict() for result in self]
+    
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (RankedResults, list)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+    
+    __hash__ = None
+    
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dicts()!r})"
+
+
+class JobMatch(MatchResult):
+    """one ranked job for a resume - same scores, job_index/job_id instead of resume_*"""
+    
+    __slots__ = ()
+    
+    KEYS = (
+        'job_index', 'job_id', 'similarity_score',
+        'keyword_match_score', 'final_score', 'matched_keywords'
+    )
+    ID_KEY = 'job_id'
+    
+    @property
+    def job_index(self) -> int:
+        return int(self._results.resume_index[self._position])
+    
+    @property
+    def job_id(self):
+        return self._results.resume_id(self._position)
+
+
+class RankedJobs(RankedResults):
+    """JobIndex results - the row arrays hold job rows, rows read as JobMatch
+    
+    job_keywords is the query side here, i.e. the resume's keywords.
+    """
+    
+    __slots__ = ()
+    
+    ROW = JobMatch
+    
+    @property
+    def job_index(self) -> np.ndarray:
+        return self.resume_index
+    
+    @property
+    def job_ids(self) -> List:
+        return self.resume_ids
+
+
+# cleaned texts of a saved index, next to index.json - only read for a refit
+TEXTS_FILE = 'texts.json'
+
+
+class ResumeIndex:
+    """Resume pool with a fitted vectorizer - only the job gets vectorized per query"""
+    
+    FORMAT_VERSION = 5
+    # older formats load() still reads
+    READABLE_VERSIONS = (3, 4, 5)
+    # plain npy blobs so they can be memory mapped on load
+    ARRAY_FILES = (
+        'idf', 'data', 'indices', 'indptr',
+        'keyword_data', 'keyword_indices', 'keyword_indptr', 'alive'
+    )
+    # structured columns the min_years/title_contains filters look at
+    YEARS_COLUMN = 'years_experience'
+    TITLE_COLUMN = 'title'
+    
+    def __init__(
+        self,
+        matcher: ResumeMatcher,
+        vectorizer: 'TfidfVectorizer',
+        resume_matrix,
+        keyword_matrix,
+        keyword_terms: List[str],
+        resume_ids: List = None,
+        texts: List[str] = None,
+        alive: np.ndarray = None,
+        refit_threshold: float = None,
+        columns: Dict[str, Iterable] = None
+    ):
+        self.matcher = matcher
+        self._set_rows(
+            vectorizer, resume_matrix, keyword_matrix, keyword_terms, resume_ids, texts, alive
+        )
+        # refit in the background once drift goes past this (None = only refit by hand)
+        self.refit_threshold = refit_threshold
+        self._lock = threading.RLock()
+        # one refit at a time - a second one would snapshot rows the first is about to compact
+        self._refit_lock = threading.Lock()
+        self._refit_thread = None
+        # structured fields, one array per column with spare room like _alive
+        self._columns = {}
+        # lowercased copies of text columns for title_contains, dropped on any change
+        self._lowered = {}
+        if columns:
+            self.set_columns(columns)
+    
+    def _set_rows(self, vectorizer, resume_matrix, keyword_matrix, keyword_terms, resume_ids, texts, alive):
+        """swap in a whole set of rows, used on build and after a refit"""
+        self.vectorizer = vectorizer
+        self.resume_matrix = resume_matrix.tocsr()
+        # resumes x keyword vocabulary, 1 where the keyword is in the resume's top keywords
+        self.keyword_matrix = keyword_matrix.tocsr()
+        self.keyword_terms = list(keyword_terms)
+        self.keyword_vocabulary = {term: col for col, term in enumerate(self.keyword_terms)}
+        
+        n_rows = self.resume_matrix.shape[0]
+        if resume_ids is None:
+            resume_ids = list(range(n_rows))
+        self.resume_ids = list(resume_ids)
+        # cleaned resume text per row, needed to refit - a saved index reads them lazily
+        if texts is not None and not isinstance(texts, _LazyTexts):
+            texts = list(texts)
+        self.texts = texts
+        
+        # tombstones - deleted rows stay in the matrices but never score
+        self._alive = np.ones(n_rows, dtype=bool) if alive is None else np.array(alive, dtype=bool)
+        self.alive = self._alive[:n_rows]
+        self._n_alive = int(self.alive.sum())
+        self._row_of = {
+            resume_id: row for row, resume_id in enumerate(self.resume_ids) if self.alive[row]
+        }
+        
+        # appendable copies of the matrices, made on the first add()
+        self._tfidf_rows = None
+        self._keyword_rows = None
+        
+        self._fitted_rows = self._n_alive
+        self._changes_since_fit = 0
+    
+    def __len__(self) -> int:
+        return self._n_alive
+    
+    @property
+    def n_rows(self) -> int:
+        """rows in the matrices, tombstoned ones included"""
+        return self.resume_matrix.shape[0]
+    
+    @property
+    def drift(self) -> float:
+        """resumes added/updated since the last fit, relative to the fitted pool size"""
+        return self._changes_since_fit / max(self._fitted_rows, 1)
+    
+    @property
+    def resume_keywords(self) -> List[set]:
+        """keyword set for every resume row"""
+        return [set(self.row_keywords(idx)) for idx in range(self.n_rows)]
+    
+    def row_keywords(self, idx: int) -> List[str]:
+        """keywords stored for one resume row"""
+        start, end = self.keyword_matrix.indptr[idx], self.keyword_matrix.indptr[idx + 1]
+        return [self.keyword_terms[col] for col in self.keyword_matrix.indices[start:end]]
+    
+    @property
+    def columns(self) -> Dict[str, np.ndarray]:
+        """structured column -> one value per row (numbers as float64, NaN when missing)"""
+        return {name: values[:self.n_rows] for name, values in self._columns.items()}
+    
+    def set_columns(self, columns: Dict[str, Iterable]):
+        """attach structured fields (years_experience, title, ...) for the rank filters
+        
+        One value per row. A column where every value reads as a number
+        (blanks are NaN) is stored as float64, anything else as text.
+        years_experience is always numeric - values like 'N/A' or '5+' are
+        stored as NaN, so min_years leaves those rows out.
+        """
+        arrays = {
+            name: _column_array(values, numeric=name == self.YEARS_COLUMN)
+            for name, values in columns.items()
+        }
+        with self._lock:
+            for name, values in arrays.items():
+                if len(values) != self.n_rows:
+                    raise ValueError(f"column {name!r} has {len(values)} values for {self.n_rows} rows")
+            self._columns.update(arrays)
+            self._lowered.clear()
+    
+    def filter_mask(
+        self,
+        min_years: float = None,
+        title_contains: str = None,
+        where: Dict[str, Callable[[np.ndarray], np.ndarray]] = None
+    ) -> np.ndarray:
+        """rows that pass every filter, as a boolean mask (None if there are no filters)
+        
+        min_years is years_experience >= min_years (missing or unreadable years don't pass),
+        title_contains a case-insensitive substring of title, and where maps a
+        column to a function taking the whole column array and returning a
+        boolean mask - where={'education': lambda col: col != ''}.
+        """
+        conditions = dict(where or {})
+        masks = []
+        with self._lock:
+            columns = self.columns
+            for name in itertools.chain(
+                [self.YEARS_COLUMN] if min_years is not None else [],
+                [self.TITLE_COLUMN] if title_contains is not None else [],
+                conditions
+            ):
+                if name not in columns:
+                    raise KeyError(f"no column {name!r} to filter on, the index has {sorted(columns)}")
+            
+            if min_years is not None:
+                masks.append(columns[self.YEARS_COLUMN] >= min_years)
+            if title_contains is not None:
+                titles = self._lowered_column(self.TITLE_COLUMN)
+                masks.append(np.char.find(titles, title_contains.lower()) >= 0)
+            for name, predicate in conditions.items():
+                mask = np.asarray(predicate(columns[name]), dtype=bool)
+                if mask.shape != (self.n_rows,):
+                    raise ValueError(f"filter on {name!r} gave shape {mask.shape}, expected ({self.n_rows},)")
+                masks.append(mask)
+        
+        if not masks:
+            return None
+        return functools.reduce(np.logical_and, masks)
+    
+    def _lowered_column(self, name: str) -> np.ndarray:
+        lowered = self._lowered.get(name)
+        if lowered is None:
+            lowered = self._lowered[name] = np.char.lower(self.columns[name].astype(str))
+        return lowered
+    
+    def similarity_scores(self, job_desc: str) -> np.ndarray:
+        """cosine similarity of the job against every resume row"""
+        return self.similarity_matrix([job_desc])[0]
+    
+    def similarity_matrix(self, job_descs: List[str]) -> np.ndarray:
+        """jobs x resumes cosine matrix from one sparse product"""
+        job_matrix = self.job_matrix(job_descs)
+        # rows are l2 normalized by the vectorizer so a dot product is the cosine
+        with self.matcher.stage('similarity', shape=(len(job_descs), self.n_rows)):
+            return (self.resume_matrix @ job_matrix.T).T.toarray()
+    
+    def job_matrix(self, job_descs: List[str]) -> 'sparse.csr_matrix':
+        """tf-idf rows for the jobs in the index's vocabulary"""
+        stage = self.matcher.stage
+        with stage('preprocess', docs=len(job_descs)):
+            processed_jobs = [self.matcher.preprocess_text(job) for job in job_descs]
+        with stage('vectorize', docs=len(job_descs)) as timed:
+            job_matrix = self.vectorizer.transform(processed_jobs)
+            timed.set(shape=job_matrix.shape)
+        return job_matrix
+    
+    def keyword_scores(self, job_keywords: set) -> np.ndarray:
+        """fraction of the job keywords each resume has"""
+        return self.keyword_score_matrix([job_keywords])[0]
+    
+    def keyword_score_matrix(self, job_keyword_sets: List[set], rows: np.ndarray = None) -> np.ndarray:
+        """jobs x resumes keyword-match scores from one sparse product
+        
+        With rows, only those resume rows get scored (columns follow rows).
+        """
+        n_rows = self.n_rows if rows is None else len(rows)
+        with self.matcher.stage('keyword_match', shape=(len(job_keyword_sets), n_rows)):
+            return self._keyword_score_matrix(job_keyword_sets, rows)
+    
+    def _keyword_score_matrix(self, job_keyword_sets: List[set], rows: np.ndarray = None) -> np.ndarray:
+        keyword_matrix = self.keyword_matrix if rows is None else self.keyword_matrix[rows]
+        return keyword_match_matrix(keyword_matrix, self.keyword_vocabulary, job_keyword_sets)
+    
+    def save(self, path: str):
+        """write the index to a directory (npy arrays + json metadata)"""
+        os.makedirs(path, exist_ok=True)
+        
+        matrix = self.resume_matrix
+        matrix.sort_indices()
+        arrays = {
+            'idf': np.asarray(self.vectorizer.idf_),
+            'data': matrix.data,
+            'indices': matrix.indices,
+            'indptr': matrix.indptr,
+            'keyword_data': self.keyword_matrix.data,
+            'keyword_indices': self.keyword_matrix.indices,
+            'keyword_indptr': self.keyword_matrix.indptr,
+            'alive': self.alive,
+        }
+        # write-then-rename, so overwriting an index that's memory mapped right
+        # now (maybe by this very object) leaves the old mapping intact
+        for name in self.ARRAY_FILES:
+            target = os.path.join(path, f"{name}.npy")
+            with open(target + '.tmp', 'wb') as f:
+                np.save(f, np.ascontiguousarray(arrays[name]))
+            os.replace(target + '.tmp', target)
+        
+        hashing = isinstance(self.vectorizer, HashedTfidfVectorizer)
+        terms = None
+        if not hashing:
+            # terms in column order, so the list position is the feature index
+            vocabulary = self.vectorizer.vocabulary_
+            terms = sorted(vocabulary, key=vocabulary.get)
+        
+        meta = {
+            'format_version': self.FORMAT_VERSION,
+            'shape': list(matrix.shape),
+            'vectorizer': 'hashing' if hashing else 'tfidf',
+            'vectorizer_params': _vectorizer_params(self.vectorizer),
+            'terms': terms,
+            'keyword_terms': self.keyword_terms,
+            'resume_ids': self.resume_ids,
+            # texts live in their own file so load() doesn't have to parse them
+            'texts': TEXTS_FILE if self.texts is not None else None,
+        }
+        # text columns as fixed-width unicode, so they load without pickle
+        column_names = list(self._columns)
+        for position, (name, values) in enumerate(self.columns.items()):
+            if values.dtype == object:
+                values = np.array([str(value) for value in values], dtype=str)
+            target = os.path.join(path, f"column_{position}.npy")
+            with open(target + '.tmp', 'wb') as f:
+                np.save(f, values)
+            os.replace(target + '.tmp', target)
+        meta['columns'] = column_names
+        if self.texts is not None:
+            target = os.path.join(path, TEXTS_FILE)
+            with open(target + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(list(self.texts), f)
+            os.replace(target + '.tmp', target)
+        target = os.path.join(path, 'index.json')
+        with open(target + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(target + '.tmp', target)
+    
+    @classmethod
+    def load(cls, path: str, matcher: ResumeMatcher = None, mmap_mode: str = 'r') -> 'ResumeIndex':
+        """open a saved index - arrays are memory mapped unless mmap_mode=None"""
+        from scipy import sparse
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        
+        with open(os.path.join(path, 'index.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('format_version') not in cls.READABLE_VERSIONS:
+            raise ValueError(
+                f"unsupported index format {meta.get('format_version')!r} in {path}"
+            )
+        
+        arrays = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+            for name in cls.ARRAY_FILES
+        }
+        
+        if matcher is None:
+            matcher = ResumeMatcher()
+        
+        params = _restore_vectorizer_params(meta['vectorizer_params'])
+        if meta.get('vectorizer') == 'hashing':
+            vectorizer = HashedTfidfVectorizer(**params)
+        else:
+            vectorizer = TfidfVectorizer(**params)
+            vectorizer.vocabulary_ = {term: col for col, term in enumerate(meta['terms'])}
+        vectorizer.idf_ = arrays['idf']
+        
+        # csr_matrix keeps the mapped arrays as-is, no private copy
+        resume_matrix = sparse.csr_matrix(
+            (arrays['data'], arrays['indices'], arrays['indptr']),
+            shape=tuple(meta['shape'])
+        )
+        keyword_matrix = sparse.csr_matrix(
+            (arrays['keyword_data'], arrays['keyword_indices'], arrays['keyword_indptr']),
+            shape=(resume_matrix.shape[0], len(meta['keyword_terms']))
+        )
+        
+        texts = meta['texts']
+        if meta['format_version'] >= 4 and texts is not None:
+            texts = _LazyTexts(os.path.join(path, texts), resume_matrix.shape[0])
+        
+        # columns came in with format 5 - small, and appended to, so read into memory
+        columns = {
+            name: np.load(os.path.join(path, f"column_{position}.npy"))
+            for position, name in enumerate(meta.get('columns') or [])
+        }
+        
+        return cls(
+            matcher, vectorizer, resume_matrix, keyword_matrix,
+            meta['keyword_terms'], meta['resume_ids'], texts,
+            # tombstones get written to, so they're the one array kept in memory
+            alive=np.array(arrays['alive']),
+            columns=columns
+        )
+    
+    def calculate_similarity(self, job_desc: str) -> RankedResults:
+        """score every resume in the index against the job"""
+        stage = self.matcher.stage
+        with stage('query', jobs=1, resumes=len(self)):
+            with stage('keywords', docs=1):
+                job_keywords = set(self.matcher.keyword_extractor.extract_keywords(job_desc))
+            with self._lock:
+                similarities = self.similarity_scores(job_desc)
+                keyword_scores = self.keyword_scores(job_keywords)
+                final_scores = self.matcher.combine_scores(similarities, keyword_scores)
+                
+                with stage('results', docs=self._n_alive):
+                    return self._results(
+                        np.flatnonzero(self.alive), job_keywords,
+                        similarities, keyword_scores, final_scores
+                    )
+    
+    def rank_resumes(
+        self,
+        job_desc: str,
+        top_k: int = None,
+        min_score: float = None,
+        min_years: float = None,
+        title_contains: str = None,
+        where: Dict[str, Callable[[np.ndarray], np.ndarray]] = None
+    ) -> RankedResults:
+        """rank the indexed resumes by relevance (filters as in rank_many)"""
+        return self.rank_many(
+            [job_desc], top_k, min_score=min_score,
+            min_years=min_years, title_contains=title_contains, where=where
+        )[0]
+    
+    def rank_many(
+        self,
+        job_descs: List[str],
+        top_k: int = None,
+        batch_size: int = 256,
+        min_score: float = None,
+        min_years: float = None,
+        title_contains: str = None,
+        where: Dict[str, Callable[[np.ndarray], np.ndarray]] = None
+    ) -> List[RankedResults]:
+        """rank the indexed resumes for a bunch of jobs at once
+        
+        With min_score, rows scoring below it are dropped right after scoring,
+        before the top_k selection - a screening run for everyone above 0.5
+        only sorts and returns those.
+        
+        min_years/title_contains/where filter on the structured columns (see
+        filter_mask) before any text scoring - only the rows that pass go into
+        the sparse products, so a filter that drops most of the pool makes
+        the query that much cheaper.
+        """
+        filtered = min_years is not None or title_contains is not None or bool(where)
+        stage = self.matcher.stage
+        rankings = []
+        with stage('query', jobs=len(job_descs), resumes=len(self)):
+            # jobs go through in batches so the dense jobs x resumes block stays bounded
+            for start in range(0, len(job_descs), batch_size):
+                batch = job_descs[start:start + batch_size]
+                with stage('keywords', docs=len(batch)):
+                    job_keyword_sets = [
+                        set(self.matcher.keyword_extractor.extract_keywords(job_desc))
+                        for job_desc in batch
+                    ]
+                with self._lock:
+                    rows = None
+                    if filtered:
+                        with stage('filter', docs=self.n_rows) as timed:
+                            mask = self.filter_mask(min_years, title_contains, where)
+                            rows = np.flatnonzero(mask & self.alive)
+                            timed.set(kept=len(rows))
+                    rankings.extend(self._rank_batch(batch, job_keyword_sets, top_k, min_score, rows))
+        
+        return rankings
+    
+    def rank_candidates(
+        self,
+        job_desc: str,
+        rows,
+        top_k: int = None,
+        job_keywords: set = None,
+        job_vector=None
+    ) -> RankedResults:
+        """exact 70/30 ranking of just the given resume rows, for a candidate stage
+        
+        Scores are the same numbers a full rank_resumes gives those rows, so if
+        the candidates hold the real top_k the results are identical.
+        job_keywords/job_vector can be passed in when the caller already has them.
+        """
+        if job_keywords is None:
+            with self.matcher.stage('keywords', docs=1):
+                job_keywords = set(self.matcher.keyword_extractor.extract_keywords(job_desc))
+        
+        with self._lock:
+            if job_vector is None:
+                job_vector = self.job_matrix([job_desc])
+            # sorted, so ties break by row the same way as the full scan
+            rows = np.sort(np.asarray(rows, dtype=np.intp))
+            if len(rows) > 1:
+                rows = rows[np.concatenate(([True], rows[1:] != rows[:-1]))]
+            rows = rows[self.alive[rows]]
+            
+            with self.matcher.stage('similarity', shape=(1, len(rows))):
+                similarities = (self.resume_matrix[rows] @ job_vector.T).T.toarray()[0]
+            keyword_scores = self.keyword_score_matrix([job_keywords], rows)[0]
+            final_scores = self.matcher.combine_scores(similarities, keyword_scores)
+            
+            with self.matcher.stage('rank', docs=1, top_k=top_k):
+                order = top_k_indices(final_scores, top_k)
+                return self._results(
+                    rows[order], job_keywords, similarities, keyword_scores, final_scores,
+                    positions=order
+                )
+    
+    def iter_rank(
+        self,
+        job_desc: str,
+        min_score: float = None,
+        chunk_size: int = 10000
+    ) -> Iterator[RankedResults]:
+        """score the pool chunk_size rows at a time and yield each chunk's results
+        
+        Every chunk comes out best first (only rows at or above min_score), but
+        there's no order across chunks - it's for consuming a big screening
+        run while the rest is still being scored. Rows added after the first
+        chunk aren't covered; a refit in the middle stops the iteration.
+        """
+        with self.matcher.stage('keywords', docs=1):
+            job_keywords = set(self.matcher.keyword_extractor.extract_keywords(job_desc))
+        with self._lock:
+            vectorizer = self.vectorizer
+            n_rows = self.n_rows
+            job_vector = self.job_matrix([job_desc])
+        
+        for start in range(0, n_rows, chunk_size):
+            with self._lock:
+                if self.vectorizer is not vectorizer:
+                    raise RuntimeError("the index was refit while iterating, start over")
+                rows = np.arange(start, min(start + chunk_size, n_rows))
+                rows = rows[self.alive[rows]]
+                with self.matcher.stage('similarity', shape=(1, len(rows))):
+                    similarities = (self.resume_matrix[rows] @ job_vector.T).T.toarray()[0]
+                keyword_scores = self.keyword_score_matrix([job_keywords], rows)[0]
+                final_scores = self.matcher.combine_scores(similarities, keyword_scores)
+                
+                with self.matcher.stage('rank', docs=1, min_score=min_score):
+                    if min_score is None:
+                        positions = np.arange(len(rows))
+                    else:
+                        positions = np.flatnonzero(final_scores >= min_score)
+                    positions = positions[top_k_indices(final_scores[positions])]
+                    results = self._results(
+                        rows[positions], job_keywords, similarities, keyword_scores, final_scores,
+                        positions=positions
+                    )
+            if len(results):
+                yield results
+    
+    def _rank_batch(self, batch, job_keyword_sets, top_k, min_score=None, rows=None) -> List[RankedResults]:
+        """rank a batch against every row, or just the given (live, sorted) rows"""
+        if rows is None:
+            similarities = self.similarity_matrix(batch)
+            keyword_scores = self.keyword_score_matrix(job_keyword_sets)
+        else:
+            job_matrix = self.job_matrix(batch)
+            with self.matcher.stage('similarity', shape=(len(batch), len(rows))):
+                similarities = (self.resume_matrix[rows] @ job_matrix.T).T.toarray()
+            keyword_scores = self.keyword_score_matrix(job_keyword_sets, rows)
+        final_scores = self.matcher.combine_scores(similarities, keyword_scores)
+        
+        # picked rows are all alive already
+        has_tombstones = rows is None and self._n_alive < self.n_rows
+        if has_tombstones:
+            final_scores[:, ~self.alive] = -np.inf
+        
+        rankings = []
+        with self.matcher.stage('rank', docs=len(batch), top_k=top_k):
+            for job, job_keywords in enumerate(job_keyword_sets):
+                # positions in this batch's score arrays, best first
+                if min_score is None:
+                    positions = top_k_indices(final_scores[job], top_k)
+                else:
+                    # only what clears the bar gets sorted (tombstones are -inf, they never do)
+                    passing = np.flatnonzero(final_scores[job] >= min_score)
+                    positions = passing[top_k_indices(final_scores[job, passing], top_k)]
+                if has_tombstones:
+                    positions = positions[self.alive[positions]]
+                rankings.append(self._results(
+                    positions if rows is None else rows[positions], job_keywords,
+                    similarities[job], keyword_scores[job], final_scores[job],
+                    positions=positions
+                ))
+        return rankings
+    
+    def add(self, resume_id, text: str, columns: Dict = None) -> int:
+        """add a resume using the current vocabulary and IDF - no refit, returns its row
+        
+        columns are its structured values; ones left out are NaN/''.
+        """
+        with self._lock:
+            if resume_id in self._row_of:
+                raise ValueError(f"resume {resume_id!r} is already indexed, use update()")
+            values = self._column_values(columns or {})
+            row = self._append_row(resume_id, self._prepare_row(text), values)
+            self._note_change()
+        return row
+    
+    def update(self, resume_id, text: str, columns: Dict = None) -> int:
+        """replace a resume's text - the old row is tombstoned and a new one appended
+        
+        Structured values carry over from the old row unless columns has new ones.
+        """
+        with self._lock:
+            old_row = self._row_of.get(resume_id)
+            if old_row is None:
+                raise KeyError(f"resume {resume_id!r} is not in the index")
+            # everything that can fail happens before the old row goes away
+            old_values = {name: data[old_row] for name, data in self._columns.items()}
+            values = self._column_values(columns or {}, old_values)
+            prepared = self._prepare_row(text)
+            self._tombstone(resume_id)
+            row = self._append_row(resume_id, prepared, values)
+            self._note_change()
+        return row
+    
+    def delete(self, resume_id):
+        """tombstone a resume - the row stays until the next refit but never shows up"""
+        with self._lock:
+            self._tombstone(resume_id)
+    
+    def refit(self, background: bool = False):
+        """refit the vectorizer on the live resumes and drop tombstoned rows
+        
+        resume_index positions get compacted, resume ids stay the same. With
+        background=True this runs in a thread and returns it. Refits started
+        while one is running wait for it, then fit again.
+        """
+        if self.texts is None:
+            raise ValueError("index was built without texts, can't refit it")
+        
+        if background:
+            with self._lock:
+                if self._refit_thread is None or not self._refit_thread.is_alive():
+                    self._refit_thread = threading.Thread(
+                        target=self.refit, name='resume-index-refit', daemon=True
+                    )
+                    self._refit_thread.start()
+                return self._refit_thread
+        
+        with self._refit_lock:
+            self._refit()
+    
+    def _refit(self):
+        from scipy import sparse
+        from sklearn.base import clone
+        
+        with self._lock:
+            n_snapshot = self.n_rows
+            snapshot_rows = np.flatnonzero(self.alive)
+            snapshot_texts = [self.texts[row] for row in snapshot_rows]
+            vectorizer = clone(self.vectorizer)
+        
+        # the slow part runs without the lock so queries and adds carry on
+        with self.matcher.stage('refit', docs=len(snapshot_texts)) as stage:
+            snapshot_matrix = vectorizer.fit_transform(snapshot_texts)
+            stage.set(shape=snapshot_matrix.shape)
+        
+        with self._lock:
+            # drop rows deleted while fitting, transform rows added meanwhile
+            still_alive = self.alive[snapshot_rows]
+            added_rows = np.flatnonzero(self.alive[n_snapshot:]) + n_snapshot
+            parts = [snapshot_matrix[still_alive]]
+            if len(added_rows):
+                parts.append(vectorizer.transform([self.texts[row] for row in added_rows]))
+            
+            keep = np.concatenate([snapshot_rows[still_alive], added_rows])
+            self._set_rows(
+                vectorizer,
+                sparse.vstack(parts, format='csr'),
+                self.keyword_matrix[keep],
+                self.keyword_terms,
+                [self.resume_ids[row] for row in keep],
+                [self.texts[row] for row in keep],
+                None
+            )
+            self._columns = {name: data[keep] for name, data in self._columns.items()}
+            self._lowered.clear()
+            self._fitted_rows = len(snapshot_rows)
+            self._changes_since_fit = len(added_rows)
+    
+    def _tombstone(self, resume_id):
+        row = self._row_of.pop(resume_id, None)
+        if row is None:
+            raise KeyError(f"resume {resume_id!r} is not in the index")
+        self.alive[row] = False
+        self._n_alive -= 1
+    
+    def _prepare_row(self, text: str):
+        """clean, vectorize and extract keywords for a new row - doesn't touch the index"""
+        processed = self.matcher.preprocess_text(text)
+        tfidf_row = self.vectorizer.transform([processed])
+        tfidf_row.sort_indices()
+        keywords = set(self.matcher.keyword_extractor.extract_keywords_from_clean(processed))
+        return processed, tfidf_row, keywords
+    
+    def _column_values(self, columns: Dict, defaults: Dict = None) -> Dict:
+        """one row's structured values converted to the column types
+        
+        Columns left out take their value from defaults, or NaN/'' without.
+        """
+        unknown = set(columns) - set(self._columns)
+        if unknown:
+            raise ValueError(f"unknown columns {sorted(unknown)}, the index has {sorted(self._columns)}")
+        values = {}
+        for name, data in self._columns.items():
+            value = columns[name] if name in columns else (defaults or {}).get(name)
+            if data.dtype == object:
+                values[name] = '' if _is_blank(value) else str(value)
+            elif name == self.YEARS_COLUMN:
+                values[name] = _to_number(value)
+            else:
+                values[name] = np.nan if _is_blank(value) else float(value)
+        return values
+    
+    def _append_row(self, resume_id, prepared, column_values: Dict) -> int:
+        processed, tfidf_row, keywords = prepared
+        cols = []
+        for keyword in keywords:
+            col = self.keyword_vocabulary.get(keyword)
+            if col is None:
+                col = len(self.keyword_terms)
+                self.keyword_terms.append(keyword)
+                self.keyword_vocabulary[keyword] = col
+            cols.append(col)
+        cols.sort()
+        
+        if self._tfidf_rows is None:
+            self._tfidf_rows = _GrowingCSR(self.resume_matrix)
+            self._keyword_rows = _GrowingCSR(self.keyword_matrix)
+        self._tfidf_rows.append(tfidf_row.indices, tfidf_row.data)
+        self._keyword_rows.append(cols, np.ones(len(cols)), n_cols=len(self.keyword_terms))
+        self.resume_matrix = self._tfidf_rows.matrix()
+        self.keyword_matrix = self._keyword_rows.matrix()
+        
+        row = len(self.resume_ids)
+        self.resume_ids.append(resume_id)
+        if self.texts is not None:
+            self.texts.append(processed)
+        self._alive = _reserve(self._alive, row, row + 1)
+        self._alive[row] = True
+        self.alive = self._alive[:row + 1]
+        for name, value in column_values.items():
+            self._columns[name] = _reserve(self._columns[name], row, row + 1)
+            self._columns[name][row] = value
+        self._lowered.clear()
+        self._n_alive += 1
+        self._row_of[resume_id] = row
+        return row
+    
+    def _note_change(self):
+        self._changes_since_fit += 1
+        if (
+            self.refit_threshold is not None
+            and self.texts is not None
+            and self.drift > self.refit_threshold
+        ):
+            self.refit(background=True)
+    
+    def _results(
+        self, rows, job_keywords, similarities, keyword_scores, final_scores, positions=None
+    ) -> RankedResults:
+        """pull the given rows out of the score arrays into a RankedResults
+        
+        positions are where each row's scores sit in the arrays, if that isn't
+        the row number itself (scores for a subset of rows).
+        """
+        if positions is None:
+            positions = rows
+        return RankedResults(
+            rows, similarities[positions], keyword_scores[positions], final_scores[positions],
+            self.resume_ids, self.keyword_matrix, self.keyword_terms, job_keywords
+        )
+
+
+class JobIndex:
+    """open jobs with a fitted vectorizer - only the resume gets vectorized per query
+    
+    Same 70/30 score as ranking resumes for a job: cosine of the TF-IDF rows
+    (IDF from the job corpus here) plus the fraction of the job's keywords
+    the resume has, so each job still divides by its own keyword count.
+    
+        jobs = matcher.build_job_index(job_texts, job_ids)
+        jobs.rank_jobs(resume_text, top_k=10)
+    """
+    
+    def __init__(
+        self,
+        matcher: ResumeMatcher,
+        vectorizer: 'TfidfVectorizer',
+        job_matrix,
+        keyword_matrix,
+        keyword_terms: List[str],
+        job_ids: List = None
+    ):
+        self.matcher = matcher
+        self.vectorizer = vectorizer
+        self.job_matrix = job_matrix.tocsr()
+        # jobs x keyword vocabulary, 1 where the keyword is in the job's top keywords
+        self.keyword_matrix = keyword_matrix.tocsr()
+        self.keyword_terms = list(keyword_terms)
+        self.keyword_vocabulary = {term: col for col, term in enumerate(self.keyword_terms)}
+        # the keyword-match denominator is per job
+        self.keyword_totals = np.maximum(np.diff(self.keyword_matrix.indptr), 1).astype(np.float64)
+        if job_ids is None:
+            job_ids = list(range(self.job_matrix.shape[0]))
+        self.job_ids = list(job_ids)
+    
+    def __len__(self) -> int:
+        return len(self.job_ids)
+    
+    def rank_jobs(self, resume_text: str, top_k: int = None) -> RankedJobs:
+        """rank the indexed jobs for one resume"""
+        return self.rank_many([resume_text], top_k)[0]
+    
+    def rank_many(self, resumes: List[str], top_k: int = None, batch_size: int = 256) -> List[RankedJobs]:
+        """rank_jobs for a bunch of resumes, one sparse product per batch"""
+        from scipy import sparse
+        
+        stage = self.matcher.stage
+        rankings = []
+        with stage('job_query', resumes=len(resumes), jobs=len(self)):
+            for start in range(0, len(resumes), batch_size):
+                batch = resumes[start:start + batch_size]
+                with stage('preprocess', docs=len(batch)):
+                    processed = [self.matcher.preprocess_text(resume) for resume in batch]
+                with stage('keywords', docs=len(batch)):
+                    resume_keyword_sets = [
+                        set(self.matcher.keyword_extractor.extract_keywords_from_clean(text))
+                        for text in processed
+                    ]
+                with stage('vectorize', docs=len(batch)):
+                    resume_matrix = self.vectorizer.transform(processed)
+                
+                with stage('similarity', shape=(len(batch), len(self))):
+                    similarities = (self.job_matrix @ resume_matrix.T).T.toarray()
+                with stage('keyword_match', shape=(len(batch), len(self))):
+                    rows, cols = [], []
+                    for row, keywords in enumerate(resume_keyword_sets):
+                        for keyword in keywords:
+                            col = self.keyword_vocabulary.get(keyword)
+                            if col is not None:
+                                rows.append(row)
+                                cols.append(col)
+                    resume_keyword_matrix = sparse.csr_matrix(
+                        (np.ones(len(rows), dtype=self.keyword_matrix.dtype), (rows, cols)),
+                        shape=(len(batch), len(self.keyword_terms))
+                    )
+                    counts = (self.keyword_matrix @ resume_keyword_matrix.T).T.toarray()
+                    keyword_scores = counts / self.keyword_totals[None, :]
+                final_scores = self.matcher.combine_scores(similarities, keyword_scores)
+                
+                with stage('rank', docs=len(batch), top_k=top_k):
+                    for row, keywords in enumerate(resume_keyword_sets):
+                        order = top_k_indices(final_scores[row], top_k)
+                        rankings.append(RankedJobs(
+                            order, similarities[row, order], keyword_scores[row, order],
+                            final_scores[row, order], self.job_ids, self.keyword_matrix,
+                            self.keyword_terms, keywords
+                        ))
+        return rankings
+
+
+class HashedTfidfVectorizer:
+    """TF-IDF over hashed features - TfidfVectorizer without the vocabulary
+    
+    Terms go straight to one of n_features columns (HashingVectorizer), so
+    there's no term -> column dict to hold or to agree on. Fitting is just
+    document frequencies per column, which add up across shards:
+    
+        doc_freqs = sum(vectorizer.document_frequencies(shard) for shard in shards)
+        vectorizer.fit_from_frequencies(doc_freqs, n_docs)
+    
+    Columns no fitted document used get idf 0, so like words outside a
+    vocabulary they don't count in a query. Colliding terms share a column.
+    """
+    
+    def __init__(
+        self,
+        n_features: int = 2 ** 20,
+        stop_words=None,
+        ngram_range: Tuple[int, int] = (1, 1),
+        lowercase: bool = True,
+        binary: bool = False,
+        norm: str = 'l2',
+        use_idf: bool = True,
+        smooth_idf: bool = True,
+        sublinear_tf: bool = False,
+        dtype=np.float64
+    ):
+        self.n_features = n_features
+        self.stop_words = stop_words
+        self.ngram_range = ngram_range
+        self.lowercase = lowercase
+        self.binary = binary
+        self.norm = norm
+        self.use_idf = use_idf
+        self.smooth_idf = smooth_idf
+        self.sublinear_tf = sublinear_tf
+        self.dtype = dtype
+    
+    def get_params(self, deep: bool = True) -> Dict:
+        """constructor args, so sklearn's clone() and _vectorizer_params work on it"""
+        return {
+            'n_features': self.n_features,
+            'stop_words': self.stop_words,
+            'ngram_range': self.ngram_range,
+            'lowercase': self.lowercase,
+            'binary': self.binary,
+            'norm': self.norm,
+            'use_idf': self.use_idf,
+            'smooth_idf': self.smooth_idf,
+            'sublinear_tf': self.sublinear_tf,
+            'dtype': self.dtype,
+        }
+    
+    @functools.cached_property
+    def _hasher(self):
+        from sklearn.feature_extraction.text import HashingVectorizer
+        
+        return HashingVectorizer(
+            n_features=self.n_features, stop_words=self.stop_words,
+            ngram_range=self.ngram_range, lowercase=self.lowercase, binary=self.binary,
+            alternate_sign=False, norm=None, dtype=np.float64
+        )
+    
+    def build_analyzer(self):
+        return self._hasher.build_analyzer()
+    
+    def document_frequencies(self, raw_documents: List[str]) -> np.ndarray:
+        """how many of the documents have each column"""
+        counts = self._hasher.transform(raw_documents)
+        return np.bincount(counts.indices, minlength=self.n_features)
+    
+    def fit_from_frequencies(self, doc_freqs: np.ndarray, n_docs: int) -> 'HashedTfidfVectorizer':
+        """set idf_ from per-column document frequencies, same formula as TfidfVectorizer"""
+        if self.use_idf:
+            doc_freqs = np.asarray(doc_freqs, dtype=np.float64)
+            smooth = float(self.smooth_idf)
+            idf = np.log((n_docs + smooth) / (doc_freqs + smooth)) + 1.0
+            idf[doc_freqs == 0] = 0.0
+            self.idf_ = idf
+        return self
+    
+    def fit(self, raw_documents: List[str]) -> 'HashedTfidfVectorizer':
+        return self.fit_from_frequencies(self.document_frequencies(raw_documents), len(raw_documents))
+    
+    def fit_transform(self, raw_documents: List[str]) -> 'sparse.csr_matrix':
+        return self.fit(raw_documents).transform(raw_documents)
+    
+    def transform(self, raw_documents: List[str]) -> 'sparse.csr_matrix':
+        from sklearn.preprocessing import normalize
+        
+        matrix = self._hasher.transform(raw_documents).tocsr()
+        if self.sublinear_tf:
+            np.log(matrix.data, out=matrix.data)
+            matrix.data += 1.0
+        if self.use_idf:
+            matrix.data *= self.idf_[matrix.indices]
+            matrix.eliminate_zeros()
+        if self.norm is not None:
+            matrix = normalize(matrix, norm=self.norm, copy=False)
+        matrix.sort_indices()
+        return matrix.astype(self.dtype, copy=False)
+    
+    def __getstate__(self):
+        # the hasher is rebuilt on demand, no need to ship it to pool workers
+        state = dict(self.__dict__)
+        state.pop('_hasher', None)
+        return state
+
+
+def _fit_vectorizer_from_counts(
+    vectorizer: 'TfidfVectorizer', term_counts: Counter, doc_counts: Counter, n_docs: int
+):
+    """set vocabulary_/idf_ from corpus counts, same rules as TfidfVectorizer.fit"""
+    # alphabetical like sklearn's sorted features, so ties in max_features cut the same way
+    terms = sorted(doc_counts)
+    dfs = np.array([doc_counts[term] for term in terms], dtype=np.int64)
+    tfs = dfs if vectorizer.binary else np.array([term_counts[term] for term in terms], dtype=np.int64)
+    
+    max_df, min_df = vectorizer.max_df, vectorizer.min_df
+    max_doc_count = max_df if isinstance(max_df, Integral) else max_df * n_docs
+    min_doc_count = min_df if isinstance(min_df, Integral) else min_df * n_docs
+    mask = (dfs <= max_doc_count) & (dfs >= min_doc_count)
+    if vectorizer.max_features is not None and mask.sum() > vectorizer.max_features:
+        mask_inds = (-tfs[mask]).argsort()[:vectorizer.max_features]
+        new_mask = np.zeros(len(dfs), dtype=bool)
+        new_mask[np.where(mask)[0][mask_inds]] = True
+        mask = new_mask
+    
+    kept = np.flatnonzero(mask)
+    if not len(kept):
+        raise ValueError("After pruning, no terms remain. Try a lower min_df or a higher max_df.")
+    vectorizer.vocabulary_ = {terms[old]: new for new, old in enumerate(kept)}
+    
+    if vectorizer.use_idf:
+        df = dfs[kept].astype(np.float64) + float(vectorizer.smooth_idf)
+        idf = np.full_like(df, fill_value=n_docs + int(vectorizer.smooth_idf))
+        idf /= df
+        np.log(idf, out=idf)
+        idf += 1.0
+        vectorizer.idf_ = idf
+
+
+def _preprocess_chunk(
+    extractor: ResumeKeywordExtractor, resumes: List[str]
+) -> Tuple[List[str], List[List[str]]]:
+    """cleaned text and keywords for a chunk of resumes - runs in pool workers"""
+    processed_resumes = [extractor.clean_text(resume) for resume in resumes]
+    resume_keywords = [extractor.extract_keywords_from_clean(resume) for resume in processed_resumes]
+    return processed_resumes, resume_keywords
+
+
+def _column_array(values: Iterable, numeric: bool = False) -> np.ndarray:
+    """float64 if every value reads as a number (None/''/NaN are NaN), else an object array of str
+    
+    numeric=True always gives float64, anything that doesn't read as a number
+    ('N/A', '5+') becomes NaN.
+    """
+    if isinstance(values, np.ndarray):
+        if values.dtype.kind in 'biuf':
+            return values.astype(np.float64)
+        # a saved text column comes back as unicode - it stays text even if it looks numeric
+        if values.dtype.kind == 'U' and not numeric:
+            return values.astype(object)
+        values = values.tolist()
+    values = list(values)
+    if numeric:
+        return np.array([_to_number(value) for value in values], dtype=np.float64)
+    try:
+        return np.array(
+            [np.nan if _is_blank(value) else float(value) for value in values],
+            dtype=np.float64
+        )
+    except (TypeError, ValueError):
+        return np.array(['' if _is_blank(value) else str(value) for value in values], dtype=object)
+
+
+def _to_number(value) -> float:
+    """value as a float, NaN if it's blank or not a number"""
+    if _is_blank(value):
+        return np.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _is_blank(value) -> bool:
+    # None, '' or NaN (what pandas puts in empty cells)
+    return value is None or value == '' or (isinstance(value, float) and value != value)
+
+
+class _GrowingCSR:
+    """CSR arrays with spare room at the end, so appending a row is amortized O(row nnz)"""
+    
+    def __init__(self, matrix):
+        self.n_rows, self.n_cols = matrix.shape
+        self.nnz = matrix.nnz
+        # no copy until the first append needs more room
+        self.data = matrix.data
+        self.indices = matrix.indices
+        self.indptr = matrix.indptr
+    
+    def append(self, indices, data, n_cols: int = None):
+        nnz = self.nnz + len(indices)
+        self.data = _reserve(self.data, self.nnz, nnz)
+        self.indices = _reserve(self.indices, self.nnz, nnz)
+        self.indptr = _reserve(self.indptr, self.n_rows + 1, self.n_rows + 2)
+        
+        self.data[self.nnz:nnz] = data
+        self.indices[self.nnz:nnz] = indices
+        self.indptr[self.n_rows + 1] = nnz
+        self.nnz = nnz
+        self.n_rows += 1
+        if n_cols is not None:
+            self.n_cols = n_cols
+    
+    def matrix(self) -> 'sparse.csr_matrix':
+        """csr_matrix over the used part of the arrays (views, not copies)"""
+        from scipy import sparse
+        
+        return sparse.csr_matrix(
+            (self.data[:self.nnz], self.indices[:self.nnz], self.indptr[:self.n_rows + 1]),
+            shape=(self.n_rows, self.n_cols)
+        )
+
+
+def _reserve(array: np.ndarray, used: int, needed: int) -> np.ndarray:
+    """array with room for `needed` items, doubling capacity when it has to grow"""
+    if needed <= len(array) and array.flags.writeable:
+        return array
+    grown = np.empty(max(needed, 2 * len(array), 16), dtype=array.dtype)
+    grown[:used] = array[:used]
+    return grown
+
+
+class _LazyTexts:
+    """cleaned texts of a saved index, the file is only read when a text is asked for
+    
+    Rows appended after load() are kept in memory, so add() doesn't read it either.
+    """
+    
+    def __init__(self, path: str, n_saved: int):
+        self.path = path
+        self.n_saved = n_saved
+        self._saved = None
+        self._added = []
+    
+    def __len__(self) -> int:
+        return self.n_saved + len(self._added)
+    
+    def __getitem__(self, row: int) -> str:
+        if row < 0:
+            row += len(self)
+        if row >= self.n_saved:
+            return self._added[row - self.n_saved]
+        return self._load()[row]
+    
+    def __iter__(self):
+        yield from self._load()
+        yield from self._added
+    
+    def append(self, text: str):
+        self._added.append(text)
+    
+    @property
+    def loaded(self) -> bool:
+        return self._saved is not None
+    
+    def _load(self) -> List[str]:
+        if self._saved is None:
+            with open(self.path, encoding='utf-8') as f:
+                saved = json.load(f)
+            if len(saved) != self.n_saved:
+                raise ValueError(f"{self.path} has {len(saved)} texts, the index has {self.n_saved} rows")
+            self._saved = saved
+        return self._saved
+
+
+def build_keyword_matrix(resume_keywords: List[List[str]]) -> Tuple['sparse.csr_matrix', List[str]]:
+    """binary resumes x keywords matrix plus the keyword for each column"""
+    from scipy import sparse
+    
+    keyword_terms = sorted(set().union(*resume_keywords)) if resume_keywords else []
+    vocabulary = {term: col for col, term in enumerate(keyword_terms)}
+    
+    indptr = [0]
+    indices = []
+    for keywords in resume_keywords:
+        indices.extend(sorted(vocabulary[keyword] for keyword in set(keywords)))
+        indptr.append(len(indices))
+    
+    # float32 is plenty for 0/1 and keeps the match counts exact
+    matrix = sparse.csr_matrix(
+        (np.ones(len(indices), dtype=np.float32), indices, indptr),
+        shape=(len(resume_keywords), len(keyword_terms))
+    )
+    return matrix, keyword_terms
+
+
+def keyword_match_matrix(
+    keyword_matrix,
+    keyword_vocabulary: Dict[str, int],
+    job_keyword_sets: List[set]
+) -> np.ndarray:
+    """jobs x resumes fraction of each job's keywords the resume has, from one sparse product"""
+    from scipy import sparse
+    
+    rows, cols = [], []
+    for row, job_keywords in enumerate(job_keyword_sets):
+        for keyword in job_keywords:
+            col = keyword_vocabulary.get(keyword)
+            # keywords no resume has can't match, they only count in the total
+            if col is not None:
+                rows.append(row)
+                cols.append(col)
+    
+    job_matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=keyword_matrix.dtype), (rows, cols)),
+        shape=(len(job_keyword_sets), keyword_matrix.shape[1])
+    )
+    counts = (keyword_matrix @ job_matrix.T).T.toarray()
+    totals = np.array([max(len(keywords), 1) for keywords in job_keyword_sets], dtype=np.float64)
+    return counts / totals[:, None]
+
+
+def top_k_indices(scores: np.ndarray, top_k: int = None) -> np.ndarray:
+    """row indices of the best scores, best first
+    
+    Ties keep row order, same as sorted(..., reverse=True) on the result dicts.
+    """
+    if not top_k or top_k >= len(scores):
+        return np.argsort(-scores, kind='stable')
+    
+    # argpartition finds the cutoff without sorting everything, then only the
+    # rows at or above it get sorted
+    cutoff = scores[np.argpartition(-scores, top_k - 1)[top_k - 1]]
+    candidates = np.flatnonzero(scores >= cutoff)
+    order = candidates[np.argsort(-scores[candidates], kind='stable')]
+    return order[:top_k]
+
+
+def _vectorizer_params(vectorizer: 'TfidfVectorizer') -> Dict:
+    """json friendly constructor args, enough to rebuild the vectorizer on load"""
+    params = {}
+    for name, value in vectorizer.get_params().items():
+        if name == 'dtype':
+            params[name] = np.dtype(value).name
+        elif isinstance(value, tuple):
+            params[name] = list(value)
+        elif value is None or isinstance(value, (str, int, float, bool)):
+            params[name] = value
+        elif isinstance(value, (list, frozenset, set)) and name == 'stop_words':
+            params[name] = sorted(value)
+        else:
+            # callables (custom tokenizers etc.) can't go in json
+            raise ValueError(f"can't save vectorizer parameter {name}={value!r}")
+    return params
+
+
+def _restore_vectorizer_params(params: Dict) -> Dict:
+    """undo the json conversions from _vectorizer_params"""
+    params = dict(params)
+    if params.get('ngram_range') is not None:
+        params['ngram_range'] = tuple(params['ngram_range'])
+    if params.get('dtype') is not None:
+        params['dtype'] = getattr(np, params['dtype'])
+    return params
+
+
 def main():
     """run test"""
     job_description = """
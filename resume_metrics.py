@@ -0,0 +1,116 @@
+"""
+Matcher metrics
+Recorders for the stage timings ResumeMatcher reports (see ResumeMatcher.stage),
+one for looking at a single slow call and one that keeps counters/histograms
+for a metrics exporter
+"""
+
+import threading
+from collections import defaultdict
+from typing import Dict, List
+
+# seconds, prometheus-style upper bounds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class StageLog:
+    """keeps every stage of every call, in the order they finished
+
+        log = StageLog()
+        with matcher.instrument(log):
+            matcher.rank_resumes(job, resumes)
+        print(log.report())
+    """
+
+    def __init__(self):
+        self.records: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def __call__(self, stage: str, seconds: float, info: Dict):
+        with self._lock:
+            self.records.append({'stage': stage, 'seconds': seconds, **info})
+
+    def totals(self) -> Dict[str, float]:
+        """seconds per stage, summed over the log"""
+        totals = defaultdict(float)
+        for record in self.records:
+            totals[record['stage']] += record['seconds']
+        return dict(totals)
+
+    def report(self) -> str:
+        """one line per stage"""
+        lines = []
+        for record in self.records:
+            extra = ', '.join(f"{key}={value}" for key, value in record.items() if key not in ('stage', 'seconds'))
+            lines.append(f"{record['stage']:<20} {record['seconds'] * 1000:9.2f}ms  {extra}")
+        return "\n".join(lines)
+
+    def clear(self):
+        with self._lock:
+            self.records = []
+
+
+class MetricsRecorder:
+    """per-stage call/doc counters and a duration histogram, safe across threads"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def __call__(self, stage: str, seconds: float, info: Dict):
+        with self._lock:
+            metrics = self._stages.get(stage)
+            if metrics is None:
+                metrics = self._stages[stage] = {
+                    'count': 0,
+                    'seconds_sum': 0.0,
+                    'docs': 0,
+                    # last slot is +Inf
+                    'bucket_counts': [0] * (len(self.buckets) + 1),
+                }
+            metrics['count'] += 1
+            metrics['seconds_sum'] += seconds
+            metrics['docs'] += info.get('docs', 0)
+            for slot, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    break
+            else:
+                slot = len(self.buckets)
+            metrics['bucket_counts'][slot] += 1
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """copy of the metrics per stage, bucket counts made cumulative"""
+        with self._lock:
+            snapshot = {}
+            for stage, metrics in self._stages.items():
+                cumulative, total = {}, 0
+                for bound, count in zip(self.buckets + (float('inf'),), metrics['bucket_counts']):
+                    total += count
+                    cumulative[bound] = total
+                snapshot[stage] = {
+                    'count': metrics['count'],
+                    'seconds_sum': metrics['seconds_sum'],
+                    'docs': metrics['docs'],
+                    'buckets': cumulative,
+                }
+            return snapshot
+
+    def to_prometheus(self, prefix: str = 'resume_matcher') -> str:
+        """the snapshot in prometheus text format, for a /metrics endpoint"""
+        snapshot = sorted(self.snapshot().items())
+        lines = [f"# TYPE {prefix}_stage_seconds histogram"]
+        for stage, metrics in snapshot:
+            for bound, count in metrics['buckets'].items():
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {count}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {metrics["seconds_sum"]}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {metrics["count"]}')
+        lines.append(f"# TYPE {prefix}_stage_docs_total counter")
+        for stage, metrics in snapshot:
+            lines.append(f'{prefix}_stage_docs_total{{stage="{stage}"}} {metrics["docs"]}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._stages = {}
@@ -0,0 +1,288 @@
+"""
+Sharded resume index
+Splits the resume pool over worker processes, each holding a ResumeIndex for
+its slice. The vectorizer is fit once from every shard's term counts, so all
+shards score against the same global IDF, and a query fans out to the shards
+and their top-k lists get merged into the one an unsharded index would give
+"""
+
+import threading
+from collections import Counter
+from multiprocessing import get_context
+from typing import Dict, List
+
+import numpy as np
+
+from resume_matcher import (
+    HashedTfidfVectorizer, RankedResults, ResumeIndex, ResumeMatcher,
+    _fit_vectorizer_from_counts, build_keyword_matrix, top_k_indices
+)
+
+
+class ShardedIndex:
+    """scatter-gather top-k over resume shards in worker processes
+
+        with ShardedIndex.build(resumes, n_shards=4) as shards:
+            shards.rank_resumes(job, top_k=10)
+
+    The coordinator keeps the fitted vectorizer and does the per-job work
+    (cleaning, keywords, TF-IDF) once; shards only run the two sparse
+    products and their own top-k. Each shard is a contiguous block of rows,
+    so resume_index in the results is the row in the full resume list and
+    ties break by it, the same as ResumeIndex.rank_many. No live
+    add/update/delete - rebuild to change the pool.
+    """
+
+    def __init__(self, matcher: ResumeMatcher, n_shards: int, start_method: str = 'spawn'):
+        if n_shards < 1:
+            raise ValueError(f"n_shards must be at least 1, got {n_shards}")
+        self.matcher = matcher
+        self.vectorizer = None
+        self.resume_ids = []
+        self.shard_sizes = []
+        # one query at a time on the pipes, replies come back in send order
+        self._lock = threading.Lock()
+        context = get_context(start_method)
+        self._pipes = []
+        self._workers = []
+        for shard in range(n_shards):
+            parent, child = context.Pipe()
+            worker = context.Process(
+                target=_serve_shard, args=(child, matcher),
+                name=f'resume-shard-{shard}', daemon=True
+            )
+            worker.start()
+            child.close()
+            self._pipes.append(parent)
+            self._workers.append(worker)
+
+    @classmethod
+    def build(
+        cls,
+        resumes: List[str],
+        resume_ids: List = None,
+        n_shards: int = 2,
+        matcher: ResumeMatcher = None,
+        start_method: str = 'spawn'
+    ) -> 'ShardedIndex':
+        """split the resumes into n_shards blocks and index each in its own process"""
+        from sklearn.base import clone
+
+        if not resumes:
+            raise ValueError("need at least one resume to build an index")
+        if resume_ids is None:
+            resume_ids = list(range(len(resumes)))
+        if len(resume_ids) != len(resumes):
+            raise ValueError("resume_ids and resumes must be the same length")
+        if matcher is None:
+            matcher = ResumeMatcher()
+
+        n_shards = max(1, min(n_shards, len(resumes)))
+        bounds = np.linspace(0, len(resumes), n_shards + 1).astype(int)
+        shards = cls(matcher, n_shards, start_method)
+        try:
+            with matcher.stage('build_index', resumes=len(resumes), shards=n_shards):
+                # pass 1 - every shard cleans its resumes and counts terms
+                with matcher.stage('fit', docs=len(resumes)):
+                    counts = shards._call_all('load', [
+                        (resumes[start:end], resume_ids[start:end], int(start))
+                        for start, end in zip(bounds[:-1], bounds[1:])
+                    ])
+                    vectorizer = clone(matcher.vectorizer)
+                    if isinstance(vectorizer, HashedTfidfVectorizer):
+                        vectorizer.fit_from_frequencies(sum(counts), len(resumes))
+                    else:
+                        term_counts, doc_counts = Counter(), Counter()
+                        for shard_terms, shard_docs in counts:
+                            term_counts.update(shard_terms)
+                            doc_counts.update(shard_docs)
+                        _fit_vectorizer_from_counts(vectorizer, term_counts, doc_counts, len(resumes))
+
+                # pass 2 - every shard transforms against the global vocabulary/IDF
+                with matcher.stage('vectorize', docs=len(resumes)):
+                    shards.shard_sizes = shards._call_all('fit', [(vectorizer,)] * n_shards)
+        except BaseException:
+            shards.close()
+            raise
+
+        shards.vectorizer = vectorizer
+        shards.resume_ids = list(resume_ids)
+        return shards
+
+    def __len__(self) -> int:
+        return len(self.resume_ids)
+
+    @property
+    def n_shards(self) -> int:
+        return len(self._workers)
+
+    def rank_resumes(self, job_desc: str, top_k: int = None) -> RankedResults:
+        """same results as ResumeIndex.rank_resumes over the whole pool"""
+        return self.rank_many([job_desc], top_k)[0]
+
+    def rank_many(
+        self,
+        job_descs: List[str],
+        top_k: int = None,
+        batch_size: int = 256
+    ) -> List[RankedResults]:
+        """rank_resumes for a bunch of jobs, each batch goes to every shard at once"""
+        stage = self.matcher.stage
+        rankings = []
+        with stage('sharded_query', jobs=len(job_descs), resumes=len(self), shards=self.n_shards):
+            for start in range(0, len(job_descs), batch_size):
+                batch = job_descs[start:start + batch_size]
+                with stage('keywords', docs=len(batch)):
+                    job_keyword_sets = [
+                        set(self.matcher.keyword_extractor.extract_keywords(job_desc))
+                        for job_desc in batch
+                    ]
+                with stage('preprocess', docs=len(batch)):
+                    processed_jobs = [self.matcher.preprocess_text(job_desc) for job_desc in batch]
+                with stage('vectorize', docs=len(batch)):
+                    job_matrix = self.vectorizer.transform(processed_jobs)
+
+                with stage('scatter_gather', docs=len(batch)):
+                    shard_results = self._call_all(
+                        'rank', [(job_matrix, job_keyword_sets, top_k)] * self.n_shards
+                    )
+                with stage('merge', docs=len(batch), top_k=top_k):
+                    for job, job_keywords in enumerate(job_keyword_sets):
+                        hits = [results[job] for results in shard_results]
+                        rankings.append(self._merge(hits, job_keywords, top_k))
+        return rankings
+
+    def _merge(self, shard_hits: List[Dict], job_keywords: set, top_k: int) -> RankedResults:
+        """global top_k out of the per-shard top_k lists"""
+        rows = np.concatenate([hits['rows'] for hits in shard_hits])
+        similarities = np.concatenate([hits['similarity'] for hits in shard_hits])
+        keyword_scores = np.concatenate([hits['keyword_match'] for hits in shard_hits])
+        final_scores = np.concatenate([hits['final'] for hits in shard_hits])
+        matched = [keywords for hits in shard_hits for keywords in hits['matched_keywords']]
+
+        # best score first, lowest row on ties - what the unsharded ranking does
+        order = np.lexsort((rows, -final_scores))[:top_k or None]
+        keyword_matrix, keyword_terms = build_keyword_matrix([matched[position] for position in order])
+        return RankedResults(
+            rows[order], similarities[order], keyword_scores[order], final_scores[order],
+            self.resume_ids, keyword_matrix, keyword_terms, job_keywords,
+            keyword_rows=np.arange(len(order))
+        )
+
+    def _call_all(self, command: str, args: List[tuple]) -> List:
+        """send one command to every shard, then collect the replies in shard order"""
+        with self._lock:
+            if not self._workers:
+                raise RuntimeError("sharded index is closed")
+            for pipe, shard_args in zip(self._pipes, args):
+                pipe.send((command, shard_args))
+            replies = [pipe.recv() for pipe in self._pipes]
+        for status, value in replies:
+            if status == 'error':
+                raise value
+        return [value for _, value in replies]
+
+    def close(self):
+        """stop the worker processes"""
+        with self._lock:
+            for pipe in self._pipes:
+                try:
+                    pipe.send(('close', ()))
+                except (BrokenPipeError, OSError):
+                    pass
+            for worker in self._workers:
+                worker.join(timeout=5)
+                if worker.is_alive():
+                    worker.terminate()
+            for pipe in self._pipes:
+                pipe.close()
+            self._pipes = []
+            self._workers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _serve_shard(pipe, matcher: ResumeMatcher):
+    """worker process loop - runs commands off the pipe until told to close"""
+    shard = _Shard(matcher)
+    while True:
+        try:
+            command, args = pipe.recv()
+        except EOFError:
+            break
+        if command == 'close':
+            break
+        try:
+            pipe.send(('ok', getattr(shard, command)(*args)))
+        except Exception as error:
+            pipe.send(('error', error))
+    pipe.close()
+
+
+class _Shard:
+    """one worker's slice of the pool"""
+
+    def __init__(self, matcher: ResumeMatcher):
+        self.matcher = matcher
+        self.offset = 0
+        self.index = None
+
+    def load(self, resumes: List[str], resume_ids: List, offset: int):
+        """clean the shard's resumes, hand back what the global fit needs"""
+        self.resume_ids = resume_ids
+        # row of the shard's first resume in the full pool
+        self.offset = offset
+        self.processed, self.keywords = self.matcher.preprocess_corpus(resumes)
+        vectorizer = self.matcher.vectorizer
+        if isinstance(vectorizer, HashedTfidfVectorizer):
+            return vectorizer.document_frequencies(self.processed)
+        analyzer = vectorizer.build_analyzer()
+        term_counts, doc_counts = Counter(), Counter()
+        for text in self.processed:
+            counts = Counter(analyzer(text))
+            term_counts.update(counts)
+            doc_counts.update(counts.keys())
+        return term_counts, doc_counts
+
+    def fit(self, vectorizer) -> int:
+        """transform against the global vectorizer and index the shard"""
+        keyword_matrix, keyword_terms = build_keyword_matrix(self.keywords)
+        self.index = ResumeIndex(
+            self.matcher, vectorizer, vectorizer.transform(self.processed),
+            keyword_matrix, keyword_terms, self.resume_ids
+        )
+        del self.processed, self.keywords
+        return len(self.resume_ids)
+
+    def rank(self, job_matrix, job_keyword_sets: List[set], top_k: int) -> List[Dict]:
+        """the shard's top_k per job, scores in float64 so the merge ranks like one index"""
+        index = self.index
+        with index._lock:
+            # same products ResumeIndex.rank_many runs, just against this block of rows
+            similarities = (index.resume_matrix @ job_matrix.T).T.toarray()
+            keyword_scores = index.keyword_score_matrix(job_keyword_sets)
+            final_scores = self.matcher.combine_scores(similarities, keyword_scores)
+            keyword_matrix, keyword_terms = index.keyword_matrix, index.keyword_terms
+
+            hits = []
+            for job, job_keywords in enumerate(job_keyword_sets):
+                rows = top_k_indices(final_scores[job], top_k)
+                matched = []
+                for row in rows:
+                    start, end = keyword_matrix.indptr[row], keyword_matrix.indptr[row + 1]
+                    matched.append([
+                        keyword_terms[col] for col in keyword_matrix.indices[start:end]
+                        if keyword_terms[col] in job_keywords
+                    ])
+                hits.append({
+                    'rows': rows + self.offset,
+                    'similarity': similarities[job, rows],
+                    'keyword_match': keyword_scores[job, rows],
+                    'final': final_scores[job, rows],
+                    'matched_keywords': matched,
+                })
+        return hits
@@ -1,22 +1,45 @@
 import csv
-from typing import List
+import hashlib
+import io
+from typing import List, Tuple
 import streamlit as st
 import pandas as pd
 
-from resume_matcher import ResumeMatcher
+from resume_matcher import ResumeMatcher, ResumeIndex
+from resume_loader import STRUCTURED_FIELDS, resume_text
 
 
 @st.cache_data
-def load_resumes(path: str) -> pd.DataFrame:
-    return pd.read_csv(path)
+def read_file(path: str) -> bytes:
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def dataset_hash(data: bytes) -> str:
+    """content hash of a resumes CSV - same bytes, same index"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+@st.cache_resource(max_entries=8, show_spinner="Indexing resumes...")
+def load_index(content_hash: str, _data: bytes) -> Tuple[pd.DataFrame, ResumeIndex]:
+    """parse + index a resumes CSV once, shared by every session and rerun
+
+    Keyed on content_hash only (streamlit skips hashing _ args), so the same
+    upload from anyone reuses the fitted index.
+    """
+    df = pd.read_csv(io.BytesIO(_data))
+    index = ResumeMatcher().build_index(build_texts(df), columns=build_columns(df))
+    return df, index
 
 
 def build_texts(df: pd.DataFrame) -> List[str]:
-    texts = []
-    for _, row in df.iterrows():
-        parts = [str(row.get('title', '')), str(row.get('summary', '')), str(row.get('skills', '')), str(row.get('education', ''))]
-        texts.append(' '.join([p for p in parts if p and p != 'nan']))
-    return texts
+    # to_dict('records') instead of iterrows - same field assembly as resume_loader
+    return [resume_text(record) for record in df.to_dict('records')]
+
+
+def build_columns(df: pd.DataFrame) -> dict:
+    # structured fields the sidebar filters run on, whichever the CSV has
+    return {column: df[column].tolist() for column in STRUCTURED_FIELDS if column in df.columns}
 
 
 def main():
@@ -28,15 +51,27 @@ def main():
     uploaded = st.sidebar.file_uploader("Or upload resumes CSV", type=["csv"] )
 
     if use_sample or not uploaded:
-        df = load_resumes("sample_resumes.csv")
+        data = read_file("sample_resumes.csv")
     else:
-        df = pd.read_csv(uploaded)
+        data = uploaded.getvalue()
+    df, index = load_index(dataset_hash(data), data)
 
     st.sidebar.markdown(f"Resumes loaded: **{len(df)}**")
 
     st.sidebar.header("Matching Settings")
     top_k = st.sidebar.slider("Top K results", min_value=1, max_value=20, value=10)
 
+    # applied before any text scoring, only the resumes that pass get scored
+    filters = {}
+    if 'years_experience' in index.columns:
+        min_years = st.sidebar.number_input("Minimum years of experience", min_value=0, value=0)
+        if min_years:
+            filters['min_years'] = min_years
+    if 'title' in index.columns:
+        title = st.sidebar.text_input("Title contains").strip()
+        if title:
+            filters['title_contains'] = title
+
     st.header("Job Description")
     job_desc = st.text_area("Enter the job description to match against resumes:", height=200)
 
@@ -46,9 +81,12 @@ def main():
             return
 
         with st.spinner("Computing matches..."):
-            matcher = ResumeMatcher()
-            resumes_texts = build_texts(df)
-            ranked = matcher.rank_resumes(job_desc, resumes_texts, top_k=top_k)
+            # the index is already fitted, only the job gets vectorized here
+            ranked = index.rank_resumes(job_desc, top_k=top_k, **filters)
+
+        if not len(ranked):
+            st.info("No resumes passed the filters.")
+            return
 
         # map results to dataframe for display
         rows = []
@@ -3,8 +3,31 @@ Resume Screening System - Testing and Evaluation
 Includes unit tests and performance metrics
 """
 
+import asyncio
+import csv
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
 import unittest
-from resume_matcher import ResumeMatcher, ResumeKeywordExtractor
+import nltk
+import numpy as np
+import benchmark
+import matching_service
+import resume_ann
+import resume_fields
+import resume_inverted
+import resume_loader
+import resume_matcher
+import resume_metrics
+import resume_shards
+from resume_matcher import (
+    ResumeMatcher, ResumeKeywordExtractor, ResumeIndex, TextCache, top_k_indices
+)
+
+SAMPLE_RESUMES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sample_resumes.csv')
 
 
 class TestKeywordExtractor(unittest.TestCase):
@@ -38,6 +61,231 @@ class TestKeywordExtractor(unittest.TestCase):
         
         # Technical keywords should be in top results
         self.assertIn("python", keywords)
+    
+    def test_custom_tokenizer(self):
+        """Test a callable can be plugged in as the tokenizer"""
+        extractor = ResumeKeywordExtractor(tokenizer=str.split)
+        keywords = extractor.extract_keywords("Python developer. Django")
+        
+        # plain split keeps the trailing period
+        self.assertIn("developer.", keywords)
+        
+        with self.assertRaises(ValueError):
+            ResumeKeywordExtractor(tokenizer='spacy')
+    
+    def test_multi_word_skills(self):
+        """Test phrases in technical_keywords match as one keyword"""
+        keywords = self.extractor.extract_keywords(
+            "Machine learning engineer - deep learning, NLP and data science with Python"
+        )
+        
+        for phrase in ('machine learning', 'deep learning', 'data science'):
+            self.assertIn(phrase, keywords)
+        self.assertIn('engineer', keywords)
+        
+        matches = resume_matcher.SkillMatcher(['deep learning', 'learning', 'deep learning systems']).find(
+            "deep learning systems and learning".split()
+        )
+        self.assertEqual(sorted(matches), [
+            (0, 2, 'deep learning'), (0, 3, 'deep learning systems'), (1, 2, 'learning'), (4, 5, 'learning')
+        ])
+    
+    def test_skill_taxonomy_file(self):
+        """Test skills load from a taxonomy file and count in the keyword score"""
+        with tempfile.TemporaryDirectory() as path:
+            taxonomy = os.path.join(path, 'skills.txt')
+            with open(taxonomy, 'w', encoding='utf-8') as f:
+                f.write("# big data\nApache Spark\nNatural Language Processing\n")
+            self.extractor.load_skills(taxonomy)
+        
+        self.assertIn('apache spark', self.extractor.technical_keywords)
+        self.assertIn('python', self.extractor.technical_keywords)
+        keywords = self.extractor.extract_keywords("Data engineer with Apache Spark and natural language processing")
+        self.assertIn('apache spark', keywords)
+        self.assertIn('natural language processing', keywords)
+    
+    def test_keyword_model_matches_plain_scoring(self):
+        """Test the compiled scoring picks the same keywords, ties included, as a plain sort"""
+        def plain_keywords(text, top_n):
+            tokens = self.extractor.tokenize(self.extractor.clean_text(text))
+            scores = {}
+            phrases = {}
+            for start, end, skill in self.extractor.skill_matcher().find(tokens):
+                if end - start > 1:
+                    phrases.setdefault(end - 1, []).append(skill)
+            for position, token in enumerate(tokens):
+                if token not in self.extractor.stop_words and len(token) > 2 and not token.isdigit():
+                    weight = 2.0 if token in self.extractor.technical_keywords else 1.0
+                    scores[token] = scores.get(token, 0) + weight
+                for phrase in phrases.get(position, ()):
+                    scores[phrase] = scores.get(phrase, 0) + 2.0
+            return [kw for kw, _ in sorted(scores.items(), key=lambda x: x[1], reverse=True)[:top_n]]
+        
+        texts = [
+            "Python developer, Python and SQL, docker docker kubernetes. Reads books in 2020",
+            "Machine learning engineer: deep learning, machine learning and data science in python",
+            "alpha beta gamma delta alpha beta epsilon zeta eta theta iota kappa lambda",
+        ]
+        # enough distinct words to take the heap path
+        texts.append(' '.join(f"term{i % 3000}" for i in range(6000)) + " python python")
+        for text in texts:
+            for top_n in (0, 1, 3, 15, None):
+                self.assertEqual(self.extractor.extract_keywords(text, top_n), plain_keywords(text, top_n))
+        
+        # keyword sets edited in place rebuild the model after recompile()
+        self.assertEqual(self.extractor.extract_keywords(texts[2], 1), ['alpha'])
+        self.extractor.technical_keywords.add('beta')
+        self.extractor.recompile()
+        self.assertEqual(self.extractor.extract_keywords(texts[2], 1), ['beta'])
+        # assigning a set needs nothing else
+        self.extractor.technical_keywords = set()
+        self.assertEqual(self.extractor.extract_keywords(texts[2], 1), ['alpha'])
+    
+    def test_keyword_model_table_shared_by_threads(self):
+        """Test a full token table is swapped out without breaking readers in other threads"""
+        import threading
+        
+        texts = [' '.join(f"word{i}x{j}" for j in range(40)) + " python developer" for i in range(50)]
+        expected = [ResumeKeywordExtractor().extract_keywords(text) for text in texts]
+        model = self.extractor.keyword_model()
+        model.MAX_TOKENS = 64
+        errors = []
+        
+        def work():
+            try:
+                for _ in range(20):
+                    for text, keywords in zip(texts, expected):
+                        self.assertEqual(self.extractor.extract_keywords(text), keywords)
+            except Exception as e:
+                errors.append(e)
+        
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(errors, [])
+        self.assertLessEqual(len(model.weights), 64)
+    
+    def test_regex_tokenizer_matches_nltk(self):
+        """Test the regex fast path gives the same keywords as word_tokenize"""
+        try:
+            nltk.data.find('tokenizers/punkt_tab')
+        except LookupError:
+            self.skipTest("punkt_tab not installed")
+        
+        nltk_extractor = ResumeKeywordExtractor(tokenizer='nltk')
+        
+        texts = [
+            "Senior Python developer. 5+ years with Django/FastAPI... CI/CD -- AWS.",
+            "Node.js and React dev, e-mail me@example.com or visit https://example.com.",
+            # years, versions and abbreviations before a period
+            "Worked from 2015 to 2019. Led a team of 5. Python 3.8. Django 2.2.",
+            "Acme Inc. since 2019. B.Sc. in CS, e.g. Spark. Ph.D. 2010. Go 1.21. Release 1.2.3. v2. 2,000. users",
+        ]
+        with open(SAMPLE_RESUMES, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                texts.append(" ".join([row['title'], row['summary'], row['skills'], row['education']]))
+        
+        for text in texts:
+            self.assertEqual(
+                self.extractor.extract_keywords(text),
+                nltk_extractor.extract_keywords(text)
+            )
+
+
+class TestResources(unittest.TestCase):
+    """Test module import stays cheap and offline"""
+    
+    # seconds for `import resume_matcher` in a fresh interpreter, numpy included
+    IMPORT_TIME_BUDGET = 1.0
+    
+    def test_import_is_lazy(self):
+        """Test importing the module doesn't pull in sklearn/scipy/nltk"""
+        code = (
+            "import sys, time\n"
+            "start = time.perf_counter()\n"
+            "import resume_matcher\n"
+            "print(time.perf_counter() - start)\n"
+            "print(','.join(m for m in ('nltk', 'sklearn', 'scipy') if m in sys.modules))\n"
+        )
+        output = subprocess.run(
+            [sys.executable, '-c', code],
+            cwd=os.path.dirname(SAMPLE_RESUMES),
+            capture_output=True, text=True, check=True
+        ).stdout.splitlines()
+        
+        self.assertLess(float(output[0]), self.IMPORT_TIME_BUDGET)
+        self.assertEqual(output[1], '')
+    
+    def test_stop_words_fallback(self):
+        """Test the vendored stopword list covers NLTK's"""
+        self.assertIn('the', resume_matcher.ENGLISH_STOP_WORDS)
+        self.assertTrue(resume_matcher.english_stop_words() <= resume_matcher.ENGLISH_STOP_WORDS)
+
+
+class TestTextCache(unittest.TestCase):
+    """Test the cleaning/keyword cache"""
+    
+    def test_extractor_cache_hits(self):
+        """Test repeat texts come from the cache with the same keywords"""
+        cache = TextCache(max_size=100)
+        extractor = ResumeKeywordExtractor(cache=cache)
+        text = "Python developer with Django and REST API experience"
+        
+        first = extractor.extract_keywords(text)
+        self.assertEqual(cache.stats()['hits'], 0)
+        second = extractor.extract_keywords(text)
+        
+        self.assertEqual(first, second)
+        self.assertEqual(first, ResumeKeywordExtractor().extract_keywords(text))
+        self.assertEqual(cache.hits, 1)
+        
+        # config is part of the key
+        extractor.technical_keywords.add('django')
+        extractor.recompile()
+        self.assertEqual(extractor.extract_keywords(text)[:2], ['python', 'django'])
+        # only the clean_text step hits, it doesn't depend on the config
+        self.assertEqual(cache.hits, 2)
+        
+        # swapping a keyword in place keeps the size the same, the key still changes
+        extractor.technical_keywords.discard('django')
+        extractor.technical_keywords.add('experience')
+        extractor.recompile()
+        fresh = ResumeKeywordExtractor()
+        fresh.technical_keywords = set(extractor.technical_keywords)
+        self.assertEqual(extractor.extract_keywords(text), fresh.extract_keywords(text))
+        self.assertNotEqual(extractor.extract_keywords(text)[:2], ['python', 'django'])
+    
+    def test_eviction_policies(self):
+        """Test lru keeps recently read entries, fifo doesn't"""
+        for eviction, survivor in (('lru', 'a'), ('fifo', 'b')):
+            cache = TextCache(max_size=2, eviction=eviction)
+            cache.put('a', 1)
+            cache.put('b', 2)
+            cache.get('a')
+            cache.put('c', 3)
+            
+            self.assertEqual(len(cache), 2)
+            self.assertEqual(cache.evictions, 1)
+            self.assertIsNotNone(cache.get(survivor))
+        
+        with self.assertRaises(ValueError):
+            TextCache(eviction='random')
+    
+    def test_disk_backed(self):
+        """Test entries survive in the shelve file"""
+        with tempfile.TemporaryDirectory() as path:
+            cache = TextCache(max_size=1, path=os.path.join(path, 'cache'))
+            cache.put('a', ('python',))
+            cache.put('b', ('java',))
+            cache.close()
+            
+            reopened = TextCache(path=os.path.join(path, 'cache'))
+            self.assertEqual(reopened.get('a'), ('python',))
+            self.assertEqual(reopened.hits, 1)
+            reopened.close()
 
 
 class TestResumeMatcher(unittest.TestCase):
@@ -85,6 +333,23 @@ class TestResumeMatcher(unittest.TestCase):
         
         self.assertEqual(len(ranked), top_k)
     
+    def test_rank_many(self):
+        """Test ranking the same resumes for several jobs"""
+        jobs = [self.job_desc, "Java developer with Spring"]
+        rankings = self.matcher.rank_many(jobs, self.resumes, top_k=2)
+        
+        self.assertEqual(len(rankings), 2)
+        self.assertEqual(rankings[0][0]['resume_index'], 0)
+        self.assertEqual(rankings[1][0]['resume_index'], 1)
+        # one fit over the resumes, same as going through an index
+        self.assertEqual(rankings, [
+            ranked.without_ids() for ranked in self.matcher.build_index(self.resumes).rank_many(jobs, top_k=2)
+        ])
+        # per_job_idf gives the same scores as ranking each job on its own
+        per_job = self.matcher.rank_many(jobs, self.resumes, top_k=2, per_job_idf=True)
+        for job, ranked in zip(jobs, per_job):
+            self.assertEqual(ranked, self.matcher.rank_resumes(job, self.resumes, top_k=2))
+    
     def test_keyword_matching(self):
         """Test keyword matching logic"""
         job_desc = "Python JavaScript SQL"
@@ -97,6 +362,864 @@ class TestResumeMatcher(unittest.TestCase):
         matched_2 = len(scores[1]['matched_keywords'])
         
         self.assertGreater(matched_1, matched_2)
+        
+        # phrases count as one matched keyword, word order matters
+        scores = self.matcher.calculate_similarity(
+            "Machine learning engineer", ["Machine learning researcher", "Learning machine engineer"]
+        )
+        self.assertIn('machine learning', scores[0]['matched_keywords'])
+        self.assertNotIn('machine learning', scores[1]['matched_keywords'])
+
+
+class TestResumeIndex(unittest.TestCase):
+    """Test the pre-fitted resume index"""
+    
+    def setUp(self):
+        self.matcher = ResumeMatcher()
+        self.resumes = [
+            "5 years Python Django developer on AWS",
+            "Java developer with Spring Boot",
+            "Python and Django freelancer"
+        ]
+        self.index = self.matcher.build_index(self.resumes, resume_ids=['a', 'b', 'c'])
+    
+    def test_build_index(self):
+        """Test index holds one row per resume"""
+        self.assertIsInstance(self.index, ResumeIndex)
+        self.assertEqual(len(self.index), len(self.resumes))
+        self.assertEqual(self.index.resume_ids, ['a', 'b', 'c'])
+    
+    def test_index_ranking(self):
+        """Test ranking against the index"""
+        ranked = self.index.rank_resumes("Python developer with Django and AWS experience", top_k=2)
+        
+        self.assertEqual(len(ranked), 2)
+        self.assertEqual(ranked[0]['resume_id'], 'a')
+        scores = [r['final_score'] for r in ranked]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+    
+    def test_vocabulary_is_fixed(self):
+        """Test queries don't refit the index vectorizer"""
+        vocabulary = dict(self.index.vectorizer.vocabulary_)
+        first = self.index.calculate_similarity("Python developer")
+        
+        # refitting the matcher itself shouldn't touch the index
+        self.matcher.calculate_similarity("Graphic designer", ["Photoshop expert"])
+        self.index.calculate_similarity("Java Spring Boot developer")
+        second = self.index.calculate_similarity("Python developer")
+        
+        self.assertEqual(self.index.vectorizer.vocabulary_, vocabulary)
+        self.assertEqual(
+            [r['final_score'] for r in first],
+            [r['final_score'] for r in second]
+        )
+    
+    def test_save_and_load(self):
+        """Test a saved index loads memory mapped and scores the same"""
+        job_desc = "Python developer with Django and AWS experience"
+        
+        with tempfile.TemporaryDirectory() as path:
+            self.index.save(path)
+            loaded = ResumeIndex.load(path)
+            
+            self.assertEqual(loaded.resume_ids, self.index.resume_ids)
+            self.assertEqual(loaded.resume_keywords, self.index.resume_keywords)
+            
+            # matrix arrays should be views onto the mapped files
+            base = loaded.resume_matrix.data
+            while base is not None and not isinstance(base, np.memmap):
+                base = base.base
+            self.assertIsInstance(base, np.memmap)
+            
+            expected = self.index.calculate_similarity(job_desc)
+            actual = loaded.calculate_similarity(job_desc)
+            self.assertEqual(
+                [r['final_score'] for r in actual],
+                [r['final_score'] for r in expected]
+            )
+            del loaded, base
+    
+    def test_saved_texts_load_lazily(self):
+        """Test the texts stay on disk until a refit needs them"""
+        with tempfile.TemporaryDirectory() as path:
+            self.index.save(path)
+            with open(os.path.join(path, 'index.json'), encoding='utf-8') as f:
+                self.assertEqual(json.load(f)['texts'], resume_matcher.TEXTS_FILE)
+            
+            loaded = ResumeIndex.load(path)
+            loaded.add('d', "Graphic designer, Photoshop and Illustrator")
+            self.assertFalse(loaded.texts.loaded)
+            
+            loaded.refit()
+            self.assertEqual(loaded.texts, self.index.texts + [loaded.texts[-1]])
+            self.assertIn('photoshop', loaded.vectorizer.vocabulary_)
+            del loaded
+    
+    def test_rank_many_matches_single_queries(self):
+        """Test batch ranking gives the same results as one job at a time"""
+        jobs = [
+            "Python developer with Django and AWS experience",
+            "Java Spring Boot engineer",
+            "Graphic designer"
+        ]
+        batched = self.index.rank_many(jobs, top_k=2, batch_size=2)
+        
+        self.assertEqual(len(batched), len(jobs))
+        for job, ranked in zip(jobs, batched):
+            self.assertEqual(ranked, self.index.rank_resumes(job, top_k=2))
+    
+    def test_keyword_scores_match_set_intersection(self):
+        """Test the sparse keyword score equals the plain set version"""
+        extractor = self.matcher.keyword_extractor
+        job_keywords = set(extractor.extract_keywords("Python Django AWS and Spring developer"))
+        
+        expected = [
+            len(job_keywords & keywords) / len(job_keywords)
+            for keywords in self.index.resume_keywords
+        ]
+        self.assertEqual(list(self.index.keyword_scores(job_keywords)), expected)
+        
+        ranked = self.index.rank_resumes("Python Django AWS and Spring developer", top_k=1)
+        self.assertEqual(
+            set(ranked[0]['matched_keywords']),
+            job_keywords & self.index.resume_keywords[ranked[0]['resume_index']]
+        )
+    
+    def test_add_update_delete(self):
+        """Test live edits to the index without a refit"""
+        job_desc = "Graphic designer with Photoshop"
+        vocabulary = dict(self.index.vectorizer.vocabulary_)
+        
+        row = self.index.add('d', "Graphic designer, Photoshop and Illustrator")
+        self.assertEqual(row, 3)
+        self.assertEqual(len(self.index), 4)
+        self.assertEqual(self.index.vectorizer.vocabulary_, vocabulary)
+        self.assertEqual(self.index.rank_resumes(job_desc, top_k=1)[0]['resume_id'], 'd')
+        
+        with self.assertRaises(ValueError):
+            self.index.add('d', "duplicate")
+        
+        # update tombstones the old row and appends a new one
+        self.index.update('d', "Java developer with Spring Boot")
+        ranked = self.index.rank_resumes(job_desc)
+        self.assertEqual(len(ranked), 4)
+        self.assertNotIn(3, [r['resume_index'] for r in ranked])
+        
+        self.index.delete('b')
+        ids = [r['resume_id'] for r in self.index.rank_resumes("Java Spring Boot")]
+        self.assertEqual(sorted(ids), ['a', 'c', 'd'])
+        self.assertEqual(ids[0], 'd')
+        self.assertEqual(len(self.index.calculate_similarity(job_desc)), 3)
+        
+        with self.assertRaises(KeyError):
+            self.index.delete('b')
+        
+        # a text that fails to process leaves the old row in place
+        with self.assertRaises(AttributeError):
+            self.index.update('d', None)
+        self.assertEqual(len(self.index), 3)
+        self.assertEqual(self.index.rank_resumes("Java Spring Boot")[0]['resume_id'], 'd')
+    
+    def test_refit_after_drift(self):
+        """Test crossing the drift threshold refits in the background"""
+        self.index.refit_threshold = 0.5
+        self.index.delete('b')
+        self.index.add('d', "Graphic designer, Photoshop and Illustrator")
+        self.assertAlmostEqual(self.index.drift, 1 / 3)
+        self.assertIsNone(self.index._refit_thread)
+        
+        self.index.add('e', "Photoshop retoucher")
+        self.index._refit_thread.join()
+        
+        # tombstoned row is gone and the new words are in the vocabulary now
+        self.assertEqual(self.index.n_rows, 4)
+        self.assertEqual(self.index.drift, 0)
+        self.assertEqual(self.index.resume_ids, ['a', 'c', 'd', 'e'])
+        self.assertIn('photoshop', self.index.vectorizer.vocabulary_)
+        
+        rebuilt = self.matcher.build_index(
+            [self.resumes[0], self.resumes[2], "Graphic designer, Photoshop and Illustrator", "Photoshop retoucher"]
+        )
+        self.assertEqual(
+            [r['final_score'] for r in self.index.rank_resumes("Photoshop designer")],
+            [r['final_score'] for r in rebuilt.rank_resumes("Photoshop designer")]
+        )
+    
+    def test_concurrent_refits(self):
+        """Test refits started together run one after the other"""
+        import threading
+        
+        def slow_recorder(name, seconds, info):
+            # hold each refit between the fit and the swap
+            if name == 'refit':
+                time.sleep(0.1)
+        
+        self.matcher.recorder = slow_recorder
+        self.index.delete('b')
+        self.index.add('d', "Graphic designer, Photoshop and Illustrator")
+        errors = []
+        
+        def refit():
+            try:
+                self.index.refit()
+            except Exception as e:
+                errors.append(e)
+        
+        threads = [threading.Thread(target=refit) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(errors, [])
+        self.assertEqual(self.index.resume_ids, ['a', 'c', 'd'])
+        self.assertEqual(self.index.n_rows, 3)
+        rebuilt = self.matcher.build_index(
+            [self.resumes[0], self.resumes[2], "Graphic designer, Photoshop and Illustrator"]
+        )
+        self.assertEqual(
+            [r['final_score'] for r in self.index.rank_resumes("Photoshop designer")],
+            [r['final_score'] for r in rebuilt.rank_resumes("Photoshop designer")]
+        )
+    
+    def test_parallel_build_matches_serial(self):
+        """Test building over a process pool gives the same index"""
+        resumes = self.resumes * 4
+        serial = self.matcher.build_index(resumes)
+        parallel = self.matcher.build_index(resumes, n_jobs=2, chunk_size=5)
+        
+        self.assertEqual(parallel.texts, serial.texts)
+        self.assertEqual(parallel.resume_keywords, serial.resume_keywords)
+        self.assertEqual((parallel.resume_matrix != serial.resume_matrix).nnz, 0)
+    
+    def test_results_are_array_backed(self):
+        """Test RankedResults keeps float32 columns and still reads like the old dicts"""
+        index = self.matcher.build_index(self.resumes)
+        
+        ranked = index.rank_resumes("Python developer with AWS", top_k=3)
+        first = ranked[0]
+        
+        self.assertEqual(ranked.final_score.dtype, np.float32)
+        self.assertEqual(len(ranked), 3)
+        self.assertEqual(set(first.keys()), set(resume_matcher.MatchResult.KEYS))
+        self.assertIn('python', first['matched_keywords'])
+        self.assertEqual(first.get('missing', 'x'), 'x')
+        self.assertEqual(ranked[:1].to_dicts(), [first.to_dict()])
+        self.assertEqual(json.loads(json.dumps(ranked.to_dicts())), ranked.to_dicts())
+        # best first even after the float32 round trip
+        self.assertTrue(all(np.diff(ranked.final_score) <= 0))
+        
+        # one-shot matcher rows keep the old dict shape, without resume_id
+        one_shot = self.matcher.rank_resumes("Python developer with AWS", self.resumes, top_k=3)
+        self.assertNotIn('resume_id', one_shot[0])
+        self.assertEqual(len(one_shot[0]), 5)
+        self.assertEqual(one_shot[0], {key: one_shot[0][key] for key in one_shot[0].keys()})
+        self.assertEqual(one_shot[0].resume_id, one_shot[0]['resume_index'])
+    
+    def test_vectorizer_settings(self):
+        """Test float32 storage and vocabulary size are configurable"""
+        matcher = ResumeMatcher(vectorizer_params={'max_features': 3}, dtype=np.float32)
+        index = matcher.build_index(self.resumes)
+        
+        self.assertEqual(index.resume_matrix.dtype, np.float32)
+        self.assertEqual(len(index.vectorizer.vocabulary_), 3)
+        with tempfile.TemporaryDirectory() as path:
+            index.save(path)
+            loaded = ResumeIndex.load(path)
+            self.assertEqual(loaded.resume_matrix.dtype, np.float32)
+            self.assertEqual(loaded.rank_resumes("Python Django"), index.rank_resumes("Python Django"))
+            del loaded
+    
+    def test_hashing_mode(self):
+        """Test hashed features rank like a vocabulary and fit shard by shard"""
+        job_desc = "Python developer with Django and AWS experience"
+        matcher = ResumeMatcher(hashing=True, vectorizer_params={'n_features': 2 ** 16})
+        index = matcher.build_index(self.resumes, resume_ids=['a', 'b', 'c'])
+        
+        self.assertFalse(hasattr(index.vectorizer, 'vocabulary_'))
+        self.assertEqual(
+            [r['resume_id'] for r in index.rank_resumes(job_desc)],
+            [r['resume_id'] for r in self.index.rank_resumes(job_desc)]
+        )
+        
+        # document frequencies from separate shards add up to the full fit
+        vectorizer = resume_matcher.HashedTfidfVectorizer(**matcher.vectorizer.get_params())
+        processed = [matcher.preprocess_text(resume) for resume in self.resumes]
+        vectorizer.fit_from_frequencies(
+            vectorizer.document_frequencies(processed[:2]) + vectorizer.document_frequencies(processed[2:]),
+            len(processed)
+        )
+        np.testing.assert_array_equal(vectorizer.idf_, index.vectorizer.idf_)
+        
+        with tempfile.TemporaryDirectory() as path:
+            index.save(path)
+            loaded = ResumeIndex.load(path)
+            self.assertEqual(loaded.rank_resumes(job_desc), index.rank_resumes(job_desc))
+            loaded.add('d', "Graphic designer")
+            loaded.refit()
+            self.assertEqual(loaded.resume_ids, ['a', 'b', 'c', 'd'])
+            del loaded
+    
+    def test_min_score_and_streaming(self):
+        """Test min_score keeps the prefix of the full ranking, iter_rank covers the same rows"""
+        index = self.matcher.build_index(resume_loader.load_resume_texts(SAMPLE_RESUMES))
+        job_desc = "Python developer with Django and AWS experience"
+        index.delete(3)
+        full = index.rank_resumes(job_desc)
+        cutoff = float(full.final_score[10])
+        
+        passing = index.rank_resumes(job_desc, min_score=cutoff)
+        self.assertEqual(passing, full[:len(passing)])
+        self.assertTrue(all(score >= np.float32(cutoff) for score in passing.final_score))
+        self.assertGreaterEqual(len(passing), 11)
+        self.assertEqual(index.rank_many([job_desc], top_k=3, min_score=cutoff)[0], full[:3])
+        self.assertEqual(len(index.rank_resumes(job_desc, min_score=2.0)), 0)
+        
+        chunks = list(index.iter_rank(job_desc, min_score=cutoff, chunk_size=7))
+        self.assertGreater(len(chunks), 1)
+        streamed = [result.to_dict() for chunk in chunks for result in chunk]
+        self.assertEqual(
+            sorted(streamed, key=lambda r: (-r['final_score'], r['resume_index'])),
+            passing.to_dicts()
+        )
+        for chunk in chunks:
+            self.assertTrue(all(np.diff(chunk.final_score) <= 0))
+    
+    def test_structured_filters(self):
+        """Test column filters give the full ranking minus the rows that fail them"""
+        index = resume_loader.build_index_from_file(
+            SAMPLE_RESUMES, self.matcher, columns=resume_loader.STRUCTURED_FIELDS, keep_texts=True
+        )
+        job_desc = "Senior Python backend engineer with Django and AWS"
+        years = index.columns['years_experience']
+        self.assertEqual(years.dtype, np.float64)
+        index.delete(1)
+        full = index.rank_resumes(job_desc)
+        
+        filtered = index.rank_resumes(job_desc, min_years=6)
+        expected = [result.to_dict() for result in full if years[result['resume_index']] >= 6]
+        self.assertEqual(filtered.to_dicts(), expected)
+        self.assertNotIn(1, filtered.resume_ids)
+        
+        ranked = index.rank_many(
+            [job_desc], top_k=3, title_contains='PYTHON', where={'years_experience': lambda col: col < 6}
+        )[0]
+        for result in ranked:
+            self.assertIn('python', index.columns['title'][result['resume_index']].lower())
+            self.assertLess(years[result['resume_index']], 6)
+        self.assertEqual(len(index.rank_resumes(job_desc, min_years=99)), 0)
+        with self.assertRaises(KeyError):
+            index.rank_resumes(job_desc, where={'salary': lambda col: col > 0})
+        
+        # new rows get their own values, updates keep the old ones unless given
+        index.add('new', "Python Django AWS backend engineer", columns={'years_experience': 20})
+        index.update(2, "JavaScript React developer")
+        self.assertEqual(index.rank_resumes(job_desc, top_k=1, min_years=15).resume_ids, ['new'])
+        self.assertEqual(index.columns['years_experience'][index._row_of[2]], 5)
+        
+        index.refit()
+        self.assertEqual(len(index.columns['title']), index.n_rows)
+        with tempfile.TemporaryDirectory() as path:
+            index.save(path)
+            loaded = ResumeIndex.load(path, self.matcher, mmap_mode=None)
+        self.assertEqual(loaded.columns['title'].tolist(), index.columns['title'].tolist())
+        self.assertEqual(loaded.rank_many([job_desc], min_years=6), index.rank_many([job_desc], min_years=6))
+    
+    def test_dirty_years_column(self):
+        """Test years that don't read as numbers are NaN and fail min_years"""
+        index = self.matcher.build_index(
+            self.resumes, columns={'years_experience': ['N/A', '5+', 7], 'title': ['a', 'b', 'c']}
+        )
+        years = index.columns['years_experience']
+        
+        self.assertEqual(years.dtype, np.float64)
+        self.assertEqual(np.isnan(years).tolist(), [True, True, False])
+        self.assertEqual(index.rank_resumes("Python developer", min_years=1).resume_ids, [2])
+        
+        index.add(3, "Python developer", columns={'years_experience': 'ten'})
+        self.assertTrue(np.isnan(index.columns['years_experience'][3]))
+        self.assertEqual(index.rank_resumes("Python developer", min_years=1).resume_ids, [2])
+    
+    def test_job_index(self):
+        """Test ranking jobs for a resume uses the same 70/30 score, per-job keyword totals"""
+        jobs = [
+            "Python developer with Django and AWS experience",
+            "Java Spring Boot engineer",
+            "Graphic designer with Photoshop"
+        ]
+        job_index = self.matcher.build_job_index(jobs, job_ids=['py', 'java', 'design'])
+        resume = "5 years Python Django developer on AWS, some Java"
+        
+        ranked = job_index.rank_jobs(resume)
+        self.assertEqual([r['job_id'] for r in ranked][0], 'py')
+        self.assertEqual(set(ranked[0].keys()), set(resume_matcher.JobMatch.KEYS))
+        
+        extractor = self.matcher.keyword_extractor
+        resume_keywords = set(extractor.extract_keywords(resume))
+        resume_vector = job_index.vectorizer.transform([self.matcher.preprocess_text(resume)])
+        for result in ranked:
+            job_keywords = set(extractor.extract_keywords(jobs[result['job_index']]))
+            similarity = (job_index.job_matrix[result['job_index']] @ resume_vector.T).toarray()[0, 0]
+            keyword_score = len(job_keywords & resume_keywords) / len(job_keywords)
+            self.assertAlmostEqual(result['similarity_score'], similarity, places=6)
+            self.assertAlmostEqual(result['keyword_match_score'], keyword_score, places=6)
+            self.assertEqual(set(result['matched_keywords']), job_keywords & resume_keywords)
+        
+        self.assertEqual(job_index.rank_many([resume, resume], top_k=1)[1].job_ids, ['py'])
+    
+    def test_top_k_indices_ties(self):
+        """Test top-k selection keeps row order on ties like a stable sort"""
+        scores = np.array([0.2, 0.5, 0.2, 0.9, 0.2, 0.5])
+        expected = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+        
+        for top_k in (None, 1, 2, 3, 4, 6, 10):
+            self.assertEqual(
+                list(top_k_indices(scores, top_k)),
+                expected[:top_k] if top_k else expected
+            )
+
+
+class TestResumeLoader(unittest.TestCase):
+    """Test streaming resume files"""
+    
+    def test_chunks(self):
+        """Test chunking keeps ids and order"""
+        chunks = list(resume_loader.iter_resume_chunks(SAMPLE_RESUMES, chunk_size=20))
+        
+        self.assertEqual([len(chunk) for chunk in chunks], [20, 20, 10])
+        self.assertEqual(chunks[0][0][0], 1)
+        self.assertTrue(chunks[0][0][1].startswith("Senior Python Developer Senior backend engineer"))
+    
+    def test_json_and_jsonl_match_csv(self):
+        """Test every format gives the same resume texts"""
+        json_path = os.path.join(os.path.dirname(SAMPLE_RESUMES), 'sample_resumes.json')
+        csv_chunks = list(resume_loader.iter_resume_chunks(SAMPLE_RESUMES, chunk_size=3))
+        json_chunks = list(resume_loader.iter_resume_chunks(json_path, chunk_size=3))
+        
+        # the json sample only has the first 10 resumes
+        self.assertEqual([len(chunk) for chunk in json_chunks], [3, 3, 3, 1])
+        self.assertEqual(sum(json_chunks, []), sum(csv_chunks, [])[:10])
+        
+        with tempfile.TemporaryDirectory() as path:
+            jsonl_path = os.path.join(path, 'resumes.jsonl')
+            with open(jsonl_path, 'w', encoding='utf-8') as f:
+                for record in resume_loader.iter_records(json_path):
+                    f.write(json.dumps(record) + "\n")
+            jsonl_chunks = list(resume_loader.iter_resume_chunks(jsonl_path, chunk_size=3))
+        self.assertEqual(jsonl_chunks, json_chunks)
+    
+    def test_streaming_index_matches_in_memory(self):
+        """Test a streamed build fits the same vocabulary and scores"""
+        matcher = ResumeMatcher()
+        streamed = resume_loader.build_index_from_file(SAMPLE_RESUMES, matcher, chunk_size=7)
+        in_memory = matcher.build_index(resume_loader.load_resume_texts(SAMPLE_RESUMES))
+        
+        self.assertEqual(streamed.resume_ids, list(range(1, 51)))
+        self.assertEqual(streamed.vectorizer.vocabulary_, in_memory.vectorizer.vocabulary_)
+        np.testing.assert_array_equal(streamed.vectorizer.idf_, in_memory.vectorizer.idf_)
+        np.testing.assert_allclose(
+            streamed.resume_matrix.toarray(), in_memory.resume_matrix.toarray(), atol=1e-12
+        )
+        self.assertEqual(streamed.resume_keywords, in_memory.resume_keywords)
+        
+        hashed = ResumeMatcher(hashing=True)
+        np.testing.assert_array_equal(
+            resume_loader.build_index_from_file(SAMPLE_RESUMES, hashed, chunk_size=7).vectorizer.idf_,
+            hashed.build_index(resume_loader.load_resume_texts(SAMPLE_RESUMES)).vectorizer.idf_
+        )
+        
+        # the second pass shares one process pool across the chunks
+        pooled = resume_loader.build_index_from_file(SAMPLE_RESUMES, matcher, chunk_size=7, n_jobs=2)
+        self.assertEqual(pooled.resume_keywords, in_memory.resume_keywords)
+        np.testing.assert_array_equal(pooled.resume_matrix.toarray(), streamed.resume_matrix.toarray())
+
+
+class TestBenchmark(unittest.TestCase):
+    """Test the benchmark harness"""
+    
+    def test_small_run(self):
+        """Test a tiny benchmark run reports every metric"""
+        result = benchmark.run_benchmark(
+            200, n_queries=3, batch_jobs=5, seed=3,
+            resumes_csv=SAMPLE_RESUMES,
+            labeled_csv=os.path.join(os.path.dirname(SAMPLE_RESUMES), 'labeled_pairs.csv')
+        )
+        
+        for metric in ('fit_seconds', 'query_p50_ms', 'query_p99_ms', 'batch_jobs_per_second',
+                       'calculate_similarity_p50_ms', 'keywords_docs_per_second', 'peak_rss_mb'):
+            self.assertGreater(result[metric], 0)
+    
+    def test_compare_flags_regressions(self):
+        """Test compare only flags metrics that got worse"""
+        baseline = {'results': [{'size': 10, 'fit_seconds': 1.0, 'batch_jobs_per_second': 100.0}]}
+        current = {'results': [{'size': 10, 'fit_seconds': 0.5, 'batch_jobs_per_second': 50.0}]}
+        
+        regressions = benchmark.compare(baseline, current)
+        
+        self.assertEqual(len(regressions), 1)
+        self.assertIn('batch_jobs_per_second', regressions[0])
+
+
+class TestInstrumentation(unittest.TestCase):
+    """Test per-stage timing hooks"""
+    
+    def test_stage_log(self):
+        """Test a ranking call reports its stages without changing results"""
+        matcher = ResumeMatcher()
+        job = "Python developer with AWS"
+        resumes = ["Python developer AWS Docker", "Java developer Spring", "Designer"]
+        expected = matcher.rank_resumes(job, resumes)
+        
+        log = resume_metrics.StageLog()
+        with matcher.instrument(log):
+            ranked = matcher.rank_resumes(job, resumes)
+        
+        self.assertEqual(ranked, expected)
+        self.assertIsNone(matcher.recorder)
+        stages = [record['stage'] for record in log.records]
+        for stage in ('preprocess', 'fit', 'keywords', 'vectorize', 'similarity',
+                      'keyword_match', 'rank', 'query'):
+            self.assertIn(stage, stages)
+        # the outer call finishes last
+        self.assertEqual(log.records[-1], {
+            'stage': 'rank_resumes', 'seconds': log.records[-1]['seconds'], 'resumes': 3
+        })
+        fit = log.records[stages.index('fit')]
+        self.assertEqual((fit['docs'], fit['shape'][0]), (4, 4))
+    
+    def test_instrument_is_per_thread(self):
+        """Test a scoped recorder only sees calls from its own thread"""
+        import threading
+        
+        matcher = ResumeMatcher()
+        index = matcher.build_index(["Python developer", "Java developer", "Designer"])
+        logs = [resume_metrics.StageLog(), resume_metrics.StageLog()]
+        barrier = threading.Barrier(2)
+        
+        def work(log, n_calls):
+            with matcher.instrument(log):
+                barrier.wait()
+                for _ in range(n_calls):
+                    index.rank_resumes("Python developer")
+        
+        threads = [threading.Thread(target=work, args=args) for args in zip(logs, (3, 7))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        for log, n_calls in zip(logs, (3, 7)):
+            self.assertEqual(sum(record['stage'] == 'query' for record in log.records), n_calls)
+        self.assertIsNone(matcher.recorder)
+    
+    def test_metrics_recorder(self):
+        """Test counters and histogram buckets add up"""
+        recorder = resume_metrics.MetricsRecorder(buckets=(0.01, 1.0))
+        recorder('fit', 0.005, {'docs': 10})
+        recorder('fit', 0.5, {'docs': 5})
+        recorder('fit', 3.0, {})
+        
+        fit = recorder.snapshot()['fit']
+        self.assertEqual((fit['count'], fit['docs']), (3, 15))
+        self.assertEqual(list(fit['buckets'].values()), [1, 2, 3])
+        self.assertIn('resume_matcher_stage_seconds_count{stage="fit"} 3', recorder.to_prometheus())
+
+
+class TestApproximateIndex(unittest.TestCase):
+    """Test the ANN candidate stage"""
+    
+    def setUp(self):
+        self.index = ResumeMatcher().build_index(resume_loader.load_resume_texts(SAMPLE_RESUMES))
+        self.ann = resume_ann.ApproximateIndex.build(self.index, n_lists=5, n_components=16)
+        self.jobs = ["Python developer with AWS and Docker", "Data scientist machine learning SQL"]
+    
+    def test_probing_everything_is_exact(self):
+        """Test probing every partition gives the brute-force results"""
+        exact = self.index.rank_many(self.jobs, top_k=5)
+        
+        self.assertEqual(self.ann.rank_many(self.jobs, top_k=5, n_probe=5), exact)
+        report = self.ann.recall_report(self.jobs, top_k=5, n_probes=[1, 5])
+        self.assertEqual(report[-1]['recall'], 1.0)
+        self.assertLessEqual(report[0]['recall'], 1.0)
+    
+    def test_candidates_are_rescored_exactly(self):
+        """Test a partial probe returns exact scores for the rows it finds"""
+        full = {result['resume_index']: result for result in self.index.rank_resumes(self.jobs[0])}
+        
+        approximate = self.ann.rank_resumes(self.jobs[0], top_k=5, n_probe=1)
+        
+        self.assertEqual(len(approximate), 5)
+        for result in approximate:
+            self.assertEqual(result, full[result['resume_index']])
+    
+    def test_added_rows_and_refit(self):
+        """Test resumes added after build are candidates and a refit needs a rebuild"""
+        row = self.index.add('new', "Python developer with AWS and Docker, Kubernetes")
+        
+        top = self.ann.rank_resumes(self.jobs[0], top_k=1, n_probe=1)
+        self.assertEqual(top[0]['resume_index'], row)
+        
+        self.index.refit()
+        with self.assertRaises(ValueError):
+            self.ann.rank_resumes(self.jobs[0])
+
+    
+    def test_more_lists_than_training_rows(self):
+        """Test n_lists is capped at the k-means training sample"""
+        ann = resume_ann.ApproximateIndex.build(self.index, n_lists=20, n_components=8, train_size=10)
+        
+        self.assertEqual(ann.n_lists, 10)
+        self.assertEqual(ann.rank_many(self.jobs, top_k=5, n_probe=10), self.index.rank_many(self.jobs, top_k=5))
+
+class TestInvertedIndex(unittest.TestCase):
+    """Test pruned top-k against the full ranking"""
+    
+    def setUp(self):
+        self.index = ResumeMatcher().build_index(resume_loader.load_resume_texts(SAMPLE_RESUMES))
+        self.jobs = [
+            "Senior Python developer with AWS, Docker and Kubernetes",
+            "Data scientist machine learning SQL pandas",
+            "Graphic designer Photoshop",
+            "zzz qqq",
+        ]
+    
+    def test_same_as_full_ranking(self):
+        """Test every top_k gives exactly the brute-force results, zero-score padding included"""
+        inverted = resume_inverted.InvertedIndex(self.index)
+        
+        for top_k in (1, 3, 10, 50):
+            self.assertEqual(
+                inverted.rank_many(self.jobs, top_k=top_k),
+                self.index.rank_many(self.jobs, top_k=top_k)
+            )
+    
+    def test_skips_postings(self):
+        """Test a selective top-1 doesn't walk every posting"""
+        inverted = resume_inverted.InvertedIndex(self.index)
+        job_keywords = set(self.index.matcher.keyword_extractor.extract_keywords(self.jobs[0]))
+        job_vector = self.index.job_matrix([self.jobs[0]])
+        
+        rows, visited = inverted.candidates(job_vector, job_keywords, 1)
+        
+        total = sum(
+            postings.indptr[-1] for postings in (inverted.term_postings, inverted.keyword_postings)
+        )
+        self.assertLess(visited, total)
+        self.assertLess(len(rows), len(self.index))
+    
+    def test_live_updates(self):
+        """Test deleted and added resumes are handled like the full ranking"""
+        inverted = resume_inverted.InvertedIndex(self.index)
+        best = self.index.rank_resumes(self.jobs[0], top_k=1)[0]['resume_id']
+        self.index.delete(best)
+        self.index.add('new', "Python developer, AWS Docker Kubernetes, senior engineer")
+        
+        for top_k in (1, 5):
+            self.assertEqual(
+                inverted.rank_many(self.jobs, top_k=top_k),
+                self.index.rank_many(self.jobs, top_k=top_k)
+            )
+
+
+class TestShardedIndex(unittest.TestCase):
+    """Test the scatter-gather sharded index"""
+    
+    def test_matches_unsharded(self):
+        """Test merged shard results equal one index over the whole pool"""
+        resumes = resume_loader.load_resume_texts(SAMPLE_RESUMES)
+        resume_ids = list(range(1, len(resumes) + 1))
+        jobs = ["Python developer with AWS and Docker", "Data scientist machine learning SQL", "Nurse"]
+        matcher = ResumeMatcher()
+        index = matcher.build_index(resumes, resume_ids)
+        
+        with resume_shards.ShardedIndex.build(resumes, resume_ids, n_shards=3, matcher=matcher) as shards:
+            self.assertEqual(shards.shard_sizes, [16, 17, 17])
+            np.testing.assert_array_equal(shards.vectorizer.idf_, index.vectorizer.idf_)
+            for top_k in (1, 5, None):
+                self.assertEqual(shards.rank_many(jobs, top_k=top_k), index.rank_many(jobs, top_k=top_k))
+            self.assertEqual(
+                shards.rank_resumes(jobs[0], top_k=3).resume_ids,
+                index.rank_resumes(jobs[0], top_k=3).resume_ids
+            )
+        
+        with self.assertRaises(RuntimeError):
+            shards.rank_resumes(jobs[0])
+
+
+class TestFieldIndex(unittest.TestCase):
+    """Test the per-field weighted index"""
+    
+    def setUp(self):
+        self.resume_ids, self.records = resume_loader.load_resume_fields(SAMPLE_RESUMES)
+        self.index = resume_fields.FieldIndex.build(self.records, self.resume_ids)
+        self.job = "Senior Python backend engineer with Django and AWS"
+    
+    def test_field_weights(self):
+        """Test similarity is the weighted mean of the per-field cosines"""
+        self.assertEqual(self.records[0]['skills'], "Python;Django;FastAPI;SQL;Docker;Kubernetes;AWS;Git")
+        # skill lists get split, not glued into one token
+        self.assertIn('django', self.index.vectorizers['skills'].vocabulary_)
+        
+        processed = [self.index.matcher.preprocess_text(self.job)]
+        cosines = {}
+        for field in ('skills', 'title'):
+            job_vector = self.index.vectorizers[field].transform(processed)
+            cosines[field] = (self.index.field_matrices[field] @ job_vector.T).toarray()[:, 0]
+        similarities = self.index.similarity_matrix([self.job], weights={'skills': 3, 'title': 1})[0]
+        np.testing.assert_allclose(similarities, 0.75 * cosines['skills'] + 0.25 * cosines['title'])
+        
+        ranked = self.index.rank_resumes(self.job, top_k=3, weights={'skills': 1})
+        np.testing.assert_allclose(
+            ranked.similarity_score, cosines['skills'][ranked.resume_index], rtol=1e-6
+        )
+        self.assertEqual(ranked.resume_ids[0], 1)
+        
+        with self.assertRaises(ValueError):
+            self.index.rank_resumes(self.job, weights={'hobbies': 1.0})
+        with self.assertRaises(ValueError):
+            self.index.rank_resumes(self.job, weights={'skills': 0})
+    
+    def test_update_one_field(self):
+        """Test updating a field keeps the other fields' rows and ranks like a fresh add"""
+        old_row = self.index._row_of[1]
+        new_row = self.index.update(1, {'title': 'Data Scientist'})
+        
+        for field in ('summary', 'skills', 'education'):
+            matrix = self.index.field_matrices[field]
+            self.assertEqual((matrix[old_row] != matrix[new_row]).nnz, 0)
+        
+        fresh = resume_fields.FieldIndex.build(self.records, self.resume_ids)
+        fresh.delete(1)
+        fresh.add(1, dict(self.records[0], title='Data Scientist'))
+        jobs = [self.job, "Data scientist"]
+        self.assertEqual(self.index.rank_many(jobs), fresh.rank_many(jobs))
+        
+        self.index.delete(1)
+        self.assertNotIn(1, self.index.rank_resumes(self.job).resume_ids)
+        self.assertEqual(len(self.index), 49)
+        with self.assertRaises(KeyError):
+            self.index.update(1, {'title': 'Nurse'})
+
+
+class TestMatchingService(unittest.IsolatedAsyncioTestCase):
+    """Test the async matching service"""
+    
+    def setUp(self):
+        self.index = ResumeMatcher().build_index(resume_loader.load_resume_texts(SAMPLE_RESUMES))
+        self.jobs = [
+            "Senior Python developer with AWS and Docker",
+            "Data scientist machine learning SQL",
+            "Frontend React TypeScript engineer",
+        ]
+    
+    async def test_concurrent_requests_are_batched(self):
+        """Test concurrent rank calls share batches and match the index"""
+        requests = [(self.jobs[i % 3], 3 + i % 4) for i in range(20)]
+        
+        async with matching_service.MatchingService(self.index, max_wait=0.02) as service:
+            results = await asyncio.gather(*(service.rank(job, top_k) for job, top_k in requests))
+            stats = service.stats()
+        
+        for (job, top_k), ranked in zip(requests, results):
+            self.assertEqual(ranked, self.index.rank_resumes(job, top_k))
+        self.assertEqual(stats['requests'], 20)
+        self.assertLess(stats['batches'], 20)
+    
+    async def test_bad_requests_fail_alone(self):
+        """Test a bad request only fails itself and the batcher keeps going"""
+        index = self.index
+        
+        class FlakyIndex:
+            # blows up any batch with a poisoned job in it
+            def __len__(self):
+                return len(index)
+            
+            def rank_many(self, jobs, top_k):
+                if 'boom' in jobs:
+                    raise ValueError("boom")
+                return index.rank_many(jobs, top_k)
+        
+        async with matching_service.MatchingService(FlakyIndex(), max_wait=0.02) as service:
+            with self.assertRaises(ValueError):
+                await service.rank(self.jobs[0], top_k="2")
+            with self.assertRaises(TypeError):
+                await service.rank(None)
+            
+            results = await asyncio.gather(
+                service.rank(self.jobs[0], 2), service.rank('boom', 2), service.rank(self.jobs[1], 3),
+                return_exceptions=True
+            )
+            self.assertEqual(results[0], self.index.rank_resumes(self.jobs[0], 2))
+            self.assertIsInstance(results[1], ValueError)
+            self.assertEqual(results[2], self.index.rank_resumes(self.jobs[1], 3))
+            # still serving afterwards
+            self.assertEqual(await service.rank(self.jobs[2], 1), self.index.rank_resumes(self.jobs[2], 1))
+    
+    async def test_close_fails_pending_requests(self):
+        """Test close() answers requests that were still waiting"""
+        service = matching_service.MatchingService(self.index, max_wait=10)
+        await service.start()
+        pending = [asyncio.create_task(service.rank(job)) for job in self.jobs]
+        await asyncio.sleep(0.01)
+        
+        await service.close()
+        
+        for task in pending:
+            with self.assertRaises(RuntimeError):
+                await asyncio.wait_for(task, 1)
+    
+    async def test_socket_server(self):
+        """Test JSON-lines requests over a local socket"""
+        async with matching_service.MatchingService(self.index) as service:
+            server = await matching_service.serve(service, port=0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                requests = [
+                    {'id': 1, 'job': self.jobs[0], 'top_k': 2},
+                    {'id': 2, 'op': 'delete', 'resume_id': 'nope'},
+                ]
+                for request in requests:
+                    writer.write((json.dumps(request) + "\n").encode('utf-8'))
+                await writer.drain()
+                replies = [json.loads(await reader.readline()) for _ in requests]
+                writer.close()
+                await writer.wait_closed()
+        
+        replies = {reply['id']: reply for reply in replies}
+        self.assertEqual(replies[1]['result'], self.index.rank_resumes(self.jobs[0], 2).to_dicts())
+        self.assertIn('KeyError', replies[2]['error'])
+
+
+class TestStreamlitApp(unittest.TestCase):
+    """Test the streamlit page end to end"""
+    
+    def setUp(self):
+        try:
+            from streamlit.testing.v1 import AppTest
+        except ImportError:
+            self.skipTest("streamlit not installed")
+        app = os.path.join(os.path.dirname(SAMPLE_RESUMES), 'streamlit_app.py')
+        cwd = os.getcwd()
+        # the app reads sample_resumes.csv relative to where it runs
+        os.chdir(os.path.dirname(app))
+        self.addCleanup(os.chdir, cwd)
+        self.app = AppTest.from_file(app, default_timeout=60).run()
+    
+    def test_filters_with_no_matches(self):
+        """Test a filter nothing passes shows a message instead of an empty table"""
+        self.app.text_area[0].set_value("Python developer")
+        self.app.text_input[0].set_value("zzzz")
+        self.app.button[0].click().run()
+        
+        self.assertEqual(len(self.app.exception), 0)
+        self.assertEqual([info.value for info in self.app.info], ["No resumes passed the filters."])
+        self.assertEqual(len(self.app.table), 0)
+        
+        self.app.text_input[0].set_value("")
+        self.app.button[0].click().run()
+        self.assertEqual(len(self.app.exception), 0)
+        self.assertEqual(len(self.app.table), 1)
 
 
 class TestScenarios(unittest.TestCase):